@@ -14,6 +14,7 @@ from dotenv import load_dotenv
 sys.path.insert(0, str(Path(__file__).parent))
 
 from core.voice_engine import VoiceEngine
+from core.podija_storage import create_storage
 from integrations.telegram_bot import TelegramNotifier
 
 # Завантаження конфігурації
@@ -59,10 +60,28 @@ async def main():
     
     # Voice Engine
     api_endpoint = os.getenv('API_STATE_ENDPOINT', 'http://localhost:3000/api/state-visual')
+    podija_storage = create_storage(
+        os.getenv('PODIJA_STORAGE', 'json'),
+        base_path / "storage" / "shared" / "calendar.json"
+    )
     engine = VoiceEngine(
         ontology_path=str(ontology_path),
         manifest_path=str(manifest_path),
-        api_endpoint=api_endpoint
+        api_endpoint=api_endpoint,
+        podija_storage=podija_storage,
+        podija_dedupe=os.getenv('PODIJA_DEDUPE', '0') == '1',
+        podija_dedupe_window=float(os.getenv('PODIJA_DEDUPE_WINDOW', '0')) or None,
+        dispatch_workers=int(os.getenv('DISPATCH_WORKERS', '4')),
+        event_queue_size=int(os.getenv('EVENT_QUEUE_SIZE', '10000')),
+        overflow_policy=os.getenv('EVENT_OVERFLOW_POLICY', 'drop_oldest_background'),
+        spill_path=os.getenv('EVENT_SPILL_PATH', str(base_path / "storage" / "shared" / "events.spill.jsonl")),
+        event_coalescing=os.getenv('EVENT_COALESCING', '1') == '1',
+        watch_root=str(base_path),
+        journal_dir=os.getenv('EVENT_JOURNAL_DIR') or None,
+        handler_timeout=float(os.getenv('HANDLER_TIMEOUT', '30')),
+        breaker_failure_threshold=int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5')),
+        breaker_reset_timeout=float(os.getenv('BREAKER_RESET_SECONDS', '30')),
+        dead_letter_path=os.getenv('DEAD_LETTER_PATH', str(base_path / "storage" / "shared" / "events.dead.jsonl"))
     )
     
     # Telegram Notifier
@@ -70,16 +89,36 @@ async def main():
     notifier = TelegramNotifier(
         bot_token=bot_token,
         chat_id=chat_id,
-        media_repo_url=media_repo_url
+        media_repo_url=media_repo_url,
+        api_server=os.getenv('TELEGRAM_API_SERVER') or None,
+        per_chat_rate=float(os.getenv('TELEGRAM_CHAT_RATE', '1')),
+        global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '30')),
+        digest_window=float(os.getenv('TELEGRAM_DIGEST_WINDOW', '300')),
+        digest_max_events=int(os.getenv('TELEGRAM_DIGEST_MAX_EVENTS', '100')),
+        file_id_cache_path=os.getenv('TELEGRAM_FILE_ID_CACHE',
+                                     str(base_path / "storage" / "shared" / "telegram_file_ids.jsonl")),
+        media_cache_dir=os.getenv('MEDIA_CACHE_DIR') or None,
+        media_cache_bytes=int(float(os.getenv('MEDIA_CACHE_MAX_MB', '64')) * 1024 * 1024),
+        media_map=dict(engine.compiled_ontology.media_map)
     )
     
     # Реєстрація Telegram як обробника подій
     engine.register_handler(notifier)
+    # Гаряче перезавантаження онтології оновлює та прогріває медіа
+    engine.add_ontology_listener(lambda compiled: notifier.update_media_map(compiled.media_map))
     
     # Запуск обох систем паралельно
     logger.info("Starting CIT Voice system...")
     
     try:
+        # Прогрів медіа до перших подій, щоб критичні сповіщення не чекали завантаження
+        notifier.warmup_task = asyncio.create_task(notifier.warm_up_media())
+        try:
+            await asyncio.wait_for(notifier.media_ready.wait(),
+                                   float(os.getenv('MEDIA_WARMUP_TIMEOUT', '15')))
+        except asyncio.TimeoutError:
+            logger.warning("Media warm-up still running, starting without it")
+        
         await asyncio.gather(
             engine.start(),
             notifier.start()
@@ -89,8 +128,11 @@ async def main():
     except Exception as e:
         logger.error(f"Fatal error: {e}")
     finally:
-        engine.stop()
+        # Спершу зупинити доставку і дописати чергу та дайджест Telegram,
+        # поки журнал відкритий для підтверджень, потім закрити движок
+        engine.dispatcher.stop()
         await notifier.stop()
+        await engine.shutdown()
         logger.info("CIT Voice shutdown complete")
 
 
@@ -0,0 +1,95 @@
+"""
+Thread -> asyncio loop bridge
+
+Watchdog (and other) threads hand callbacks to the event loop through a
+deque. The loop is woken with a single call_soon_threadsafe per batch,
+not per item, and items submitted before the loop is bound are kept
+until it is.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Optional
+
+from core.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class LoopBridge:
+    """
+    Batched, lock-free handoff of callbacks into one event loop
+
+    submit() may be called from any thread. deque.append/popleft are
+    atomic, and the _wakeup_pending flag is cleared before a drain starts,
+    so an item appended at any point is either taken by the running drain
+    or schedules the next one.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup_pending = False
+        self.handoff_latency = LatencyHistogram()
+        self.submitted = 0
+        self.delivered = 0
+        self.batches = 0
+        self.max_depth = 0
+
+    @property
+    def bound(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Deliver to this loop from now on (call from the loop's thread)"""
+        self._loop = loop
+        self._wakeup_pending = False
+        if self._queue:
+            self._wake()
+
+    def submit(self, callback: Callable[..., Any], *args):
+        """Queue callback(*args) to run on the loop (thread-safe)"""
+        self._queue.append((time.perf_counter(), callback, args))
+        self.submitted += 1
+        depth = len(self._queue)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if not self._wakeup_pending and self.bound:
+            self._wake()
+
+    def _wake(self):
+        self._wakeup_pending = True
+        try:
+            self._loop.call_soon_threadsafe(self._drain)
+        except RuntimeError:
+            # Loop closed meanwhile: keep the items for the next bind()
+            self._wakeup_pending = False
+
+    def _drain(self):
+        """Run everything queued so far (one loop iteration, one batch)"""
+        self._wakeup_pending = False
+        self.batches += 1
+        queue = self._queue
+        for _ in range(len(queue)):
+            enqueued_at, callback, args = queue.popleft()
+            self.handoff_latency.record((time.perf_counter() - enqueued_at) * 1000)
+            self.delivered += 1
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Bridged callback {getattr(callback, '__name__', callback)} failed: {e}")
+        if queue and not self._wakeup_pending:
+            # Items that arrived during this drain run in the next iteration
+            self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "handoff_ms": self.handoff_latency.stats(),
+        }
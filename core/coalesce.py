@@ -0,0 +1,258 @@
+"""
+CIT Voice event coalescing
+
+Sits between classification and dispatch. Repeats of the same
+(event_type, source) within the ontology's coalesce window are merged
+into one summary event carrying a count, and each event type can be
+rate limited with a token bucket. Both are configured per level (or per
+event type) in ontology.json; events without such settings pass through
+untouched.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from core.ontology import ClassifiedEvent, ClassifiedTemplate
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        """Consume one token if available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+CONCATENATED_FIELDS = frozenset({"changes"})  # Ordered records: every one kept
+
+
+def _merge_data(held: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fold a newer event's data into the data held so far
+
+    Scalars take the newer value. Lists of records (CONCATENATED_FIELDS,
+    e.g. the JSON Patch ops of visual_state_change) are concatenated, other
+    lists and dicts of lists (changed_paths, semantic_categories) are
+    unioned in order, so a summary still carries every held change.
+    """
+    merged = dict(data)
+    for key, value in data.items():
+        previous = held.get(key)
+        if isinstance(value, list) and isinstance(previous, list):
+            if key in CONCATENATED_FIELDS:
+                merged[key] = previous + value
+            else:
+                merged[key] = previous + [item for item in value if item not in previous]
+        elif isinstance(value, dict) and isinstance(previous, dict):
+            combined = dict(previous)
+            for name, items in value.items():
+                before = combined.get(name)
+                if isinstance(items, list) and isinstance(before, list):
+                    combined[name] = before + [item for item in items if item not in before]
+                else:
+                    combined[name] = items
+            merged[key] = combined
+    return merged
+
+
+class _Group:
+    """Events held back for one (event_type, source) key"""
+    __slots__ = ("event", "data", "count", "first_seen", "last_seen", "opened_at", "timer", "seqs")
+
+    def __init__(self, opened_at: float):
+        self.event = None
+        self.data = None  # Data of the held events merged so far
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = opened_at
+        self.opened_at = opened_at
+        self.timer = None
+        self.seqs = []  # Journal seqs of the held events
+
+    def add(self, event: ClassifiedEvent, now: float):
+        if self.count == 0:
+            self.first_seen = event.created
+        self.event = event
+        self.data = event.data if self.data is None else _merge_data(self.data, event.data)
+        self.count += 1
+        self.last_seen = now
+        if event.seq is not None:
+            self.seqs.append(event.seq)
+
+
+class EventCoalescer:
+    """
+    Coalescing and rate-limiting stage in front of the dispatcher
+
+    The first event of a key is delivered at once (if the rate limit
+    allows) and opens a window. Repeats inside the window are held; when
+    the window slides shut (no repeat for coalesce_window seconds, and at
+    most MAX_DELAY_WINDOWS windows after it opened) they are delivered as
+    one summary with data['coalesced_count'] and the held events' list
+    fields merged (see _merge_data). Rate-limited events are held the same
+    way until a token is available, so nothing is lost.
+    A summary carries the journal seqs of every event it merges
+    (merged_seqs), so all of them are acknowledged when it is delivered.
+    """
+
+    MAX_DELAY_WINDOWS = 4  # A summary is delayed at most this many windows
+
+    def __init__(self, dispatch: Callable[[ClassifiedEvent, bool], Awaitable[Any]], enabled: bool = True):
+        """
+        Args:
+            dispatch: async dispatch(event, wait) (EventDispatcher.submit)
+            enabled: False passes every event straight through
+        """
+        self.dispatch = dispatch
+        self.enabled = enabled
+        self._groups: Dict[Tuple[str, Any], _Group] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._pending = set()
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.summaries = 0
+
+    def _bucket(self, template: ClassifiedTemplate, event_type: str, now: float) -> Optional[TokenBucket]:
+        if template.rate is None:
+            return None
+        bucket = self._buckets.get(event_type)
+        if bucket is None or bucket.rate != template.rate or bucket.capacity != template.burst:
+            # New type, or its limit changed with an ontology reload
+            bucket = self._buckets[event_type] = TokenBucket(template.rate, template.burst, now)
+        return bucket
+
+    async def submit(self, event: ClassifiedEvent, wait: bool = False):
+        """
+        Deliver, coalesce or hold a classified event
+
+        Args:
+            event: Classified event
+            wait: Passed to dispatch when the event is delivered right away
+        """
+        template = event.classified_template
+        if not self.enabled or (not template.coalesce_window and template.rate is None):
+            return await self.dispatch(event, wait)
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        key = (event.event_type, event.data.get('source'))
+        group = self._groups.get(key)
+        if group is not None:
+            group.add(event, now)
+            self.coalesced += 1
+            self._schedule(key, group, template)
+            return
+
+        bucket = self._bucket(template, event.event_type, now)
+        if bucket is None or bucket.take(now):
+            if template.coalesce_window:
+                group = self._groups[key] = _Group(now)
+                self._schedule(key, group, template)
+            return await self.dispatch(event, wait)
+
+        self.rate_limited += 1
+        group = self._groups[key] = _Group(now)
+        group.add(event, now)
+        self._schedule(key, group, template)
+
+    def _schedule(self, key: Tuple[str, Any], group: _Group, template: ClassifiedTemplate):
+        """(Re)arm the group's flush timer: sliding window, capped, token-aware"""
+        loop = asyncio.get_running_loop()
+        window = template.coalesce_window
+        flush_at = min(group.last_seen + window, group.opened_at + window * self.MAX_DELAY_WINDOWS)
+        bucket = self._buckets.get(key[0]) if template.rate is not None else None
+        if bucket is not None and group.count:
+            flush_at = max(flush_at, loop.time() + bucket.wait_time(loop.time()))
+        if group.timer is not None:
+            group.timer.cancel()
+        group.timer = loop.call_at(flush_at, self._flush, key)
+
+    def _flush(self, key: Tuple[str, Any]):
+        group = self._groups.pop(key, None)
+        if group is None or not group.count:
+            return  # Window closed without repeats
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        template = group.event.classified_template
+        bucket = self._bucket(template, group.event.event_type, now)
+        if bucket is not None and not bucket.take(now):
+            # Still rate limited: keep holding (and counting) until a token frees up
+            group.opened_at = group.last_seen = now
+            self._groups[key] = group
+            self._schedule(key, group, template)
+            return
+
+        self._emit(group)
+        if template.coalesce_window:
+            # Keep coalescing while the storm continues
+            self._groups[key] = reopened = _Group(now)
+            self._schedule(key, reopened, template)
+
+    def _emit(self, group: _Group):
+        event = group.event
+        if group.count > 1:
+            self.summaries += 1
+            event = event.with_data(dict(
+                group.data,
+                coalesced_count=group.count,
+                first_seen=datetime.fromtimestamp(group.first_seen).isoformat(),
+                last_seen=datetime.fromtimestamp(event.created).isoformat()
+            ))
+            event.merged_seqs = tuple(group.seqs)
+        task = asyncio.get_running_loop().create_task(self.dispatch(event, False))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self):
+        """Deliver everything held back now, ignoring windows and rate limits"""
+        groups, self._groups = self._groups, {}
+        for group in groups.values():
+            if group.timer is not None:
+                group.timer.cancel()
+            if group.count:
+                self._emit(group)
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stop(self):
+        held = sum(group.count for group in self._groups.values())
+        for group in self._groups.values():
+            if group.timer is not None:
+                group.timer.cancel()
+        self._groups = {}
+        if held:
+            logger.warning(f"Coalescer stopped with {held} held events")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open_windows": len(self._groups),
+            "held": sum(group.count for group in self._groups.values()),
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "summaries": self.summaries,
+        }
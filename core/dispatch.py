@@ -0,0 +1,554 @@
+"""
+CIT Voice event dispatch
+
+Classified events go into a bounded priority queue (one FIFO lane per
+ontology priority) and are delivered to handlers by a fixed worker pool.
+Critical events are always taken before action and background ones, and
+the queue bound gives back-pressure instead of unbounded task growth.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+
+from core.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Ontology priority -> lane (lower is served first)
+PRIORITY_RANKS = {"critical": 0, "action": 1, "background": 2}
+BACKGROUND_RANK = PRIORITY_RANKS["background"]
+
+OVERFLOW_POLICIES = ("block", "drop_oldest_background", "spill")
+
+
+class QueueFull(Exception):
+    """Raised by PriorityEventQueue.put_nowait when the queue is full"""
+
+
+def _wakeup_next(waiters: deque):
+    while waiters:
+        waiter = waiters.popleft()
+        if not waiter.done():
+            waiter.set_result(None)
+            return
+
+
+class PriorityEventQueue:
+    """
+    Bounded asyncio queue with one FIFO lane per priority rank
+
+    get() returns the oldest item of the highest-priority non-empty lane.
+    All operations are O(1), including dropping the oldest item of a lane.
+    """
+
+    def __init__(self, maxsize: int, ranks: int = len(PRIORITY_RANKS)):
+        self.maxsize = maxsize
+        self._lanes = [deque() for _ in range(ranks)]
+        self._size = 0
+        self._getters = deque()
+        self._putters = deque()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def lane_sizes(self) -> List[int]:
+        return [len(lane) for lane in self._lanes]
+
+    def full(self) -> bool:
+        return self._size >= self.maxsize
+
+    def put_nowait(self, rank: int, item: Any):
+        if self.full():
+            raise QueueFull()
+        self._lanes[rank].append(item)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        _wakeup_next(self._getters)
+
+    async def put(self, rank: int, item: Any):
+        """Wait for a free slot, then enqueue"""
+        loop = asyncio.get_running_loop()
+        while self.full():
+            putter = loop.create_future()
+            self._putters.append(putter)
+            try:
+                await putter
+            except BaseException:
+                putter.cancel()
+                if not self.full() and not putter.cancelled():
+                    _wakeup_next(self._putters)
+                raise
+        self.put_nowait(rank, item)
+
+    def drop_oldest(self, rank: int) -> Optional[Any]:
+        """Remove and return the oldest item of a lane (None if empty)"""
+        lane = self._lanes[rank]
+        if not lane:
+            return None
+        item = lane.popleft()
+        self._size -= 1
+        self.task_done()
+        _wakeup_next(self._putters)
+        return item
+
+    async def get(self) -> Any:
+        loop = asyncio.get_running_loop()
+        while not self._size:
+            getter = loop.create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                getter.cancel()
+                if self._size and not getter.cancelled():
+                    _wakeup_next(self._getters)
+                raise
+        for lane in self._lanes:
+            if lane:
+                item = lane.popleft()
+                break
+        self._size -= 1
+        _wakeup_next(self._putters)
+        return item
+
+    def task_done(self):
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+
+class CircuitBreaker:
+    """
+    Per-handler circuit breaker
+
+    closed: calls pass; failure_threshold consecutive failures open it.
+    open: calls are rejected until reset_timeout has passed.
+    half_open: one trial call; success closes, failure re-opens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def release_trial(self):
+        """The half-open trial ended without a result (cancelled): allow another one"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class _HandlerState:
+    """Breaker, latency and failure counters of one handler"""
+    __slots__ = ("name", "breaker", "latency", "timeout", "failures", "timeouts")
+
+    def __init__(self, name: str, breaker: CircuitBreaker, timeout: float):
+        self.name = name
+        self.breaker = breaker
+        self.latency = LatencyHistogram()
+        self.timeout = timeout
+        self.failures = 0
+        self.timeouts = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.state,
+            "latency_ms": self.latency.stats(),
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.breaker.rejected,
+            "trips": self.breaker.trips,
+        }
+
+
+class _Job:
+    __slots__ = ("event", "rank", "enqueued_at", "done")
+
+    def __init__(self, event: Dict[str, Any], rank: int, done: Optional[asyncio.Future] = None):
+        self.event = event
+        self.rank = rank
+        self.enqueued_at = time.perf_counter()
+        self.done = done
+
+
+class EventDispatcher:
+    """
+    Bounded priority dispatch of classified events to handlers
+
+    Each handler call runs under a timeout and a circuit breaker: while a
+    handler's breaker is open its events fail fast (to the dead-letter
+    file, if configured) instead of piling up behind a sick sink.
+
+    Overflow policies (queue full):
+    - block: submit() waits for a free slot
+    - drop_oldest_background: the oldest queued background event is
+      dropped; a background event is dropped itself when none is queued;
+      action/critical events wait instead of being dropped
+    - spill: events go to a JSON Lines file and are re-queued as the
+      queue drains; events left in the file by a previous run are
+      re-queued first. File I/O runs in a worker thread, and re-read
+      records are turned back into handler events by restore_event
+    """
+
+    WORKERS = 4
+    MAX_QUEUE_SIZE = 10000
+    HANDLER_CONCURRENCY = 8  # Concurrent calls per handler
+    SPILL_REFILL_BATCH = 1000  # Spilled events re-queued per refill
+    HANDLER_TIMEOUT_SECONDS = 30.0
+    BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a breaker
+    BREAKER_RESET_SECONDS = 30.0  # Open -> half-open after this long
+
+    def __init__(self, handlers: List, call_handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+                 workers: Optional[int] = None, max_queue_size: Optional[int] = None,
+                 overflow: str = "drop_oldest_background", spill_path: Optional[str] = None,
+                 handler_concurrency: Optional[Dict[str, int]] = None,
+                 handler_timeout: Optional[float] = None, handler_timeouts: Optional[Dict[str, float]] = None,
+                 breaker_failure_threshold: Optional[int] = None, breaker_reset_timeout: Optional[float] = None,
+                 dead_letter_path: Optional[str] = None,
+                 restore_event: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """
+        Args:
+            handlers: Registered handlers (shared list, may grow later)
+            call_handler: async call_handler(handler, event) returning True on
+                          success and False on failure; never raises
+            workers: Worker pool size
+            max_queue_size: Queue bound (back-pressure / overflow threshold)
+            overflow: One of OVERFLOW_POLICIES
+            spill_path: JSON Lines file for the spill policy
+            handler_concurrency: Concurrency limit per handler class name
+                                 (default HANDLER_CONCURRENCY)
+            handler_timeout: Default seconds per handler call
+            handler_timeouts: Timeout per handler class name
+            breaker_failure_threshold: Consecutive failures that open a breaker
+            breaker_reset_timeout: Seconds before an open breaker lets a trial call through
+            dead_letter_path: JSON Lines file for failed and rejected deliveries
+            restore_event: Rebuilds a handler event from a spill record
+                           {"event", "seq", "merged_seqs"} (default: the
+                           stored event dict)
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("Overflow policy 'spill' requires spill_path")
+        self.handlers = handlers
+        self.call_handler = call_handler
+        self.workers = workers or self.WORKERS
+        self.max_queue_size = max_queue_size or self.MAX_QUEUE_SIZE
+        self.overflow = overflow
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.handler_concurrency = handler_concurrency or {}
+        self.handler_timeout = handler_timeout or self.HANDLER_TIMEOUT_SECONDS
+        self.handler_timeouts = handler_timeouts or {}
+        self.breaker_failure_threshold = breaker_failure_threshold or self.BREAKER_FAILURE_THRESHOLD
+        self.breaker_reset_timeout = (self.BREAKER_RESET_SECONDS if breaker_reset_timeout is None
+                                      else breaker_reset_timeout)
+        self.dead_letter_path = Path(dead_letter_path) if dead_letter_path else None
+        self.restore_event = restore_event or (lambda record: record["event"])
+        self._handler_states = {}
+        self.dead_lettered = 0
+        self._queue = None
+        self._loop = None
+        self._tasks = []
+        self._semaphores = {}
+        self._spilled = 0  # Events in the spill file (or being written) not yet re-queued
+        self._spill_offset = 0
+        self._spill_lock = None
+        self._refilling = None
+        if self.spill_path is not None and self.spill_path.exists():
+            with open(self.spill_path, 'rb') as f:
+                self._spilled = sum(1 for line in f if line.strip())
+            if self._spilled:
+                logger.info(f"{self._spilled} spilled events left from a previous run")
+        self.wait_latency = [LatencyHistogram() for _ in PRIORITY_RANKS]
+        self.processed = 0
+        self.dropped = 0
+        self.spilled = 0
+
+    def _ensure_started(self):
+        """Start the worker pool on the running loop (restarted per loop)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queue = PriorityEventQueue(self.max_queue_size)
+        self._semaphores = {}
+        self._spill_lock = asyncio.Lock()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        if self._spilled:
+            self._refilling = loop.create_task(self._refill())
+
+    def _semaphore(self, handler) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(id(handler))
+        if semaphore is None:
+            limit = self.handler_concurrency.get(handler.__class__.__name__, self.HANDLER_CONCURRENCY)
+            semaphore = self._semaphores[id(handler)] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def submit(self, event: Dict[str, Any], wait: bool = False):
+        """
+        Queue a classified event
+
+        Args:
+            event: Classified event (with 'priority')
+            wait: Return only after all handlers processed it
+        """
+        self._ensure_started()
+        rank = PRIORITY_RANKS.get(event.get('priority'), BACKGROUND_RANK)
+        job = _Job(event, rank, self._loop.create_future() if wait else None)
+
+        if self._queue.full() or (self._spilled and self.overflow == "spill"):
+            if not await self._overflow(job):
+                return
+        else:
+            self._queue.put_nowait(rank, job)
+
+        if job.done is not None:
+            await job.done
+
+    async def _overflow(self, job: _Job) -> bool:
+        """Apply the overflow policy; returns False if the event was not queued"""
+        if self.overflow == "drop_oldest_background":
+            dropped = self._queue.drop_oldest(BACKGROUND_RANK)
+            if dropped is None and job.rank == BACKGROUND_RANK:
+                dropped = job
+            if dropped is not None:
+                self.dropped += 1
+                logger.warning(f"Event queue full, dropped background event "
+                               f"{dropped.event.get('event_type')}")
+                if dropped.done is not None and not dropped.done.done():
+                    dropped.done.set_result(False)
+                if dropped is job:
+                    return False
+                self._queue.put_nowait(job.rank, job)
+                return True
+
+        elif self.overflow == "spill" and job.rank != 0:
+            # Critical events bypass the spill file and wait for a slot
+            await self._spill(job)
+            return False
+
+        await self._queue.put(job.rank, job)
+        return True
+
+    async def _spill(self, job: _Job):
+        record = {"event": dict(job.event), "seq": getattr(job.event, 'seq', None),
+                  "merged_seqs": list(getattr(job.event, 'merged_seqs', ()))}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        # Counted before the write, so later events keep spilling in order
+        self._spilled += 1
+        if job.done is not None and not job.done.done():
+            job.done.set_result(False)
+        async with self._spill_lock:
+            try:
+                await asyncio.to_thread(self._append_spill, line)
+            except OSError as e:
+                self._spilled -= 1
+                self.dropped += 1
+                logger.error(f"Failed to spill event {job.event.get('event_type')}: {e}")
+                return
+        self.spilled += 1
+
+    def _append_spill(self, line: str):
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def _read_spill(self, offset: int, limit: int) -> List[tuple]:
+        """
+        Returns:
+            [(record or None if corrupt, offset after its line), ...], at most limit
+        """
+        records = []
+        with open(self.spill_path, 'r', encoding='utf-8') as f:
+            f.seek(offset)
+            while len(records) < limit:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                records.append((record, f.tell()))
+        return records
+
+    async def _refill(self):
+        """Re-queue spilled events while there is room"""
+        if not self._spilled or self._queue.full():
+            return
+        async with self._spill_lock:
+            free = min(self.max_queue_size - self._queue.qsize(), self.SPILL_REFILL_BATCH)
+            if free <= 0 or not self._spilled:
+                return
+            try:
+                records = await asyncio.to_thread(self._read_spill, self._spill_offset, free)
+            except OSError as e:
+                logger.error(f"Failed to read spill file {self.spill_path}: {e}")
+                return
+            for record, offset in records:
+                if self._queue.full():
+                    break  # Critical events took the room meanwhile; the rest stays in the file
+                self._spill_offset = offset
+                self._spilled -= 1
+                if record is None:
+                    logger.warning(f"Skipping corrupt spill record in {self.spill_path}")
+                    continue
+                if "event" not in record:
+                    record = {"event": record}  # Written before seq was recorded
+                event = self.restore_event(record)
+                rank = PRIORITY_RANKS.get(event.get('priority'), BACKGROUND_RANK)
+                self._queue.put_nowait(rank, _Job(event, rank))
+            if not self._spilled:
+                # Everything re-queued: start the spill file afresh
+                await asyncio.to_thread(self.spill_path.unlink, missing_ok=True)
+                self._spill_offset = 0
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                self.wait_latency[job.rank].record((time.perf_counter() - job.enqueued_at) * 1000)
+                await asyncio.gather(*(self.deliver(handler, job.event) for handler in list(self.handlers)))
+                self.processed += 1
+            finally:
+                if job.done is not None and not job.done.done():
+                    job.done.set_result(True)
+                # Refill before task_done, so join() never sees an empty
+                # queue while spilled events are still to be re-queued
+                if self._spilled and self._queue.qsize() < self.max_queue_size // 2:
+                    await self._refill()
+                self._queue.task_done()
+
+    def _handler_state(self, handler) -> _HandlerState:
+        state = self._handler_states.get(id(handler))
+        if state is None:
+            name = handler.__class__.__name__
+            state = self._handler_states[id(handler)] = _HandlerState(
+                name,
+                CircuitBreaker(self.breaker_failure_threshold, self.breaker_reset_timeout),
+                self.handler_timeouts.get(name, self.handler_timeout)
+            )
+        return state
+
+    async def deliver(self, handler, event: Dict[str, Any]):
+        """Call one handler under its concurrency limit, timeout and breaker"""
+        state = self._handler_state(handler)
+        if not state.breaker.allow():
+            self._dead_letter(state.name, event, "circuit_open")
+            return
+        trial = state.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            async with self._semaphore(handler):
+                started = time.perf_counter()
+                try:
+                    ok = await asyncio.wait_for(self.call_handler(handler, event), state.timeout)
+                except asyncio.TimeoutError:
+                    state.timeouts += 1
+                    logger.error(f"Handler {state.name} timed out after {state.timeout}s")
+                    ok, reason = False, "timeout"
+                else:
+                    reason = "error"
+                state.latency.record((time.perf_counter() - started) * 1000)
+        except asyncio.CancelledError:
+            # A cancelled trial (dispatcher stop) must not leave the breaker half-open forever
+            if trial:
+                state.breaker.release_trial()
+            raise
+        if ok is False:
+            state.failures += 1
+            was_open = state.breaker.state == CircuitBreaker.OPEN
+            state.breaker.record_failure()
+            if not was_open and state.breaker.state == CircuitBreaker.OPEN:
+                logger.warning(f"Circuit breaker opened for {state.name}")
+            self._dead_letter(state.name, event, reason)
+        else:
+            if state.breaker.state != CircuitBreaker.CLOSED:
+                logger.info(f"Circuit breaker closed for {state.name}")
+            state.breaker.record_success()
+
+    def _dead_letter(self, handler_name: str, event: Dict[str, Any], reason: str):
+        """Record an undelivered event (no-op without dead_letter_path)"""
+        if self.dead_letter_path is None:
+            return
+        self.dead_lettered += 1
+        record = {"handler": handler_name, "reason": reason, "at": time.time(), "event": dict(event)}
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    async def join(self):
+        """Wait until every queued (and spilled) event was handled"""
+        while self._queue is not None:
+            await self._queue.join()
+            if not self._spilled:
+                return
+            await self._refill()
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._refilling is not None:
+            self._refilling.cancel()
+            self._refilling = None
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = self._queue.lane_sizes() if self._queue is not None else [0] * len(PRIORITY_RANKS)
+        return {
+            "queued": dict(zip(PRIORITY_RANKS, lanes)),
+            "spilled_pending": self._spilled,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "dead_lettered": self.dead_lettered,
+            "handlers": {state.name: state.stats() for state in self._handler_states.values()},
+            "wait_ms": {
+                priority: self.wait_latency[rank].stats()
+                for priority, rank in PRIORITY_RANKS.items()
+            },
+        }
@@ -0,0 +1,287 @@
+"""
+Write-ahead event journal for CIT Voice
+
+Every dispatched event is appended to a segmented, append-only journal
+before handlers see it, and acknowledged per handler once delivered.
+Entries not acknowledged by all their handlers are replayed at the next
+start, which gives at-least-once delivery across crashes and handler
+outages.
+
+Record layout: 4-byte length, 4-byte CRC32 and 1-byte kind (big endian),
+then a JSON payload. A torn record at the tail of a segment (crash during
+a write) is detected by length/CRC and cut off on recovery.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">IIB")
+KIND_EVENT = 1
+KIND_ACK = 2
+
+
+def _encode(kind: int, payload: Dict[str, Any]) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return _HEADER.pack(len(body), zlib.crc32(body, kind), kind) + body
+
+
+def _fsync_quietly(fd: int):
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Segment closed by a rotation meanwhile (rotation fsyncs itself)
+
+
+def _read_records(path: Path) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+    """
+    Returns:
+        ([(kind, payload), ...], offset of the end of the last valid record)
+    """
+    data = path.read_bytes()
+    records = []
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, crc, kind = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + length
+        if end > len(data):
+            break
+        body = data[offset + _HEADER.size:end]
+        if zlib.crc32(body, kind) != crc:
+            break
+        try:
+            records.append((kind, json.loads(body)))
+        except ValueError:
+            break
+        offset = end
+    return records, offset
+
+
+class EventJournal:
+    """
+    Segmented append-only journal with per-handler acks
+
+    Writes go straight to the OS (one write() per record), so a process
+    crash loses nothing; fsync runs off-loop at most every
+    FSYNC_INTERVAL_SECONDS, batching many records per fsync. Fully
+    acknowledged segments are deleted oldest first: a segment also holds
+    acks for events in older segments, so it is kept until those are gone.
+    Above max_bytes the oldest segments are dropped even if
+    unacknowledged, which bounds disk usage.
+    """
+
+    SEGMENT_BYTES = 4 * 1024 * 1024
+    MAX_BYTES = 256 * 1024 * 1024
+    FSYNC_INTERVAL_SECONDS = 0.05
+    SUFFIX = ".journal"
+
+    def __init__(self, directory: str, segment_bytes: Optional[int] = None,
+                 max_bytes: Optional[int] = None, fsync_interval: Optional[float] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes or self.SEGMENT_BYTES
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.fsync_interval = self.FSYNC_INTERVAL_SECONDS if fsync_interval is None else fsync_interval
+        self._pending: Dict[int, Tuple[int, set]] = {}  # seq -> (segment, handlers left)
+        self._segment_unacked: Dict[int, int] = {}
+        self._segment_sizes: Dict[int, int] = {}
+        self._recovered: List[Tuple[int, Dict[str, Any], List[str]]] = []
+        self._next_seq = 1
+        self._fd = None
+        self._segment = 0
+        self._dirty = False
+        self._fsync_handle = None
+        self.appended = 0
+        self.acked = 0
+        self.fsyncs = 0
+        self.dropped = 0
+        self._recover()
+        self._open_segment(max(self._segment_sizes, default=0) + 1)
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"{segment:08d}{self.SUFFIX}"
+
+    def _recover(self):
+        """Rebuild unacknowledged entries from the segments on disk"""
+        entries: Dict[int, Tuple[int, Dict[str, Any], set]] = {}
+        for path in sorted(self.directory.glob(f"*{self.SUFFIX}")):
+            segment = int(path.stem)
+            records, valid_end = _read_records(path)
+            if valid_end < path.stat().st_size:
+                logger.warning(f"Journal {path.name}: cut torn tail at byte {valid_end}")
+                with open(path, "r+b") as f:
+                    f.truncate(valid_end)
+            self._segment_sizes[segment] = valid_end
+            self._segment_unacked.setdefault(segment, 0)
+            for kind, payload in records:
+                seq = payload["seq"]
+                self._next_seq = max(self._next_seq, seq + 1)
+                if kind == KIND_EVENT:
+                    if payload["handlers"]:
+                        entries[seq] = (segment, payload["event"], set(payload["handlers"]))
+                elif kind == KIND_ACK and seq in entries:
+                    entries[seq][2].discard(payload["handler"])
+                    if not entries[seq][2]:
+                        del entries[seq]
+
+        for seq in sorted(entries):
+            segment, event, handlers = entries[seq]
+            self._pending[seq] = (segment, handlers)
+            self._segment_unacked[segment] += 1
+            self._recovered.append((seq, event, sorted(handlers)))
+        self._delete_acked_segments()
+        if self._recovered:
+            logger.info(f"Journal: {len(self._recovered)} unacknowledged events to replay")
+
+    def _open_segment(self, segment: int):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._segment = segment
+        self._fd = os.open(self._segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_sizes.setdefault(segment, 0)
+        self._segment_unacked.setdefault(segment, 0)
+
+    def _delete_acked_segments(self):
+        """Delete fully acknowledged closed segments, stopping at the first one still needed"""
+        for segment in sorted(self._segment_sizes):
+            if segment == self._segment or self._segment_unacked.get(segment):
+                break
+            self._delete_segment(segment)
+
+    def _delete_segment(self, segment: int):
+        self._segment_path(segment).unlink(missing_ok=True)
+        self._segment_sizes.pop(segment, None)
+        self._segment_unacked.pop(segment, None)
+
+    def _write(self, record: bytes):
+        os.write(self._fd, record)
+        self._segment_sizes[self._segment] += len(record)
+        self._schedule_fsync()
+        if self._segment_sizes[self._segment] >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self.sync()
+        self._open_segment(self._segment + 1)
+        self._delete_acked_segments()
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        """Drop the oldest closed segments while over max_bytes"""
+        while sum(self._segment_sizes.values()) > self.max_bytes and len(self._segment_sizes) > 1:
+            oldest = min(self._segment_sizes)
+            lost = [seq for seq, (segment, _) in self._pending.items() if segment == oldest]
+            for seq in lost:
+                del self._pending[seq]
+            self.dropped += len(lost)
+            logger.warning(f"Journal over {self.max_bytes} bytes: dropped segment {oldest} "
+                           f"with {len(lost)} unacknowledged events")
+            self._delete_segment(oldest)
+            self._delete_acked_segments()
+
+    def _schedule_fsync(self):
+        self._dirty = True
+        if self._fsync_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop: sync() / close() make it durable
+        self._fsync_handle = loop.call_later(self.fsync_interval, self._fsync_soon, loop)
+
+    def _fsync_soon(self, loop: asyncio.AbstractEventLoop):
+        self._fsync_handle = None
+        if self._dirty and self._fd is not None:
+            self._dirty = False
+            self.fsyncs += 1
+            loop.run_in_executor(None, _fsync_quietly, self._fd)
+
+    def replay_entries(self) -> List[Tuple[int, Dict[str, Any], List[str]]]:
+        """
+        Entries recovered at open that are still unacknowledged (returned once)
+
+        Returns:
+            [(seq, event data, handler names left), ...] in journal order
+        """
+        recovered, self._recovered = self._recovered, []
+        return [
+            (seq, event, [name for name in handlers if name in self._pending[seq][1]])
+            for seq, event, handlers in recovered
+            if seq in self._pending
+        ]
+
+    def append(self, event: Dict[str, Any], handlers: List[str]) -> int:
+        """
+        Record an event before dispatch
+
+        Args:
+            event: Event data (JSON serialisable; other values use str())
+            handlers: Names of the handlers that must acknowledge it
+
+        Returns:
+            Journal sequence number
+
+        Raises:
+            RuntimeError: If the journal is closed
+        """
+        if self._fd is None:
+            raise RuntimeError("Event journal is closed")
+        seq = self._next_seq
+        self._next_seq += 1
+        self._write(_encode(KIND_EVENT, {"seq": seq, "event": event, "handlers": handlers}))
+        self.appended += 1
+        if handlers:
+            self._pending[seq] = (self._segment, set(handlers))
+            self._segment_unacked[self._segment] += 1
+        return seq
+
+    def ack(self, seq: int, handler: str):
+        """Record that a handler processed the event"""
+        entry = self._pending.get(seq)
+        if entry is None or handler not in entry[1] or self._fd is None:
+            return  # Unknown, already acknowledged, or closed (replayed next start)
+        self._write(_encode(KIND_ACK, {"seq": seq, "handler": handler}))
+        self.acked += 1
+        segment, handlers = entry
+        handlers.discard(handler)
+        if not handlers:
+            del self._pending[seq]
+            left = self._segment_unacked.get(segment, 0) - 1
+            if segment in self._segment_unacked:
+                self._segment_unacked[segment] = left
+            if left <= 0 and segment != self._segment:
+                self._delete_acked_segments()
+
+    def sync(self):
+        """fsync the active segment now"""
+        if self._fd is not None and self._dirty:
+            self._dirty = False
+            self.fsyncs += 1
+            os.fsync(self._fd)
+
+    def close(self):
+        if self._fsync_handle is not None:
+            self._fsync_handle.cancel()
+            self._fsync_handle = None
+        self.sync()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "segments": len(self._segment_sizes),
+            "bytes": sum(self._segment_sizes.values()),
+            "appended": self.appended,
+            "acked": self.acked,
+            "fsyncs": self.fsyncs,
+            "dropped": self.dropped,
+        }
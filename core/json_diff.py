@@ -0,0 +1,98 @@
+"""
+Structural JSON diff
+
+json_diff() produces a JSON-Patch style (RFC 6902) list of add / remove /
+replace operations between two parsed JSON documents. Equal subtrees are
+skipped with a single C-level == comparison, so the Python-level recursion
+only descends into changed subtrees. The comparison itself (like parsing
+each body and keeping the previous document) is still O(document); callers
+avoid it for unchanged states by skipping 304 and byte-identical responses
+before parsing (see ConditionalPoller).
+"""
+
+from typing import Dict, Any, List
+
+_MISSING = object()
+
+
+def escape_pointer(key: Any) -> str:
+    """Escape one JSON Pointer (RFC 6901) reference token"""
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def unescape_pointer(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def json_diff(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    Diff two JSON documents
+
+    Args:
+        old: Previous document
+        new: Current document
+        path: JSON Pointer prefix of this subtree
+
+    Returns:
+        Operations {"op", "path", "value"?}; applying them to old gives new
+    """
+    ops = []
+    _diff(old, new, path, ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: str, ops: List[Dict[str, Any]]):
+    if old is new or (type(old) is type(new) and old == new):
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, old_value in old.items():
+            new_value = new.get(key, _MISSING)
+            if new_value is _MISSING:
+                ops.append({"op": "remove", "path": f"{path}/{escape_pointer(key)}"})
+            else:
+                _diff(old_value, new_value, f"{path}/{escape_pointer(key)}", ops)
+        for key, new_value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{escape_pointer(key)}", "value": new_value})
+    elif isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for index in range(common):
+            _diff(old[index], new[index], f"{path}/{index}", ops)
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        # Remove from the end so earlier indexes stay valid
+        for index in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+    else:
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def apply_patch(document: Any, ops: List[Dict[str, Any]]) -> Any:
+    """
+    Apply json_diff() operations in place
+
+    Returns:
+        The patched document (a new value when the root is replaced)
+    """
+    for op in ops:
+        tokens = [unescape_pointer(token) for token in op["path"].split("/")[1:]]
+        if not tokens:
+            document = op["value"]
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = int(last)
+            if op["op"] == "add":
+                parent.insert(index, op["value"])
+            elif op["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = op["value"]
+        elif op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = op["value"]
+    return document
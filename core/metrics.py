@@ -0,0 +1,87 @@
+"""
+Lightweight runtime metrics for CIT Voice
+
+Sampling is in-process and dependency-free; stats() returns plain dicts
+suitable for logging.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LatencyHistogram:
+    """
+    Rolling window of latency samples (milliseconds)
+
+    Keeps the last `window` samples; percentiles are computed on demand.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, value_ms: float):
+        self._samples.append(value_ms)
+        self.count += 1
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        return {
+            "count": self.count,
+            "p50_ms": round(_percentile(samples, 0.50), 3),
+            "p99_ms": round(_percentile(samples, 0.99), 3),
+            "max_ms": round(samples[-1], 3) if samples else 0.0,
+        }
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag
+
+    A background task sleeps for `interval` seconds and records how much
+    later than requested it was woken up. Any blocking call on the loop
+    shows up directly as lag.
+    """
+
+    DEFAULT_INTERVAL_SECONDS = 0.01
+    SLOW_LAG_MS = 100.0  # Log a warning when a single stall exceeds this
+
+    def __init__(self, interval: Optional[float] = None, window: int = 1024):
+        self.interval = interval or self.DEFAULT_INTERVAL_SECONDS
+        self.histogram = LatencyHistogram(window)
+        self._task = None
+
+    def start(self):
+        """Start sampling on the running loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.histogram.record(lag_ms)
+            if lag_ms > self.SLOW_LAG_MS:
+                logger.warning(f"Event loop blocked for {lag_ms:.1f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.histogram.stats()
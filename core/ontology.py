@@ -0,0 +1,236 @@
+"""
+Compiled CIT Voice ontology
+
+ontology.json is compiled once into an immutable table of
+ClassifiedTemplate records (one per event type), so classifying an event
+is a single dict lookup plus one small slotted object.
+"""
+
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Iterator
+
+DEFAULT_LEVEL = '1'
+DEFAULT_EMOJI = '⚪'
+DEFAULT_PRIORITY = 'background'
+
+
+def validate_ontology(raw: Any) -> None:
+    """
+    Check an ontology before it replaces the running one
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Ontology must be a JSON object")
+    levels = raw.get('event_levels', {})
+    event_types = raw.get('event_types', {})
+    if not isinstance(levels, dict) or not isinstance(event_types, dict):
+        raise ValueError("event_levels and event_types must be objects")
+    for level, config in levels.items():
+        if not isinstance(config, dict):
+            raise ValueError(f"Level {level!r} must be an object")
+    for event_type, config in event_types.items():
+        if not isinstance(config, dict):
+            raise ValueError(f"Event type {event_type!r} must be an object")
+        level = config.get('level', DEFAULT_LEVEL)
+        if level not in levels:
+            raise ValueError(f"Event type {event_type!r} uses unknown level {level!r}")
+        if not isinstance(config.get('template', ''), str):
+            raise ValueError(f"Event type {event_type!r} template must be a string")
+        if not isinstance(config.get('media', ''), str):
+            raise ValueError(f"Event type {event_type!r} media must be a path string")
+    mappings = raw.get('semantic_mappings', {})
+    state_paths = raw.get('state_paths', {})
+    if not isinstance(mappings, dict) or not isinstance(state_paths, dict):
+        raise ValueError("semantic_mappings and state_paths must be objects")
+    for path, category in state_paths.items():
+        if not path.startswith('/'):
+            raise ValueError(f"State path {path!r} must be a JSON Pointer starting with '/'")
+        if category is not None and category not in mappings:
+            raise ValueError(f"State path {path!r} maps to unknown semantic mapping {category!r}")
+    for name, config in list(levels.items()) + list(event_types.items()):
+        window = config.get('coalesce_window_seconds', 0)
+        if not isinstance(window, (int, float)) or window < 0:
+            raise ValueError(f"{name!r}: coalesce_window_seconds must be a non-negative number")
+        rate_limit = config.get('rate_limit')
+        if rate_limit is not None:
+            if (not isinstance(rate_limit, dict)
+                    or not isinstance(rate_limit.get('per_minute'), (int, float))
+                    or rate_limit['per_minute'] <= 0
+                    or not isinstance(rate_limit.get('burst', 1), int)
+                    or rate_limit.get('burst', 1) < 1):
+                raise ValueError(f"{name!r}: rate_limit needs per_minute > 0 and integer burst >= 1")
+
+
+class ClassifiedTemplate:
+    """Precomputed classification of one event type (immutable)"""
+    __slots__ = ('event_type', 'level', 'emoji', 'priority', 'template',
+                 'requires_media', 'interactive', 'coalesce_window', 'rate', 'burst')
+
+    def __init__(self, event_type: str, level: str, emoji: str, priority: str,
+                 template: str, requires_media: bool, interactive: bool,
+                 coalesce_window: float = 0.0, rate: Optional[float] = None, burst: int = 1):
+        """
+        Args:
+            coalesce_window: Seconds during which repeats of the same
+                             (event_type, source) are merged; 0 disables
+            rate: Sustained rate limit in events per second (None: unlimited)
+            burst: Token-bucket capacity for the rate limit
+        """
+        object.__setattr__(self, 'event_type', event_type)
+        object.__setattr__(self, 'level', level)
+        object.__setattr__(self, 'emoji', emoji)
+        object.__setattr__(self, 'priority', priority)
+        object.__setattr__(self, 'template', template)
+        object.__setattr__(self, 'requires_media', requires_media)
+        object.__setattr__(self, 'interactive', interactive)
+        object.__setattr__(self, 'coalesce_window', coalesce_window)
+        object.__setattr__(self, 'rate', rate)
+        object.__setattr__(self, 'burst', burst)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ClassifiedTemplate is immutable")
+
+    def __repr__(self) -> str:
+        return f"ClassifiedTemplate({self.event_type!r}, level={self.level!r})"
+
+
+class ClassifiedEvent(Mapping):
+    """
+    Classified event handed to handlers
+
+    Read-only mapping with the keys of the former classification dict
+    (level, emoji, priority, template, requires_media, interactive,
+    event_type, timestamp, data). Template fields are shared with the
+    ClassifiedTemplate; the ISO timestamp is formatted on first access.
+    """
+    __slots__ = ('_template', 'event_type', 'data', 'created', '_timestamp', 'seq', 'merged_seqs')
+
+    KEYS = ('level', 'emoji', 'priority', 'template', 'requires_media', 'interactive',
+            'event_type', 'timestamp', 'data')
+    _TEMPLATE_KEYS = frozenset(('level', 'emoji', 'priority', 'template',
+                                'requires_media', 'interactive'))
+
+    def __init__(self, template: ClassifiedTemplate, event_type: str, data: Dict[str, Any]):
+        self._template = template
+        self.event_type = event_type
+        self.data = data
+        self.created = time.time()
+        self._timestamp = None
+        self.seq = None  # Journal sequence number, set when journaled
+        self.merged_seqs = ()  # Journal seqs of coalesced originals, acked with this event
+
+    @property
+    def classified_template(self) -> ClassifiedTemplate:
+        return self._template
+
+    @property
+    def timestamp(self) -> str:
+        if self._timestamp is None:
+            self._timestamp = datetime.fromtimestamp(self.created).isoformat()
+        return self._timestamp
+
+    def __getattr__(self, name):
+        # level, emoji, priority, ... come from the shared template
+        if name in ClassifiedEvent._TEMPLATE_KEYS:
+            return getattr(self._template, name)
+        raise AttributeError(name)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._TEMPLATE_KEYS:
+            return getattr(self._template, key)
+        if key == 'event_type':
+            return self.event_type
+        if key == 'data':
+            return self.data
+        if key == 'timestamp':
+            return self.timestamp
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return f"ClassifiedEvent({self.event_type!r}, level={self._template.level!r})"
+
+    def with_data(self, data: Dict[str, Any]) -> "ClassifiedEvent":
+        """Same classification with different event data (new timestamp)"""
+        return ClassifiedEvent(self._template, self.event_type, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy (e.g. for JSON serialisation)"""
+        return {key: self[key] for key in self.KEYS}
+
+
+class CompiledOntology:
+    """
+    ontology.json compiled into a lookup table
+
+    Unknown event types share a level-"1" fallback template, as before.
+    coalesce_window_seconds and rate_limit are set per level and may be
+    overridden per event type. state_paths maps JSON Pointer prefixes of
+    the API state to semantic_mappings categories (null: ignore changes).
+    media_map lists the media asset declared per event type.
+    """
+
+    DEFAULT_STATE_CATEGORY = 'visual_state_change'
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+        levels = raw.get('event_levels', {})
+
+        def compile_template(event_type: Optional[str], config: Dict[str, Any]) -> ClassifiedTemplate:
+            level = config.get('level', DEFAULT_LEVEL)
+            level_defaults = levels.get(level, {})
+            rate_limit = config.get('rate_limit', level_defaults.get('rate_limit'))
+            return ClassifiedTemplate(
+                event_type, level,
+                level_defaults.get('emoji', DEFAULT_EMOJI),
+                level_defaults.get('priority', DEFAULT_PRIORITY),
+                config.get('template', ''),
+                config.get('requires_media', False),
+                config.get('interactive', False),
+                coalesce_window=float(config.get('coalesce_window_seconds',
+                                                 level_defaults.get('coalesce_window_seconds', 0))),
+                rate=rate_limit['per_minute'] / 60.0 if rate_limit else None,
+                burst=rate_limit.get('burst', 1) if rate_limit else 1
+            )
+
+        self.templates = MappingProxyType({
+            event_type: compile_template(event_type, config)
+            for event_type, config in raw.get('event_types', {}).items()
+        })
+        self.fallback = compile_template(None, {})
+        self.media_map = MappingProxyType({
+            event_type: config['media']
+            for event_type, config in raw.get('event_types', {}).items()
+            if config.get('media')
+        })
+        self.semantic_mappings = MappingProxyType({
+            category: tuple(event_types)
+            for category, event_types in raw.get('semantic_mappings', {}).items()
+        })
+        # Longest prefix first, so the most specific path wins
+        self.state_paths = tuple(sorted(raw.get('state_paths', {}).items(),
+                                        key=lambda item: len(item[0]), reverse=True))
+
+    def template_for(self, event_type: str) -> ClassifiedTemplate:
+        return self.templates.get(event_type, self.fallback)
+
+    def state_category(self, path: str) -> Optional[str]:
+        """semantic_mappings category of a changed API state path (None: ignored)"""
+        for prefix, category in self.state_paths:
+            if path == prefix or path.startswith(prefix + '/'):
+                return category
+        return self.DEFAULT_STATE_CATEGORY
+
+    def classify(self, event_data: Dict[str, Any]) -> ClassifiedEvent:
+        event_type = event_data.get('type', 'state_change')
+        return ClassifiedEvent(self.templates.get(event_type, self.fallback), event_type, event_data)
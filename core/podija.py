@@ -14,17 +14,149 @@ Core Rules:
 - No template text in output (e.g., YYYY-MM-DD)
 """
 
+import asyncio
+import functools
+import itertools
 import json
 import logging
 import os
 import re
-import time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable, Iterator, List, Tuple
+
+from core.podija_storage import CalendarStorage, JsonCalendarStorage, event_ids
+from core.recurrence import resolve_recurrence, scan_recurrence
 
 logger = logging.getLogger(__name__)
 
+# Single-pass temporal tokenizer.
+# Every temporal token starts with one of "пзснчов" or a digit, so the
+# pattern opens with that character class (letting the regex engine skip
+# other positions) and each branch re-checks its first character with a
+# lookbehind. Branches tag relative-day markers, "о/в HH[:MM] [год]"
+# times, bare HH:MM clocks and DD.MM dates. Trailing whitespace is part
+# of the token so tokens can be cut straight out of the title.
+_TEMPORAL_TOKEN_RE = re.compile(
+    r'[пзснчов\d](?:'
+    r'(?P<rel>(?<=п)іслязавтра|(?<=п)ісля\s+завтра|(?<=з)автра|(?<=с)ьогодні?'
+    r'|(?<=ч)ерез\s+тиждень|(?<=н)аступного\s+тижня|(?<=н)аст\s+тижня)'
+    r'|(?<=[ов])(?P<time>\s*(?P<hour>\d{1,2})(?!\d*[.\-/]\d)'
+    r'(?::(?P<minute>\d{2}))?(?:\s*(?P<unit>год|час))?)'
+    r'|(?<=\d)(?P<clock>(?P<clock_hour>\d?):(?P<clock_minute>\d{2}))'
+    r'|(?<=\d)(?P<date>(?P<day>\d?)[.\-/](?P<month>\d{1,2})[.\-/]?\d*)'
+    r')\s*',
+    re.IGNORECASE
+)
+
+# Relative-day markers by priority; None means "next Monday"
+_RELATIVE_DAY_MARKERS = (
+    ("післязавтра", "після завтра"),
+    ("завтра",),
+    ("сьогодні", "сьогодн"),
+    ("через тиждень",),
+    ("наступного тижня", "наст тижня"),
+)
+_RELATIVE_DAY_OFFSETS = (2, 1, 0, 7, None)
+_RELATIVE_DAY_RANKS = {
+    marker: rank
+    for rank, markers in enumerate(_RELATIVE_DAY_MARKERS)
+    for marker in markers
+}
+
+# Markers that set the date but stay in the title
+_KEEP_IN_TITLE = frozenset(("сьогодн", "наст тижня"))
+
+DEFAULT_TIME = "09:00"
+DEFAULT_TITLE = "Подія"
+
+
+def _relative_rank(marker: str) -> Optional[int]:
+    """Priority rank of a relative-day marker (lower wins)"""
+    rank = _RELATIVE_DAY_RANKS.get(marker)
+    if rank is None and marker.endswith("завтра"):
+        # "після  завтра" with extra spaces still reads as "завтра"
+        rank = _RELATIVE_DAY_RANKS["завтра"]
+    return rank
+
+
+@functools.lru_cache(maxsize=4096)
+def _scan_temporal(text: str) -> tuple:
+    """
+    Tokenize text once and derive its reference-date independent parts
+    
+    Returns:
+        (relative_rank, explicit_date, time, title) where relative_rank
+        indexes _RELATIVE_DAY_OFFSETS (or None) and explicit_date is the
+        first (day, month) pair (or None)
+    """
+    relative_rank = None
+    explicit_date = None
+    # First candidate per time form, checked in priority order:
+    # "о 10:30" / "в 14:30", "о 10 год", "о 10 ", bare "14:30"
+    time_candidates = [None, None, None, None]
+    title_parts = []
+    position = 0
+    
+    for match in _TEMPORAL_TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        start = match.start()
+        
+        if kind == 'rel':
+            marker = text[start:match.end('rel')].lower()
+            rank = _relative_rank(marker)
+            if rank is not None and (relative_rank is None or rank < relative_rank):
+                relative_rank = rank
+            if marker in _KEEP_IN_TITLE:
+                continue
+        elif kind == 'date':
+            if explicit_date is None:
+                day = text[start:match.end('day')]
+                explicit_date = (int(day), int(match.group('month')))
+        elif kind == 'clock':
+            if time_candidates[3] is None:
+                time_candidates[3] = (text[start:match.end('clock_hour')],
+                                      match.group('clock_minute'))
+        else:
+            hour = match.group('hour')
+            minute = match.group('minute')
+            if minute is not None:
+                if time_candidates[0] is None:
+                    time_candidates[0] = (hour, minute)
+                if time_candidates[3] is None:
+                    time_candidates[3] = (hour, minute)
+            else:
+                if match.group('unit') is not None and time_candidates[1] is None:
+                    time_candidates[1] = (hour, None)
+                hour_end = match.end('hour')
+                if time_candidates[2] is None and (hour_end == len(text)
+                                                   or text[hour_end].isspace()):
+                    time_candidates[2] = (hour, None)
+        
+        title_parts.append(text[position:start])
+        position = match.end()
+    
+    title_parts.append(text[position:])
+    
+    event_time = DEFAULT_TIME
+    for candidate in time_candidates:
+        if candidate is not None:
+            hour = int(candidate[0])
+            minute = int(candidate[1]) if candidate[1] is not None else 0
+            
+            # Validate time
+            if 0 <= hour < 24 and 0 <= minute < 60:
+                event_time = f"{hour:02d}:{minute:02d}"
+                break
+    
+    # Clean up extra whitespace
+    title = ' '.join(''.join(title_parts).split()) or DEFAULT_TITLE
+    
+    return relative_rank, explicit_date, event_time, title
+
 
 class PodijaIntentExtractor:
     """
@@ -47,44 +179,31 @@ class PodijaIntentExtractor:
     - No personal names unless explicitly in user request
     """
     
-    def __init__(self, calendar_path: Optional[str] = None):
+    def __init__(self, calendar_path: Optional[str] = None,
+                 storage: Optional[CalendarStorage] = None,
+                 dedupe: bool = False, dedupe_window: Optional[float] = None):
         """
         Initialize Podija Intent Extractor
         
         Args:
             calendar_path: Path to calendar.json storage file
+            storage: Optional storage backend (defaults to JsonCalendarStorage
+                     on calendar_path)
+            dedupe: Return the existing event instead of saving an identical
+                    one (same normalised title, date, time and rrule)
+            dedupe_window: Only treat events created within this many seconds
+                           as duplicates (default: any age)
         """
         if calendar_path is None:
             base_path = Path(__file__).parent.parent
             calendar_path = base_path / "storage" / "shared" / "calendar.json"
         
         self.calendar_path = Path(calendar_path)
-        self._ensure_storage()
-    
-    def _load_calendar(self) -> Dict[str, Any]:
-        """Load calendar data from JSON file"""
-        with open(self.calendar_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
-    def _save_calendar(self, calendar_data: Dict[str, Any]):
-        """Save calendar data to JSON file"""
-        with open(self.calendar_path, 'w', encoding='utf-8') as f:
-            json.dump(calendar_data, f, ensure_ascii=False, indent=2)
-    
-    def _ensure_storage(self):
-        """Ensure storage directory and file exist"""
-        self.calendar_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        if not self.calendar_path.exists():
-            initial_data = {
-                "events": [],
-                "metadata": {
-                    "version": "1.0",
-                    "last_updated": None
-                }
-            }
-            self._save_calendar(initial_data)
-            logger.info(f"Created calendar storage: {self.calendar_path}")
+        self.storage = storage or JsonCalendarStorage(self.calendar_path)
+        self.dedupe = dedupe
+        self.dedupe_window = dedupe_window
+        self._dedupe_index = None  # normalised key -> latest event, built lazily
+        self._dedupe_lock = threading.Lock()
     
     def extract_intent(self, user_input: str) -> Dict[str, Any]:
         """
@@ -94,7 +213,8 @@ class PodijaIntentExtractor:
             user_input: Natural language input from user
             
         Returns:
-            Dict with fields: title, date, time, desc
+            Dict with fields: title, date, time, desc (plus rrule for
+            recurring events, e.g. "щопонеділка о 9 стендап")
             
         Examples:
             "Завтра о 10 нарада" -> {
@@ -109,65 +229,65 @@ class PodijaIntentExtractor:
         # Parse the input for temporal markers and event details
         parsed = self._parse_natural_language(user_input, current_date)
         
-        return {
+        intent = {
             "title": parsed["title"],
             "date": parsed["date"],
             "time": parsed["time"],
             "desc": parsed["desc"]
         }
+        if "rrule" in parsed:
+            intent["rrule"] = parsed["rrule"]
+        return intent
     
-    def _parse_natural_language(self, text: str, reference_date: datetime) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_natural_language(text: str, reference_date: datetime) -> Dict[str, Any]:
         """
         Parse natural language to extract event components
         
         This is a deterministic parser - no fuzzy logic, no hallucination.
+        The text is tokenized once (see _scan_temporal); only the date
+        calculation depends on the reference date. A recurrence phrase
+        ("щопонеділка", "кожні 2 тижні", ...) is cut out first and turns
+        the date into the first occurrence on/after it.
         """
-        text_lower = text.lower()
+        recurrence, remaining = scan_recurrence(text)
+        relative_rank, explicit_date, event_time, title = _scan_temporal(remaining)
         
         # Extract date
-        event_date = self._extract_date(text_lower, reference_date)
-        
-        # Extract time
-        event_time = self._extract_time(text_lower)
-        
-        # Extract title (remove date/time markers)
-        title = self._extract_title(text, text_lower)
+        event_date = PodijaIntentExtractor._extract_date(relative_rank, explicit_date, reference_date)
         
         # Extract description (optional additional context)
-        desc = self._extract_description(text, text_lower)
+        desc = PodijaIntentExtractor._extract_description(text, text.lower())
         
-        return {
+        parsed = {
             "title": title,
-            "date": event_date.strftime("%Y-%m-%d"),
+            "date": event_date.date().isoformat(),
             "time": event_time,
             "desc": desc
         }
+        if recurrence is not None:
+            rule, first = resolve_recurrence(recurrence, event_date.date())
+            parsed["date"] = first.isoformat()
+            parsed["rrule"] = str(rule)
+        return parsed
     
-    def _extract_date(self, text: str, reference_date: datetime) -> datetime:
-        """Extract and calculate date from text"""
-        # Relative date markers (Ukrainian)
-        # Check longer patterns first to avoid partial matches
-        if "післязавтра" in text or "після завтра" in text:
-            return reference_date + timedelta(days=2)
-        elif "завтра" in text:
-            return reference_date + timedelta(days=1)
-        elif "сьогодні" in text or "сьогодн" in text:
-            return reference_date
-        elif "через тиждень" in text:
-            return reference_date + timedelta(days=7)
-        elif "наступного тижня" in text or "наст тижня" in text:
-            # Find next Monday
-            days_ahead = 7 - reference_date.weekday()
-            if days_ahead <= 0:
-                days_ahead += 7
-            return reference_date + timedelta(days=days_ahead)
-        
-        # Try to find specific date patterns (DD.MM, DD/MM, DD-MM)
-        date_pattern = r'(\d{1,2})[\.\-/](\d{1,2})'
-        match = re.search(date_pattern, text)
-        if match:
-            day = int(match.group(1))
-            month = int(match.group(2))
+    @staticmethod
+    def _extract_date(relative_rank: Optional[int], explicit_date: Optional[tuple],
+                      reference_date: datetime) -> datetime:
+        """Calculate date from the scanned relative marker or DD.MM pair"""
+        # Relative markers win over explicit dates
+        if relative_rank is not None:
+            offset = _RELATIVE_DAY_OFFSETS[relative_rank]
+            if offset is None:
+                # Find next Monday
+                days_ahead = 7 - reference_date.weekday()
+                if days_ahead <= 0:
+                    days_ahead += 7
+                return reference_date + timedelta(days=days_ahead)
+            return reference_date + timedelta(days=offset)
+        
+        if explicit_date is not None:
+            day, month = explicit_date
             year = reference_date.year
             
             # If the date has passed this year, assume next year
@@ -184,57 +304,8 @@ class PodijaIntentExtractor:
         # Default: use current date if no date marker found
         return reference_date
     
-    def _extract_time(self, text: str) -> str:
-        """Extract time from text"""
-        
-        # Pattern for time: "о 10", "в 14:30", "о 9:00", "14:30"
-        time_patterns = [
-            r'[ов]\s*(\d{1,2}):(\d{2})',  # "о 10:30", "в 14:30"
-            r'[ов]\s*(\d{1,2})\s*(?:год|час)',  # "о 10 год", "в 14 час"
-            r'[ов]\s*(\d{1,2})(?:\s|$)',  # "о 10 ", "в 14"
-            r'(\d{1,2}):(\d{2})',  # "14:30"
-        ]
-        
-        for pattern in time_patterns:
-            match = re.search(pattern, text)
-            if match:
-                hour = int(match.group(1))
-                minute = int(match.group(2)) if len(match.groups()) > 1 else 0
-                
-                # Validate time
-                if 0 <= hour < 24 and 0 <= minute < 60:
-                    return f"{hour:02d}:{minute:02d}"
-        
-        # Default: 09:00 if no time specified
-        return "09:00"
-    
-    def _extract_title(self, original_text: str, text_lower: str) -> str:
-        """Extract event title from text"""
-        # Remove date/time markers to get clean title
-        # Order matters: check longer patterns first to avoid partial matches
-        markers_to_remove = [
-            r'післязавтра\s*',
-            r'після\s+завтра\s*',
-            r'наступного\s+тижня\s*',
-            r'через\s+тиждень\s*',
-            r'завтра\s*',
-            r'сьогодні\s*',
-            r'[ов]\s*\d{1,2}(?::\d{2})?\s*(?:год|час)?\s*',
-            r'\d{1,2}:\d{2}\s*',
-            r'\d{1,2}[\.\-/]\d{1,2}[\.\-/]?\d*\s*',
-        ]
-        
-        title = original_text.strip()
-        
-        for marker in markers_to_remove:
-            title = re.sub(marker, '', title, flags=re.IGNORECASE)
-        
-        # Clean up extra whitespace
-        title = ' '.join(title.split())
-        
-        return title if title else "Подія"
-    
-    def _extract_description(self, original_text: str, text_lower: str) -> str:
+    @staticmethod
+    def _extract_description(original_text: str, text_lower: str) -> str:
         """Extract additional description if present"""
         # Look for description markers
         # For now, return empty - can be extended based on patterns
@@ -242,20 +313,142 @@ class PodijaIntentExtractor:
     
     def save_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Save event to calendar.json with unique ID
+        Save event to the calendar storage with unique ID
+        
+        Args:
+            event: Event data with title, date, time, desc
+            
+        Returns:
+            Saved event with added id and metadata (with dedupe enabled,
+            the already stored event if this one is a duplicate)
+        """
+        return self.get_or_create_event(event)[0]
+    
+    def get_or_create_event(self, event: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Save event unless an identical one exists (see dedupe)
         
         Args:
             event: Event data with title, date, time, desc
             
         Returns:
-            Saved event with added id and metadata
+            (event, created): the saved event and True, or the existing
+            duplicate and False
         """
-        # Generate unique ID using timestamp with microseconds
-        event_id = int(time.time() * 1000000)  # Use microseconds for better uniqueness
+        existing, full_event = self._claim_event(event)
+        if existing is not None:
+            return existing, False
+        
+        try:
+            self.storage.append(full_event)
+        except Exception:
+            self._release_event(full_event)
+            raise
         
-        # Create full event object
+        logger.info(f"Saved event: {full_event['title']} on {full_event['date']} at {full_event['time']}")
+        
+        return full_event, True
+    
+    def save_events(self, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Save many events with a single storage write (bulk import)
+        
+        Args:
+            events: Iterable of event data with title, date, time, desc
+            
+        Returns:
+            Saved events with added ids and metadata, in input order
+            (with dedupe enabled, duplicates are the already stored events)
+        """
+        result = []
+        new_events = []
+        for event in events:
+            existing, full_event = self._claim_event(event)
+            result.append(existing or full_event)
+            if full_event is not None:
+                new_events.append(full_event)
+        
+        if new_events:
+            try:
+                self.storage.append_many(new_events)
+            except Exception:
+                for full_event in new_events:
+                    self._release_event(full_event)
+                raise
+            logger.info(f"Saved {len(new_events)} events in one batch")
+        
+        return result
+    
+    @staticmethod
+    def dedupe_key(event: Dict[str, Any]) -> tuple:
+        """Normalised (title, date, time, rrule) used to detect duplicates"""
+        return (
+            ' '.join(event["title"].casefold().split()),
+            event["date"],
+            event["time"],
+            event.get("rrule") or ""
+        )
+    
+    def dedupe_index(self) -> Dict[tuple, Dict[str, Any]]:
+        """Build (once) and return the duplicate index; reads storage the first time"""
+        with self._dedupe_lock:
+            return self._dedupe_index_locked()
+    
+    def _dedupe_index_locked(self) -> Dict[tuple, Dict[str, Any]]:
+        if self._dedupe_index is None:
+            self._dedupe_index = {
+                self.dedupe_key(event): event
+                for event in self.storage.events()
+                if event.get("status", "active") == "active"
+            }
+        return self._dedupe_index
+    
+    def find_duplicate(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stored event identical to event within dedupe_window, if any (O(1))"""
+        with self._dedupe_lock:
+            return self._find_duplicate_locked(event)
+    
+    def _find_duplicate_locked(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        existing = self._dedupe_index_locked().get(self.dedupe_key(event))
+        if existing is not None and self.dedupe_window is not None:
+            created_at = datetime.fromisoformat(existing["created_at"])
+            if datetime.now() - created_at > timedelta(seconds=self.dedupe_window):
+                return None
+        return existing
+    
+    def _claim_event(self, event: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Return (existing duplicate, None) or (None, new full event)
+        
+        The new event is entered into the duplicate index right away, so
+        a concurrent identical save sees it before it reaches storage.
+        """
+        if not self.dedupe:
+            return None, self._build_event(event)
+        
+        with self._dedupe_lock:
+            existing = self._find_duplicate_locked(event)
+            if existing is not None:
+                logger.info(f"Duplicate event skipped: {existing['title']} on {existing['date']} "
+                            f"at {existing['time']} (id {existing['id']})")
+                return existing, None
+            full_event = self._build_event(event)
+            self._dedupe_index[self.dedupe_key(full_event)] = full_event
+            return None, full_event
+    
+    def _release_event(self, full_event: Dict[str, Any]):
+        """Drop a claimed event from the duplicate index after a failed write"""
+        if not self.dedupe:
+            return
+        with self._dedupe_lock:
+            key = self.dedupe_key(full_event)
+            if self._dedupe_index is not None and self._dedupe_index.get(key) is full_event:
+                del self._dedupe_index[key]
+    
+    def _build_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Create full event object with ID and metadata"""
         full_event = {
-            "id": event_id,
+            "id": event_ids.next(),
             "title": event["title"],
             "date": event["date"],
             "time": event["time"],
@@ -263,39 +456,180 @@ class PodijaIntentExtractor:
             "created_at": datetime.now().isoformat(),
             "status": "active"
         }
-        
-        # Load current calendar
-        calendar_data = self._load_calendar()
-        
-        # Add event
-        calendar_data["events"].append(full_event)
-        calendar_data["metadata"]["last_updated"] = datetime.now().isoformat()
-        
-        # Save back to file
-        self._save_calendar(calendar_data)
-        
-        logger.info(f"Saved event: {full_event['title']} on {full_event['date']} at {full_event['time']}")
-        
+        if event.get("rrule"):
+            full_event["rrule"] = event["rrule"]
         return full_event
     
-    def get_events(self, date_filter: Optional[str] = None) -> list:
+    def get_events(self, date_filter: Optional[str] = None,
+                   date_from: Optional[str] = None, date_to: Optional[str] = None,
+                   limit: Optional[int] = None, offset: int = 0) -> list:
         """
         Get events from calendar
         
         Args:
             date_filter: Optional date filter in YYYY-MM-DD format
+            date_from: Optional inclusive range start (YYYY-MM-DD)
+            date_to: Optional inclusive range end (YYYY-MM-DD)
+            limit: Optional page size
+            offset: Number of events to skip (pagination)
             
         Returns:
-            List of events
+            List of events. With a date filter or range, recurring events
+            are expanded into their occurrences in that window (each with
+            series_id) and the result is ordered by date and time; an
+            open-ended range expands up to RECURRENCE_HORIZON_DAYS.
+            Without any date filter stored events are returned as is.
         """
-        calendar_data = self._load_calendar()
+        return self.storage.query_occurrences(date_filter, date_from=date_from, date_to=date_to,
+                                              limit=limit, offset=offset)
+
+
+class AsyncPodijaStore:
+    """
+    Event-loop friendly front end for PodijaIntentExtractor storage
+    
+    Storage I/O runs on a single background thread, so a slow disk never
+    stalls the loop. Saves go into a bounded write-behind queue; one writer
+    task drains everything queued so far and commits it with a single
+    append_many() call.
+    """
+    
+    MAX_QUEUE_SIZE = 1000  # Back-pressure: save_event waits when the queue is full
+    
+    def __init__(self, extractor: PodijaIntentExtractor, max_queue_size: Optional[int] = None):
+        """
+        Args:
+            extractor: Extractor whose storage is used
+            max_queue_size: Optional write-behind queue bound
+        """
+        self.extractor = extractor
+        self.max_queue_size = max_queue_size or self.MAX_QUEUE_SIZE
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="podija-io")
+        self._queue = None
+        self._writer = None
+        self.commits = 0
+        self.saved_events = 0
+    
+    def _ensure_writer(self):
+        if self._writer is None or self._writer.done():
+            self._queue = self._queue or asyncio.Queue(self.max_queue_size)
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+    
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            events = [event for event, _ in batch]
+            try:
+                await self._run(self.extractor.storage.append_many, events)
+                self.commits += 1
+                self.saved_events += len(events)
+                for event, future in batch:
+                    if not future.done():
+                        future.set_result(event)
+            except Exception as e:
+                logger.error(f"Failed to save {len(events)} Podija events: {e}")
+                for event, future in batch:
+                    # Also for wait=False saves, whose callers are long gone
+                    self.extractor._release_event(event)
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def save_event(self, event: Dict[str, Any], wait: bool = True) -> Dict[str, Any]:
+        """
+        Save event off-loop
         
-        events = calendar_data.get("events", [])
+        Args:
+            event: Event data with title, date, time, desc
+            wait: Return only after the event is durably written. With
+                  wait=False the event is returned as soon as it is queued
+                  (call flush() before relying on it being stored)
+            
+        Returns:
+            Saved event with id and metadata (or the existing duplicate
+            when the extractor dedupes)
+        """
+        return (await self.get_or_create_event(event, wait))[0]
+    
+    async def get_or_create_event(self, event: Dict[str, Any],
+                                  wait: bool = True) -> Tuple[Dict[str, Any], bool]:
+        """
+        Async PodijaIntentExtractor.get_or_create_event
         
-        if date_filter:
-            events = [e for e in events if e["date"] == date_filter]
+        Returns:
+            (event, created); duplicates are answered without any I/O once
+            the duplicate index is built
+        """
+        self._ensure_writer()
+        if self.extractor.dedupe and self.extractor._dedupe_index is None:
+            await self._run(self.extractor.dedupe_index)
+        
+        existing, full_event = self.extractor._claim_event(event)
+        if existing is not None:
+            return existing, False
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((full_event, future))
+        if not wait:
+            return full_event, True
+        
+        saved_event = await future
+        logger.info(f"Saved event: {saved_event['title']} on {saved_event['date']} at {saved_event['time']}")
+        return saved_event, True
+    
+    async def get_events(self, date_filter: Optional[str] = None,
+                         date_from: Optional[str] = None, date_to: Optional[str] = None,
+                         limit: Optional[int] = None, offset: int = 0) -> list:
+        """Query events off-loop (see PodijaIntentExtractor.get_events)"""
+        return await self._run(
+            functools.partial(self.extractor.get_events, date_filter, date_from=date_from,
+                              date_to=date_to, limit=limit, offset=offset)
+        )
+    
+    async def flush(self):
+        """Wait until every queued event is written"""
+        if self._queue is not None:
+            await self._queue.join()
+    
+    async def close(self):
+        """Flush pending writes and release the I/O thread"""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        self._executor.shutdown(wait=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "commits": self.commits,
+            "saved_events": self.saved_events,
+        }
+
+
+def parse_intent(user_input: str, reference_date: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Extract intent without touching calendar storage
+    
+    Args:
+        user_input: Natural language input
+        reference_date: Date to resolve relative markers against (default: now)
         
-        return events
+    Returns:
+        Event data dict with title, date, time, desc
+    """
+    return PodijaIntentExtractor._parse_natural_language(
+        user_input, reference_date or datetime.now()
+    )
 
 
 # Convenience function for quick intent extraction
@@ -305,13 +639,62 @@ def extract_event_intent(user_input: str, calendar_path: Optional[str] = None) -
     
     Args:
         user_input: Natural language input
-        calendar_path: Optional path to calendar.json
+        calendar_path: Unused; kept for backwards compatibility
         
     Returns:
         Event data dict with title, date, time, desc
     """
-    extractor = PodijaIntentExtractor(calendar_path)
-    return extractor.extract_intent(user_input)
+    return parse_intent(user_input)
+
+
+def _parse_chunk(chunk: List[str], reference_date: datetime) -> List[Dict[str, Any]]:
+    """Process pool worker: parse one chunk of inputs"""
+    return [PodijaIntentExtractor._parse_natural_language(text, reference_date) for text in chunk]
+
+
+def _chunked(iterable: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def extract_intents(user_inputs: Iterable[str], workers: int = 1, chunksize: int = 1000,
+                    reference_date: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Extract intents from many inputs (chat exports, meeting notes)
+    
+    Results are streamed in input order. All inputs share one reference
+    date, so a batch that crosses midnight still resolves "завтра"
+    consistently. Inputs are consumed lazily; with workers > 1 at most
+    2 * workers chunks are in flight at a time.
+    
+    Args:
+        user_inputs: Iterable of natural language inputs
+        workers: Number of worker processes (1 = parse in this process)
+        chunksize: Inputs per worker task
+        reference_date: Date to resolve relative markers against (default: now)
+        
+    Yields:
+        Event data dicts with title, date, time, desc
+    """
+    reference_date = reference_date or datetime.now()
+    
+    if workers <= 1:
+        for text in user_inputs:
+            yield PodijaIntentExtractor._parse_natural_language(text, reference_date)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in _chunked(user_inputs, chunksize):
+            pending.append(executor.submit(_parse_chunk, chunk, reference_date))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
 
 
 # Example usage
@@ -0,0 +1,892 @@
+"""
+ПоДія (Podija) - Calendar Storage Backends
+Pluggable persistence layer for PodijaIntentExtractor
+
+Backends:
+- JsonCalendarStorage: single calendar.json document (original format)
+- JsonlCalendarStorage: append-only JSON Lines log + calendar.json snapshot
+- SqliteCalendarStorage: indexed SQLite database (WAL mode)
+
+Every backend can export the classic calendar.json structure:
+{"events": [...], "metadata": {"version": "1.0", "last_updated": ...}}
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+from core.recurrence import RECURRENCE_HORIZON_DAYS, RecurrenceIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_FORMAT_VERSION = "1.0"
+
+
+def _empty_calendar() -> Dict[str, Any]:
+    """Initial calendar.json structure"""
+    return {
+        "events": [],
+        "metadata": {
+            "version": CALENDAR_FORMAT_VERSION,
+            "last_updated": None
+        }
+    }
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive advisory lock on <path>.lock (shared with other processes)"""
+    lock_path = path.with_name(path.name + ".lock")
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _fsync_dir(path: Path):
+    """Persist a rename by syncing the containing directory (POSIX only)"""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write_json(path: Path, data: Dict[str, Any]):
+    """
+    Write JSON via temp file + fsync + os.replace
+
+    Readers see either the old or the new document, never a truncated one.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+
+
+class EventIdAllocator:
+    """
+    Process-wide allocator of microsecond-timestamp event IDs
+
+    IDs are strictly increasing even when several events are created in
+    the same microsecond or the wall clock steps back.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = 0
+
+    def next(self) -> int:
+        with self._lock:
+            self._last = max(int(time.time() * 1000000), self._last + 1)
+            return self._last
+
+    def observe(self, event_id: int):
+        """Never hand out IDs at or below event_id (e.g. seen in storage)"""
+        with self._lock:
+            self._last = max(self._last, event_id)
+
+
+event_ids = EventIdAllocator()
+
+
+def _renumber_after(events: List[Dict[str, Any]], last_id: int) -> int:
+    """
+    Reassign IDs not above last_id (written by another process meanwhile)
+
+    Events are updated in place so callers see the stored IDs.
+    Returns the new highest ID.
+    """
+    event_ids.observe(last_id)
+    for event in events:
+        if event["id"] <= last_id:
+            event["id"] = event_ids.next()
+        last_id = max(last_id, event["id"])
+    return last_id
+
+
+def _paginate(events: List[Dict[str, Any]], limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+    if offset or limit is not None:
+        end = offset + limit if limit is not None else None
+        events = events[offset:end]
+    return events
+
+
+def _merge_occurrences(index: RecurrenceIndex, query, date_filter: Optional[str],
+                       date_from: Optional[str], date_to: Optional[str],
+                       limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+    """
+    Replace stored series rows with their occurrences in the window
+
+    Used by CalendarStorage.query_occurrences(); query is the backend's
+    plain query().
+    """
+    if not index or not (date_filter or date_from or date_to):
+        return query(date_filter, date_from=date_from, date_to=date_to, limit=limit, offset=offset)
+
+    window_start = date.fromisoformat(date_filter or date_from or date.min.isoformat())
+    if date_filter or date_to:
+        window_end = date.fromisoformat(date_filter or date_to)
+    else:
+        window_end = window_start + timedelta(days=RECURRENCE_HORIZON_DAYS)
+
+    events = [
+        event for event in query(date_filter, date_from=date_from, date_to=date_to)
+        if not event.get("rrule")
+    ]
+    events.extend(index.occurrences(window_start, window_end))
+    events.sort(key=lambda e: (e["date"], e["time"]))
+    return _paginate(events, limit, offset)
+
+
+class _CommitBatch:
+    """Events waiting for one group commit"""
+    __slots__ = ("events", "done", "error")
+
+    def __init__(self):
+        self.events = []
+        self.done = threading.Event()
+        self.error = None
+
+
+class CalendarStorage:
+    """
+    Base class for calendar storage backends
+
+    Subclasses implement _write_batch() and events(); querying and
+    export are derived from them and may be overridden for speed.
+
+    Writes go through a group commit: the first writer waits
+    group_commit_window seconds, then commits every event that arrived
+    meanwhile (including those queued while a previous commit was running)
+    in one _write_batch() call. Every caller returns only after its
+    events are durably written.
+    """
+
+    GROUP_COMMIT_WINDOW_SECONDS = 0.0
+
+    def __init__(self, group_commit_window: Optional[float] = None):
+        if group_commit_window is None:
+            group_commit_window = self.GROUP_COMMIT_WINDOW_SECONDS
+        self.group_commit_window = group_commit_window
+        self._commit_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._open_batch = None
+        self.commits = 0
+        self.committed_events = 0
+
+    def append(self, event: Dict[str, Any]):
+        """Persist a single event"""
+        self.append_many([event])
+
+    def append_many(self, events: List[Dict[str, Any]]):
+        """Persist several events; concurrent calls are coalesced"""
+        with self._commit_lock:
+            batch = self._open_batch
+            leader = batch is None
+            if leader:
+                batch = self._open_batch = _CommitBatch()
+            batch.events.extend(events)
+
+        if not leader:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+            return
+
+        if self.group_commit_window > 0:
+            time.sleep(self.group_commit_window)
+
+        with self._write_lock:
+            # Close the batch only now: writers arriving while the previous
+            # commit held the lock have joined it
+            with self._commit_lock:
+                self._open_batch = None
+            try:
+                self._write_batch(batch.events)
+                self.commits += 1
+                self.committed_events += len(batch.events)
+            except Exception as e:
+                batch.error = e
+                raise
+            finally:
+                batch.done.set()
+
+    def _write_batch(self, events: List[Dict[str, Any]]):
+        """Durably persist events in one write"""
+        raise NotImplementedError
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Return all stored events in insertion order"""
+        raise NotImplementedError
+
+    def query(self, date_filter: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Return events, optionally filtered by date or date range
+
+        Args:
+            date_filter: Exact date in YYYY-MM-DD format
+            date_from: Inclusive lower bound in YYYY-MM-DD format
+            date_to: Inclusive upper bound in YYYY-MM-DD format
+            limit: Maximum number of events to return
+            offset: Number of matching events to skip
+        """
+        events = self.events()
+        if date_filter:
+            events = [e for e in events if e["date"] == date_filter]
+        if date_from:
+            events = [e for e in events if e["date"] >= date_from]
+        if date_to:
+            events = [e for e in events if e["date"] <= date_to]
+        return _paginate(events, limit, offset)
+
+    def query_occurrences(self, date_filter: Optional[str] = None,
+                          date_from: Optional[str] = None, date_to: Optional[str] = None,
+                          limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Like query(), but with recurring series expanded in the date window
+
+        Occurrences are copies of the series event with their own "date"
+        and "series_id"; the stored series row itself is left out. When a
+        window contains recurring events the result is ordered by date and
+        time. Open-ended ranges expand up to RECURRENCE_HORIZON_DAYS.
+        Without any date filter this is the same as query().
+        """
+        return _merge_occurrences(self.recurrence_index(), self.query, date_filter,
+                                  date_from, date_to, limit, offset)
+
+    def recurring_events(self) -> List[Dict[str, Any]]:
+        """Stored events with an rrule (recurring series)"""
+        return [event for event in self.events() if event.get("rrule")]
+
+    def recurrence_index(self) -> RecurrenceIndex:
+        """Interval index over recurring series (see core.recurrence)"""
+        return RecurrenceIndex(self.recurring_events())
+
+    def export(self) -> Dict[str, Any]:
+        """Return calendar data in calendar.json format"""
+        calendar_data = _empty_calendar()
+        calendar_data["events"] = self.events()
+        calendar_data["metadata"]["last_updated"] = datetime.now().isoformat()
+        return calendar_data
+
+    def export_to(self, path: str) -> Path:
+        """Write calendar.json-formatted export to path"""
+        path = Path(path)
+        _atomic_write_json(path, self.export())
+        return path
+
+    def close(self):
+        """Release backend resources"""
+
+
+class CalendarCache:
+    """
+    Process-level cache of parsed calendar.json documents
+
+    Entries are keyed by resolved path and validated against the file's
+    (mtime_ns, size, inode) signature, so a repeated read costs one stat()
+    and no JSON decoding. Writes through JsonCalendarStorage refresh the
+    entry directly. Cached documents are shared: treat them as read-only.
+    """
+
+    class Entry:
+        __slots__ = ("signature", "data", "by_date", "recurrence")
+
+        def __init__(self, signature: tuple, data: Dict[str, Any]):
+            self.signature = signature
+            self.data = data
+            self.by_date = None  # date -> [(position, event)], built lazily
+            self.recurrence = None  # RecurrenceIndex, built lazily
+
+        def recurrence_index(self) -> RecurrenceIndex:
+            if self.recurrence is None:
+                self.recurrence = RecurrenceIndex(
+                    event for event in self.data.get("events", []) if event.get("rrule")
+                )
+            return self.recurrence
+
+        def date_index(self) -> Dict[str, List[tuple]]:
+            if self.by_date is None:
+                by_date = {}
+                for position, event in enumerate(self.data.get("events", [])):
+                    by_date.setdefault(event["date"], []).append((position, event))
+                self.by_date = by_date
+            return self.by_date
+
+    def __init__(self):
+        self._entries: Dict[str, "CalendarCache.Entry"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def signature(path: Path) -> tuple:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self, key: str, signature: tuple) -> Optional["CalendarCache.Entry"]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self.invalidations += 1
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, signature: tuple, data: Dict[str, Any]) -> "CalendarCache.Entry":
+        entry = self.Entry(signature, data)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries)
+            }
+
+
+calendar_cache = CalendarCache()
+
+
+class JsonCalendarStorage(CalendarStorage):
+    """
+    Single-document storage: the whole calendar lives in calendar.json
+
+    Every write rewrites the file, so saves are O(N). Kept as the default
+    because the file is human-readable and shared with other tools.
+    Reads are served from calendar_cache while the file is unchanged.
+    """
+
+    GROUP_COMMIT_WINDOW_SECONDS = 0.002  # Coalesce saves within 2 ms
+
+    def __init__(self, calendar_path: str, group_commit_window: Optional[float] = None):
+        super().__init__(group_commit_window)
+        self.calendar_path = Path(calendar_path)
+        self._cache_key = str(self.calendar_path.resolve())
+        self._ensure_storage()
+
+    def _ensure_storage(self):
+        """Ensure storage directory and file exist"""
+        self.calendar_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if not self.calendar_path.exists():
+            with _file_lock(self.calendar_path):
+                if not self.calendar_path.exists():
+                    self.save(_empty_calendar())
+                    logger.info(f"Created calendar storage: {self.calendar_path}")
+
+    def _entry(self) -> CalendarCache.Entry:
+        signature = calendar_cache.signature(self.calendar_path)
+        entry = calendar_cache.get(self._cache_key, signature)
+        if entry is None:
+            with open(self.calendar_path, 'r', encoding='utf-8') as f:
+                entry = calendar_cache.put(self._cache_key, signature, json.load(f))
+        return entry
+
+    def load(self) -> Dict[str, Any]:
+        """Load calendar data (cached; do not mutate the result)"""
+        return self._entry().data
+
+    def save(self, calendar_data: Dict[str, Any]) -> CalendarCache.Entry:
+        """Atomically save calendar data to JSON file and refresh the cache"""
+        try:
+            _atomic_write_json(self.calendar_path, calendar_data)
+        except Exception:
+            calendar_cache.invalidate(self._cache_key)
+            raise
+        return calendar_cache.put(
+            self._cache_key, calendar_cache.signature(self.calendar_path), calendar_data
+        )
+
+    def _write_batch(self, events: List[Dict[str, Any]]):
+        # Read-modify-write under the advisory lock so concurrent
+        # processes never overwrite each other's events
+        with _file_lock(self.calendar_path):
+            previous = self._entry()
+            existing = previous.data.get("events", [])
+            metadata = previous.data.get("metadata", {})
+
+            last_id = metadata.get("last_id")
+            if last_id is None:
+                last_id = max((e["id"] for e in existing), default=0)
+            last_id = _renumber_after(events, last_id)
+
+            calendar_data = {
+                "events": existing + list(events),
+                "metadata": dict(metadata, last_updated=datetime.now().isoformat(),
+                                 last_id=last_id)
+            }
+            entry = self.save(calendar_data)
+
+        # Carry the date index over instead of rebuilding it on next query
+        if previous.by_date is not None:
+            by_date = previous.by_date
+            for position, event in enumerate(events, start=len(existing)):
+                by_date.setdefault(event["date"], []).append((position, event))
+            entry.by_date = by_date
+        if previous.recurrence is not None and not any(e.get("rrule") for e in events):
+            entry.recurrence = previous.recurrence
+
+    def events(self) -> List[Dict[str, Any]]:
+        return list(self.load().get("events", []))
+
+    def query(self, date_filter: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        return self._query_entry(self._entry(), date_filter, date_from, date_to, limit, offset)
+
+    def query_occurrences(self, date_filter: Optional[str] = None,
+                          date_from: Optional[str] = None, date_to: Optional[str] = None,
+                          limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        # One cache lookup serves both the index and the query
+        entry = self._entry()
+
+        def query(date_filter=None, date_from=None, date_to=None, limit=None, offset=0):
+            return self._query_entry(entry, date_filter, date_from, date_to, limit, offset)
+
+        return _merge_occurrences(entry.recurrence_index(), query, date_filter,
+                                  date_from, date_to, limit, offset)
+
+    @staticmethod
+    def _query_entry(entry: CalendarCache.Entry, date_filter: Optional[str],
+                     date_from: Optional[str], date_to: Optional[str],
+                     limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+        if not (date_filter or date_from or date_to):
+            return _paginate(list(entry.data.get("events", [])), limit, offset)
+
+        by_date = entry.date_index()
+        if date_filter:
+            dates = [date_filter] if date_filter in by_date else []
+        else:
+            dates = list(by_date)
+        if date_from:
+            dates = [d for d in dates if d >= date_from]
+        if date_to:
+            dates = [d for d in dates if d <= date_to]
+
+        # Merge per-date buckets back into file order
+        matches = [item for d in dates for item in by_date[d]]
+        if len(dates) > 1:
+            matches.sort(key=lambda item: item[0])
+        return _paginate([event for _, event in matches], limit, offset)
+
+    def recurrence_index(self) -> RecurrenceIndex:
+        return self._entry().recurrence_index()
+
+    def export(self) -> Dict[str, Any]:
+        return self.load()
+
+
+class JsonlCalendarStorage(CalendarStorage):
+    """
+    Append-only storage: events are appended to a JSON Lines log
+    and periodically compacted into a calendar.json snapshot
+
+    Layout (for calendar_path = .../calendar.json):
+    - calendar.json        snapshot in the original format
+    - calendar.json.log    one JSON event per line, newer than the snapshot
+
+    A save appends one line, so it costs O(1) regardless of calendar size.
+    Compaction folds the log into the snapshot once the log holds at least
+    as many events as the snapshot (and no fewer than COMPACT_MIN_EVENTS),
+    which keeps the amortised cost per save constant.
+
+    The snapshot records the highest folded ID in metadata.last_id; log
+    records at or below it are skipped, so a crash between writing the
+    snapshot and removing the log never duplicates events. Both counts
+    are read from the files under the lock, so several processes sharing
+    the calendar agree on when to compact.
+    """
+
+    COMPACT_MIN_EVENTS = 1000  # Never compact logs shorter than this
+
+    def __init__(self, calendar_path: str, compact_min_events: Optional[int] = None,
+                 group_commit_window: Optional[float] = None):
+        super().__init__(group_commit_window)
+        self.calendar_path = Path(calendar_path)
+        self.log_path = self.calendar_path.with_name(self.calendar_path.name + ".log")
+        self.compact_min_events = compact_min_events or self.COMPACT_MIN_EVENTS
+        self._snapshot_state = None  # (signature, event count, last id)
+        self._log_state = (None, 0, 0)  # (inode, size, records) of the counted log prefix
+        self._recurrence = None  # (files signature, RecurrenceIndex)
+        self._ensure_storage()
+
+    def _ensure_storage(self):
+        """Ensure storage directory and snapshot exist"""
+        self.calendar_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if not self.calendar_path.exists():
+            with _file_lock(self.calendar_path):
+                if not self.calendar_path.exists():
+                    self._write_snapshot(_empty_calendar())
+                    logger.info(f"Created calendar storage: {self.calendar_path}")
+
+    def _load_snapshot(self) -> Dict[str, Any]:
+        with open(self.calendar_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_snapshot(self, calendar_data: Dict[str, Any]):
+        _atomic_write_json(self.calendar_path, calendar_data)
+
+    @staticmethod
+    def _folded_id(calendar_data: Dict[str, Any]) -> int:
+        """Highest log ID already folded into a snapshot (0 for legacy snapshots)"""
+        return calendar_data.get("metadata", {}).get("last_id") or 0
+
+    def _snapshot_info(self) -> tuple:
+        """(event count, highest ID) of the snapshot, re-read only when it changed"""
+        signature = calendar_cache.signature(self.calendar_path)
+        if self._snapshot_state is None or self._snapshot_state[0] != signature:
+            calendar_data = self._load_snapshot()
+            events = calendar_data.get("events", [])
+            last_id = max([self._folded_id(calendar_data)] + [e["id"] for e in events])
+            self._snapshot_state = (signature, len(events), last_id)
+        return self._snapshot_state[1:]
+
+    def _log_records(self) -> int:
+        """Records in the log; only bytes appended since the last call are scanned"""
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            self._log_state = (None, 0, 0)
+            return 0
+        inode, size, records = self._log_state
+        if inode != st.st_ino or size > st.st_size:
+            size, records = 0, 0  # Compacted (and recreated) meanwhile
+        if st.st_size > size:
+            with open(self.log_path, 'rb') as f:
+                f.seek(size)
+                records += f.read(st.st_size - size).count(b"\n")
+        self._log_state = (st.st_ino, st.st_size, records)
+        return records
+
+    def _last_logged_id(self) -> int:
+        """ID of the last log record (reads only the file tail)"""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 65536))
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return 0
+        for line in reversed(lines):
+            try:
+                return json.loads(line)["id"]
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def _iter_log(self, after_id: int = 0):
+        """Yield log events newer than after_id, skipping a torn trailing line"""
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt log record in {self.log_path}")
+                    continue
+                if event["id"] > after_id:
+                    yield event
+
+    def _write_batch(self, events: List[Dict[str, Any]]):
+        with _file_lock(self.calendar_path):
+            # An empty log (just compacted) falls back to the snapshot's last ID
+            snapshot_count, snapshot_last_id = self._snapshot_info()
+            _renumber_after(events, max(self._last_logged_id(), snapshot_last_id))
+            lines = "".join(
+                json.dumps(event, ensure_ascii=False) + "\n" for event in events
+            )
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self._log_records() >= max(self.compact_min_events, snapshot_count):
+                self._compact_locked()
+
+    def events(self) -> List[Dict[str, Any]]:
+        calendar_data = self._load_snapshot()
+        events = calendar_data.get("events", [])
+        events.extend(self._iter_log(self._folded_id(calendar_data)))
+        return events
+
+    def _files_signature(self) -> tuple:
+        try:
+            log_signature = calendar_cache.signature(self.log_path)
+        except FileNotFoundError:
+            log_signature = None
+        return calendar_cache.signature(self.calendar_path), log_signature
+
+    def recurrence_index(self) -> RecurrenceIndex:
+        # Rebuilt only when the snapshot or the log changed
+        signature = self._files_signature()
+        if self._recurrence is None or self._recurrence[0] != signature:
+            self._recurrence = (signature, super().recurrence_index())
+        return self._recurrence[1]
+
+    def compact(self):
+        """Fold the log into the calendar.json snapshot"""
+        with self._write_lock, _file_lock(self.calendar_path):
+            self._compact_locked()
+
+    def _compact_locked(self):
+        calendar_data = self._load_snapshot()
+        folded_id = self._folded_id(calendar_data)
+        logged = list(self._iter_log(folded_id))
+        calendar_data["events"].extend(logged)
+        metadata = calendar_data["metadata"]
+        metadata["last_updated"] = datetime.now().isoformat()
+        metadata["last_id"] = max([folded_id] + [e["id"] for e in calendar_data["events"]])
+        # Snapshot first: if the unlink never happens, last_id hides the folded records
+        self._write_snapshot(calendar_data)
+        if self.log_path.exists():
+            self.log_path.unlink()
+
+        logger.info(f"Compacted {len(logged)} logged events into {self.calendar_path}")
+        self._log_state = (None, 0, 0)
+
+    def export(self) -> Dict[str, Any]:
+        calendar_data = self._load_snapshot()
+        calendar_data["events"].extend(self._iter_log(self._folded_id(calendar_data)))
+        return calendar_data
+
+
+class SqliteCalendarStorage(CalendarStorage):
+    """
+    SQLite storage with indexes on date, status and created_at
+
+    Per-day and range lookups go through the date index, so their cost
+    depends on the number of matching events, not on the calendar size.
+    The full event is kept as JSON in the data column; indexed fields are
+    duplicated into their own columns.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            status TEXT,
+            created_at TEXT,
+            rrule TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+        CREATE INDEX IF NOT EXISTS idx_events_status ON events(status);
+        CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_path: str, migrate_from: Optional[str] = None):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            migrate_from: Optional calendar.json to import once on first open
+        """
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self.SCHEMA)
+        self._upgrade_schema()
+        self._recurrence = None  # (data_version, RecurrenceIndex)
+
+        if migrate_from:
+            self.migrate_from_json(migrate_from)
+
+    def _upgrade_schema(self):
+        """Add columns introduced after the first schema version"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+        with self._conn:
+            if "rrule" not in columns:
+                self._conn.execute("ALTER TABLE events ADD COLUMN rrule TEXT")
+                self._conn.execute(
+                    "UPDATE events SET rrule = json_extract(data, '$.rrule') "
+                    "WHERE json_extract(data, '$.rrule') IS NOT NULL"
+                )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_events_rrule ON events(rrule) "
+                "WHERE rrule IS NOT NULL"
+            )
+
+    @staticmethod
+    def _row(event: Dict[str, Any]) -> tuple:
+        return (
+            event["id"],
+            event["date"],
+            event.get("status"),
+            event.get("created_at"),
+            event.get("rrule"),
+            json.dumps(event, ensure_ascii=False)
+        )
+
+    def _write_batch(self, events: List[Dict[str, Any]]):
+        with self._lock, self._conn:
+            # Write lock first so MAX(id) cannot change under us
+            self._conn.execute("BEGIN IMMEDIATE")
+            (last_id,) = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+            _renumber_after(events, last_id)
+            self._conn.executemany(
+                "INSERT INTO events (id, date, status, created_at, rrule, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._row(event) for event in events]
+            )
+
+    def _select(self, where: str = "", params: tuple = (),
+                limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        sql = "SELECT data FROM events"
+        if where:
+            sql += " WHERE " + where
+        sql += " ORDER BY id"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + (limit if limit is not None else -1, offset)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def events(self) -> List[Dict[str, Any]]:
+        return self._select()
+
+    def query(self, date_filter: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        clauses = []
+        params = ()
+        if date_filter:
+            clauses.append("date = ?")
+            params += (date_filter,)
+        if date_from:
+            clauses.append("date >= ?")
+            params += (date_from,)
+        if date_to:
+            clauses.append("date <= ?")
+            params += (date_to,)
+        return self._select(" AND ".join(clauses), params, limit, offset)
+
+    def recurring_events(self) -> List[Dict[str, Any]]:
+        return self._select("rrule IS NOT NULL")
+
+    def recurrence_index(self) -> RecurrenceIndex:
+        # data_version changes whenever another connection commits;
+        # own commits are tracked by the commit counter
+        with self._lock:
+            (data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        version = (data_version, self.commits)
+        if self._recurrence is None or self._recurrence[0] != version:
+            self._recurrence = (version, super().recurrence_index())
+        return self._recurrence[1]
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Import events from calendar.json once
+
+        The source path is recorded in the meta table, so repeated calls
+        (e.g. on every start) are no-ops. Returns the number of imported events.
+        """
+        json_path = Path(json_path)
+        marker = f"migrated:{json_path.resolve()}"
+
+        with self._lock:
+            done = self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone()
+        if done or not json_path.exists():
+            return 0
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            events = json.load(f).get("events", [])
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO events (id, date, status, created_at, rrule, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._row(event) for event in events]
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (marker, datetime.now().isoformat())
+            )
+
+        logger.info(f"Migrated {len(events)} events from {json_path} to {self.db_path}")
+        return len(events)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage(backend: str, calendar_path: str) -> CalendarStorage:
+    """
+    Build a storage backend by name
+
+    Args:
+        backend: "json", "jsonl" or "sqlite"
+        calendar_path: Path to calendar.json; SQLite uses calendar.db next to
+                       it and imports calendar.json on first open
+    """
+    calendar_path = Path(calendar_path)
+    if backend == "json":
+        return JsonCalendarStorage(calendar_path)
+    if backend == "jsonl":
+        return JsonlCalendarStorage(calendar_path)
+    if backend == "sqlite":
+        return SqliteCalendarStorage(calendar_path.with_suffix(".db"), migrate_from=calendar_path)
+    raise ValueError(f"Unknown calendar storage backend: {backend}")
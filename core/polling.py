@@ -0,0 +1,131 @@
+"""
+Conditional HTTP polling for CIT Voice
+
+ConditionalPoller sends If-None-Match / If-Modified-Since so an unchanged
+state costs a 304 with no body to download or parse, and
+AdaptivePollInterval shortens the interval after changes and backs off
+(with jitter) while the state is steady or the endpoint fails.
+"""
+
+import importlib.util
+import logging
+import random
+from typing import Dict, Any, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_poll_client(keepalive_expiry: float, timeout: float = 10.0) -> httpx.AsyncClient:
+    """
+    Shared AsyncClient for polling
+
+    Keep-alive outlives the longest poll interval so steady polling reuses
+    one connection; HTTP/2 is used when h2 is installed.
+    """
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=2,
+                            keepalive_expiry=keepalive_expiry)
+    )
+
+
+class AdaptivePollInterval:
+    """
+    Poll interval that follows the rate of change
+
+    - changed(): drop to the minimum interval
+    - unchanged(): grow by BACKOFF_FACTOR up to the maximum
+    - failed(): at least double (from the base interval) up to the maximum
+    Every delay gets +/- JITTER so many pollers do not synchronise.
+    """
+
+    BACKOFF_FACTOR = 1.5
+    JITTER = 0.1
+
+    def __init__(self, base: float, minimum: Optional[float] = None, maximum: Optional[float] = None,
+                 rng: Optional[random.Random] = None):
+        self.base = base
+        self.minimum = minimum if minimum is not None else base / 6
+        self.maximum = maximum if maximum is not None else base * 4
+        self.current = base
+        self._rng = rng or random.Random()
+
+    def changed(self) -> float:
+        self.current = self.minimum
+        return self.delay()
+
+    def unchanged(self) -> float:
+        self.current = min(self.maximum, self.current * self.BACKOFF_FACTOR)
+        return self.delay()
+
+    def failed(self) -> float:
+        self.current = min(self.maximum, max(self.current, self.base) * 2)
+        return self.delay()
+
+    def delay(self) -> float:
+        """Current interval with jitter applied"""
+        return self.current * (1 + self._rng.uniform(-self.JITTER, self.JITTER))
+
+
+class ConditionalPoller:
+    """
+    Conditional GET of one URL
+
+    fetch() returns the new body, or None when the server answered 304
+    or sent a byte-identical body.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.etag = None
+        self.last_modified = None
+        self._content = None
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+        self.bytes_received = 0
+
+    async def fetch(self, client: httpx.AsyncClient) -> Optional[bytes]:
+        """
+        Raises:
+            httpx.HTTPError: On transport errors and non-2xx/304 responses
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        response = await client.get(self.url, headers=headers)
+        self.requests += 1
+        if response.status_code == 304:
+            self.not_modified += 1
+            return None
+        response.raise_for_status()
+
+        self.bytes_received += len(response.content)
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        if response.content == self._content:
+            self.unchanged += 1
+            return None
+        self._content = response.content
+        self.changed += 1
+        return response.content
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "changed": self.changed,
+            "bytes_received": self.bytes_received,
+            "http2": HTTP2_AVAILABLE,
+        }
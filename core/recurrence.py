@@ -0,0 +1,324 @@
+"""
+Recurring ПоДія events
+
+A recurring event is stored once, with its first occurrence in "date"
+and an RFC 5545 style rule in "rrule" (e.g. "FREQ=WEEKLY;BYDAY=MO").
+Occurrences are expanded lazily for the requested window only.
+
+Supported rule parts: FREQ (DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL,
+BYDAY (weekly rules), UNTIL (YYYYMMDD) and COUNT.
+"""
+
+import bisect
+import functools
+import itertools
+import re
+from datetime import date, timedelta
+from typing import Dict, Any, Optional, Iterable, Iterator, List, Tuple
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Open-ended windows (date_from without date_to) expand at most this far
+RECURRENCE_HORIZON_DAYS = 366
+
+
+class RRule:
+    """Parsed recurrence rule"""
+    __slots__ = ("freq", "interval", "byday", "until", "count")
+
+    def __init__(self, freq: str, interval: int = 1, byday: Optional[Tuple[int, ...]] = None,
+                 until: Optional[date] = None, count: Optional[int] = None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported recurrence frequency: {freq}")
+        if interval < 1:
+            raise ValueError(f"Invalid recurrence interval: {interval}")
+        if count is not None and count < 1:
+            raise ValueError(f"Invalid recurrence count: {count}")
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday))) if byday else None
+        self.until = until
+        self.count = count
+
+    @classmethod
+    def parse(cls, rule: str) -> "RRule":
+        """Parse "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20261231" """
+        parts = dict(part.split("=", 1) for part in rule.upper().split(";") if part)
+        byday = parts.get("BYDAY")
+        until = parts.get("UNTIL")
+        count = parts.get("COUNT")
+        return cls(
+            parts.get("FREQ", ""),
+            int(parts.get("INTERVAL", 1)),
+            tuple(WEEKDAYS.index(day) for day in byday.split(",")) if byday else None,
+            date(int(until[:4]), int(until[4:6]), int(until[6:8])) if until else None,
+            int(count) if count is not None else None
+        )
+
+    def __str__(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in self.byday))
+        if self.until:
+            parts.append("UNTIL=" + self.until.strftime("%Y%m%d"))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+    def first_on_or_after(self, start: date) -> date:
+        """Align a start date to the rule (e.g. next listed weekday)"""
+        if self.freq == "WEEKLY" and self.byday:
+            return start + timedelta(days=min((day - start.weekday()) % 7 for day in self.byday))
+        return start
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_rrule(rule: str) -> RRule:
+    """Cached RRule.parse (rules are shared by many events)"""
+    return RRule.parse(rule)
+
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _periods(rule: RRule, start: date, first_period: int) -> Iterator[Tuple[int, List[date]]]:
+    """Yield (occurrences before this period, occurrences in it) per period"""
+    if rule.freq == "DAILY":
+        for period in itertools.count(first_period):
+            yield period, [start + timedelta(days=period * rule.interval)]
+
+    elif rule.freq == "WEEKLY":
+        days = rule.byday or (start.weekday(),)
+        week = start - timedelta(days=start.weekday())
+        first_week = [week + timedelta(days=day) for day in days if day >= start.weekday()]
+        for period in itertools.count(first_period):
+            if period == 0:
+                yield 0, first_week
+                continue
+            monday = week + timedelta(days=7 * period * rule.interval)
+            yield (len(first_week) + (period - 1) * len(days),
+                   [monday + timedelta(days=day) for day in days])
+
+    else:
+        # MONTHLY / YEARLY: one occurrence per period on the start's day,
+        # periods without that day (31st, Feb 29) are skipped
+        step = rule.interval * (12 if rule.freq == "YEARLY" else 1)
+        seen = 0
+        for period in itertools.count(first_period):
+            year, month = _add_months(start.year, start.month, period * step)
+            if year > date.max.year:
+                return
+            try:
+                occurrences = [date(year, month, start.day)]
+            except ValueError:
+                occurrences = []
+            yield seen, occurrences
+            seen += len(occurrences)
+
+
+def _first_period(rule: RRule, start: date, window_start: date) -> int:
+    """Index of the period containing window_start (jump without iterating)"""
+    if window_start <= start:
+        return 0
+    if rule.freq == "DAILY":
+        return (window_start - start).days // rule.interval
+    if rule.freq == "WEEKLY":
+        week = start - timedelta(days=start.weekday())
+        return (window_start - week).days // (7 * rule.interval)
+    if rule.count is not None:
+        # Skipped months affect numbering; COUNT bounds the walk anyway
+        return 0
+    step = rule.interval * (12 if rule.freq == "YEARLY" else 1)
+    months = (window_start.year - start.year) * 12 + window_start.month - start.month
+    return max(0, months // step)
+
+
+def expand(rule: RRule, start: date, window_start: date, window_end: date) -> Iterator[date]:
+    """
+    Lazily yield occurrence dates within [window_start, window_end]
+
+    Periods before the window are skipped arithmetically, so the cost
+    depends on the window size rather than on the series length.
+    """
+    last = window_end if rule.until is None else min(window_end, rule.until)
+    for seen, occurrences in _periods(rule, start, _first_period(rule, start, window_start)):
+        for offset, occurrence in enumerate(occurrences):
+            if rule.count is not None and seen + offset >= rule.count:
+                return
+            if occurrence > last:
+                return
+            if occurrence >= window_start:
+                yield occurrence
+
+
+def last_occurrence(rule: RRule, start: date) -> Optional[date]:
+    """Last occurrence date, or None for unbounded series"""
+    if rule.until is not None:
+        return rule.until
+    if rule.count is None:
+        return None
+    if rule.freq == "DAILY":
+        return start + timedelta(days=(rule.count - 1) * rule.interval)
+    last = None
+    for last in expand(rule, start, start, date.max):
+        pass
+    return last
+
+
+class RecurrenceIndex:
+    """
+    Interval index over recurring series
+
+    Series are kept sorted by first occurrence; a window lookup bisects
+    to the series starting before the window end and drops those that
+    ended before the window start.
+    """
+
+    def __init__(self, events: Iterable[Dict[str, Any]]):
+        series = []
+        for event in events:
+            rule = parse_rrule(event["rrule"])
+            start = date.fromisoformat(event["date"])
+            series.append((start, last_occurrence(rule, start), rule, event))
+        series.sort(key=lambda item: item[0])
+        self._series = series
+        self._starts = [item[0] for item in series]
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def occurrences(self, window_start: date, window_end: date) -> List[Dict[str, Any]]:
+        """
+        Expand all series within the window
+
+        Returns:
+            Occurrence events (copies of the series event with "date" set
+            and "series_id" pointing at the stored event), sorted by date
+            and time
+        """
+        result = []
+        for start, end, rule, event in self._series[:bisect.bisect_right(self._starts, window_end)]:
+            if end is not None and end < window_start:
+                continue
+            for occurrence in expand(rule, start, window_start, window_end):
+                result.append(dict(event, date=occurrence.isoformat(), series_id=event["id"]))
+        result.sort(key=lambda e: (e["date"], e.get("time", "")))
+        return result
+
+
+# Ukrainian recurrence phrases.
+# Weekday word forms only, so "по середньому" (on average) is not a Wednesday rule.
+_WEEKDAY_FORMS = (
+    (r"понеділ(?:ок|к(?:а|и|ам|ах|ами))", 0), (r"вівтор(?:ок|к(?:а|и|ам|ах|ами))", 1),
+    (r"серед(?:а|и|у|ам|ах|ами)", 2), (r"четвер(?:г(?:а|и|ам|ах|ами))?", 3),
+    (r"п['’ʼ]?ятниц(?:я|і|ю|ям|ях|ями)", 4), (r"субот(?:а|и|у|ам|ах|ами)", 5),
+    (r"неділ(?:я|і|ю|ям|ях|ями)", 6),
+)
+_WEEKDAY_RE = "(?:" + "|".join(form for form, _ in _WEEKDAY_FORMS) + r")(?!\w)"
+_WORKDAYS = (0, 1, 2, 3, 4)
+
+_RECURRENCE_RE = re.compile(
+    r'(?<!\w)(?:'
+    r'(?P<every_weekday>що' + _WEEKDAY_RE + r')'
+    r'|(?P<weekday_list>(?:кожн\w*|по)\s+' + _WEEKDAY_RE
+    + r'(?:\s*(?:,|та|і|й)\s*' + _WEEKDAY_RE + r')*)'
+    r'|(?P<workdays>щобудн\w*|по\s+буднях|у\s+будні|в\s+будні|кожного\s+буднього\s+дня)'
+    r'|(?P<every_n>кожн\w*\s+(?P<n>\d+)\s+(?P<n_unit>дн|день|тиж|міс|рок|рік)\w*)'
+    r'|(?P<daily>щодня|щоденно|щодень|кожного\s+дня|кожен\s+день)'
+    r'|(?P<weekly>щотижня|щотижнево|кожного\s+тижня|кожен\s+тиждень)'
+    r'|(?P<monthly>щомісяця|щомісячно|кожного\s+місяця|кожен\s+місяць)'
+    r'|(?P<yearly>щороку|щорічно|кожного\s+року|кожен\s+рік)'
+    r')(?!\w)\s*',
+    re.IGNORECASE
+)
+_UNTIL_RE = re.compile(
+    r'(?<!\w)до\s+(?P<day>\d{1,2})[.\-/](?P<month>\d{1,2})(?:[.\-/](?P<year>\d{2,4}))?(?!\d)\s*',
+    re.IGNORECASE
+)
+_COUNT_RE = re.compile(r'(?<!\w)(?P<count>\d+)\s+раз(?:и|ів)?(?!\w)\s*', re.IGNORECASE)
+_N_UNIT_FREQ = {"дн": "DAILY", "день": "DAILY", "тиж": "WEEKLY", "міс": "MONTHLY",
+                "рок": "YEARLY", "рік": "YEARLY"}
+
+
+def _weekdays(text: str) -> Tuple[int, ...]:
+    text = text.lower()
+    return tuple(
+        day for form, day in _WEEKDAY_FORMS
+        if re.search(r'(?:^|що|\W)' + form + r'(?!\w)', text)
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def scan_recurrence(text: str) -> Tuple[Optional[tuple], str]:
+    """
+    Find a recurrence phrase and cut it out of the text
+
+    Returns:
+        (recurrence, remaining_text) where recurrence is
+        (freq, interval, byday, until_day_month, count) or None; UNTIL
+        is resolved against the start date by resolve_recurrence()
+    """
+    match = _RECURRENCE_RE.search(text)
+    if match is None:
+        return None, text
+
+    kind = match.lastgroup
+    interval, byday = 1, None
+    if kind in ("every_weekday", "weekday_list"):
+        freq, byday = "WEEKLY", _weekdays(match.group(kind))
+    elif kind == "workdays":
+        freq, byday = "WEEKLY", _WORKDAYS
+    elif kind == "every_n":
+        unit = match.group("n_unit").lower()
+        freq = next(f for prefix, f in _N_UNIT_FREQ.items() if unit.startswith(prefix))
+        interval = max(1, int(match.group("n")))
+    else:
+        freq = kind.upper()
+    remaining = text[:match.start()] + text[match.end():]
+
+    until = None
+    until_match = _UNTIL_RE.search(remaining)
+    if until_match is not None:
+        year = until_match.group("year")
+        until = (int(until_match.group("day")), int(until_match.group("month")),
+                 int(year) if year else None)
+        remaining = remaining[:until_match.start()] + remaining[until_match.end():]
+
+    count = None
+    count_match = _COUNT_RE.search(remaining)
+    if count_match is not None:
+        count = int(count_match.group("count"))
+        if count < 1:
+            return None, text  # "0 разів" is no series at all, not an endless one
+        remaining = remaining[:count_match.start()] + remaining[count_match.end():]
+
+    return (freq, interval, byday, until, count), remaining
+
+
+def resolve_recurrence(recurrence: tuple, start: date) -> Tuple[RRule, date]:
+    """
+    Build the rule for a scanned recurrence starting on/after start
+
+    Returns:
+        (rule, first occurrence date)
+    """
+    freq, interval, byday, until, count = recurrence
+    rule = RRule(freq, interval, byday, count=count)
+    first = rule.first_on_or_after(start)
+    if until is not None:
+        day, month, year = until
+        if year is not None and year < 100:
+            year += 2000
+        try:
+            end = date(year or first.year, month, day)
+            if year is None and end < first:
+                end = date(first.year + 1, month, day)
+            rule.until = end
+        except ValueError:
+            pass
+    return rule, first
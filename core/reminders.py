@@ -0,0 +1,211 @@
+"""
+ПоДія reminder scheduler
+
+Keeps upcoming reminders in a min-heap ordered by fire time and arms a
+single asyncio timer for the earliest one. The calendar is loaded one
+window at a time as the clock advances, so there are no periodic full
+scans; events saved meanwhile are pushed into the heap directly.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+
+from core.recurrence import RecurrenceIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderScheduler:
+    """
+    Timer-heap reminder scheduler
+
+    Heap entries are (fire_at, seq, key, event) with fire_at as a Unix
+    timestamp; key = (event id, date) so a recurring series yields one
+    reminder per occurrence and nothing is scheduled twice.
+    """
+
+    LEAD_MINUTES = 10  # Remind this long before the event starts
+    LOAD_WINDOW_DAYS = 1  # Calendar days fetched per incremental load
+    RETRY_SECONDS = 1.0  # First retry after a failed load, doubled per failure
+    MAX_RETRY_SECONDS = 60.0
+
+    def __init__(self, load_events: Callable[..., Awaitable[List[Dict[str, Any]]]],
+                 emit: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 lead_minutes: Optional[int] = None, load_window_days: Optional[int] = None):
+        """
+        Args:
+            load_events: async get_events(date_from=..., date_to=...) returning
+                         events with recurring series expanded
+            emit: async callback receiving podija_reminder event data
+            lead_minutes: Minutes before the event start to fire
+            load_window_days: Days loaded per incremental load
+        """
+        self.load_events = load_events
+        self.emit = emit
+        self.lead = timedelta(minutes=self.LEAD_MINUTES if lead_minutes is None else lead_minutes)
+        self.load_window = timedelta(days=load_window_days or self.LOAD_WINDOW_DAYS)
+        self._heap = []
+        self._seq = itertools.count()
+        self._scheduled = set()
+        self._loaded_until = None  # Last calendar date loaded into the heap
+        self._timer = None
+        self._timer_at = None
+        self._loading = None
+        self._retry_at = None  # Backoff after a failed load; the window is retried
+        self._pending_emits = set()
+        self._loop = None
+        self.fired = 0
+        self.loads = 0
+        self.load_failures = 0
+        self._consecutive_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def start(self):
+        """Load the first window and arm the timer"""
+        self._loop = asyncio.get_running_loop()
+        self._loaded_until = date.today() - timedelta(days=1)
+        await self._load_next_window()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._timer_at = None
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+
+    def _fire_time(self, event: Dict[str, Any]) -> Optional[float]:
+        try:
+            starts_at = datetime.fromisoformat(f"{event['date']}T{event['time']}")
+        except (KeyError, ValueError):
+            logger.warning(f"Skipping reminder for malformed event: {event.get('id')}")
+            return None
+        if starts_at.timestamp() < time.time():
+            return None  # Already started
+        return (starts_at - self.lead).timestamp()
+
+    def _push(self, event: Dict[str, Any]) -> bool:
+        if event.get("status", "active") != "active":
+            return False
+        key = (event.get("series_id", event.get("id")), event["date"])
+        if key in self._scheduled:
+            return False
+        fire_at = self._fire_time(event)
+        if fire_at is None:
+            return False
+        self._scheduled.add(key)
+        heapq.heappush(self._heap, (fire_at, next(self._seq), key, event))
+        return True
+
+    def add(self, event: Dict[str, Any]):
+        """
+        Schedule a newly saved event (O(log n))
+
+        Occurrences beyond the loaded window are picked up by later loads.
+        """
+        if self._loaded_until is None:
+            return  # Not started; start() loads it from storage
+        if event.get("rrule"):
+            events = RecurrenceIndex([event]).occurrences(date.today(), self._loaded_until)
+        elif event["date"] <= self._loaded_until.isoformat():
+            events = [event]
+        else:
+            return
+        if any([self._push(e) for e in events]):
+            self._arm()
+
+    async def _load_next_window(self):
+        window_start = self._loaded_until + timedelta(days=1)
+        window_end = window_start + self.load_window - timedelta(days=1)
+        try:
+            events = await self.load_events(date_from=window_start.isoformat(),
+                                            date_to=window_end.isoformat())
+        except Exception as e:
+            # Window stays unloaded and is retried with backoff, so no reminder is lost
+            self.load_failures += 1
+            self._consecutive_failures += 1
+            delay = min(self.MAX_RETRY_SECONDS, self.RETRY_SECONDS * 2 ** (self._consecutive_failures - 1))
+            self._retry_at = time.time() + delay
+            logger.error(f"Failed to load reminders for {window_start}..{window_end}, "
+                         f"retrying in {delay:.1f} s: {e}")
+            self._arm()
+            return
+        self._consecutive_failures = 0
+        self._retry_at = None
+        self._loaded_until = window_end
+        self.loads += 1
+        for event in events:
+            self._push(event)
+        self._arm()
+
+    def _next_load_at(self) -> float:
+        """Unix time at which the next window has to be in the heap (or retried)"""
+        next_day = datetime.combine(self._loaded_until + timedelta(days=1), datetime.min.time())
+        load_at = (next_day - self.lead).timestamp()
+        if self._retry_at is not None:
+            load_at = max(load_at, self._retry_at)
+        return load_at
+
+    def _arm(self):
+        """Point the single timer at the earliest reminder or the next load"""
+        if self._loop is None:
+            return
+        fire_at = self._next_load_at()
+        if self._heap and self._heap[0][0] < fire_at:
+            fire_at = self._heap[0][0]
+        if self._timer is not None:
+            if self._timer_at == fire_at:
+                return
+            self._timer.cancel()
+        delay = max(0.0, fire_at - time.time())
+        self._timer_at = fire_at
+        self._timer = self._loop.call_at(self._loop.time() + delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_at = None
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, event = heapq.heappop(self._heap)
+            self._scheduled.discard(key)
+            self._fire(event)
+
+        if self._next_load_at() <= now:
+            if self._loading is None or self._loading.done():
+                self._loading = self._loop.create_task(self._load_next_window())
+            return
+        self._arm()
+
+    def _fire(self, event: Dict[str, Any]):
+        self.fired += 1
+        event_data = {
+            'type': 'podija_reminder',
+            'source': 'podija',
+            'title': event['title'],
+            'date': event['date'],
+            'time': event['time'],
+            'desc': event.get('desc', ''),
+            'event_id': event.get('series_id', event.get('id')),
+            'minutes_before': int(self.lead.total_seconds() // 60)
+        }
+        task = self._loop.create_task(self.emit(event_data))
+        self._pending_emits.add(task)
+        task.add_done_callback(self._pending_emits.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._heap),
+            "fired": self.fired,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "loaded_until": self._loaded_until.isoformat() if self._loaded_until else None,
+            "next_fire_at": self._heap[0][0] if self._heap else None,
+        }
@@ -10,15 +10,26 @@ import asyncio
 import logging
 import hashlib
 import time
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import httpx
 
 # Import Podija module
-from core.podija import PodijaIntentExtractor
+from core.podija import PodijaIntentExtractor, AsyncPodijaStore
+from core.podija_storage import CalendarStorage
+from core.metrics import LoopLagMonitor
+from core.reminders import ReminderScheduler
+from core.dispatch import EventDispatcher
+from core.coalesce import EventCoalescer
+from core.json_diff import json_diff
+from core.watchers import WatchRegistry
+from core.bridge import LoopBridge
+from core.journal import EventJournal
+from core.polling import AdaptivePollInterval, ConditionalPoller, create_poll_client
+from core.ontology import CompiledOntology, ClassifiedEvent, validate_ontology
 
 logger = logging.getLogger(__name__)
 
@@ -28,154 +39,387 @@ class VoiceEngine:
     
     # Configuration constants
     DEBOUNCE_DELAY_SECONDS = 1.0  # Debounce delay for file watch events
+    POLL_INTERVAL_SECONDS = 30  # Base API poll interval (adaptive: /6 .. x4)
     
-    def __init__(self, ontology_path: str, manifest_path: str, api_endpoint: Optional[str] = None):
+    # Файлові джерела відносно watch_root (manifest_path додається завжди)
+    DEFAULT_WATCH_SOURCES = (
+        {'pattern': 'public/manifest.json', 'event_type': 'knowledge_synthesis', 'source': 'manifest',
+         'description': 'Організм проводить фоновий синтез знань...'},
+        {'pattern': 'manifest.json', 'event_type': 'knowledge_synthesis', 'source': 'manifest',
+         'description': 'Організм проводить фоновий синтез знань...'},
+        {'pattern': 'docs/todo/manifest.json', 'event_type': 'state_change', 'source': 'todo',
+         'description': 'Оновлено список завдань'},
+        {'pattern': 'api/state-visual.json', 'event_type': 'state_change', 'source': 'state_visual',
+         'description': 'Оновлено візуальний стан'},
+        {'pattern': 'docs/legend_ci/legend.graph.json', 'event_type': 'knowledge_synthesis',
+         'source': 'legend_graph', 'description': 'Оновлено граф легенди'},
+    )
+    
+    def __init__(self, ontology_path: str, manifest_path: str, api_endpoint: Optional[str] = None,
+                 podija_storage: Optional[CalendarStorage] = None,
+                 podija_dedupe: bool = False, podija_dedupe_window: Optional[float] = None,
+                 dispatch_workers: Optional[int] = None, event_queue_size: Optional[int] = None,
+                 overflow_policy: str = "drop_oldest_background", spill_path: Optional[str] = None,
+                 handler_concurrency: Optional[Dict[str, int]] = None,
+                 event_coalescing: bool = True, watch_root: Optional[str] = None,
+                 watch_sources: Optional[List[Dict[str, Any]]] = None,
+                 journal_dir: Optional[str] = None, handler_timeout: Optional[float] = None,
+                 handler_timeouts: Optional[Dict[str, float]] = None,
+                 breaker_failure_threshold: Optional[int] = None,
+                 breaker_reset_timeout: Optional[float] = None,
+                 dead_letter_path: Optional[str] = None):
         self.ontology_path = Path(ontology_path)
         self.manifest_path = Path(manifest_path)
         self.api_endpoint = api_endpoint or "http://localhost:3000/api/state-visual"
-        self.ontology = self._load_ontology()
+        self.api_poller = ConditionalPoller(self.api_endpoint)
+        self.api_poll_interval = None
+        # Онтологія компілюється у таблицю ClassifiedTemplate; гаряче
+        # перезавантаження лише замінює посилання на нову таблицю
+        self._ontology_digest = None
+        self._rejected_ontology_digest = None
+        self._ontology_reload_lock = threading.Lock()
+        self.ontology_stats = {
+            'version': 1,
+            'reloads': 0,
+            'failures': 0,
+            'last_reload_ms': None,
+            'last_reload_at': None,
+            'last_error': None
+        }
+        self.compiled_ontology = CompiledOntology(self._load_ontology())
+        # Слухачі перезавантаження: callback(compiled) у event loop після заміни
+        self.ontology_listeners: List[Callable[[CompiledOntology], Any]] = []
         self.event_handlers: List = []
+        # Журнал подій (write-ahead): запис до розсилки, підтвердження від кожного обробника
+        self.journal = EventJournal(journal_dir) if journal_dir else None
+        # Обмежена черга з пріоритетами онтології та пулом воркерів; тайм-аут і
+        # circuit breaker для кожного обробника. З журналом відхилені події лишаються
+        # непідтвердженими (повтор при запуску), без нього - у dead-letter файл
+        self.dispatcher = EventDispatcher(
+            self.event_handlers, self._safe_handle_event,
+            workers=dispatch_workers, max_queue_size=event_queue_size,
+            overflow=overflow_policy, spill_path=spill_path,
+            handler_concurrency=handler_concurrency,
+            handler_timeout=handler_timeout, handler_timeouts=handler_timeouts,
+            breaker_failure_threshold=breaker_failure_threshold,
+            breaker_reset_timeout=breaker_reset_timeout,
+            dead_letter_path=None if self.journal is not None else dead_letter_path,
+            restore_event=self._restore_spilled_event
+        )
+        # Злиття повторів (event_type, source) та ліміти з онтології перед диспетчером
+        self.coalescer = EventCoalescer(self.dispatcher.submit, enabled=event_coalescing)
         self.observer = None
-        self.manifest_handler = None
+        # Декларативний реєстр файлових джерел (glob → тип події → debounce)
+        # Потоки watchdog передають події в event loop пакетами через міст
+        self.fs_bridge = LoopBridge()
+        self.watchers = WatchRegistry(watch_root or Path.cwd(), self.process_event,
+                                      debounce=self.DEBOUNCE_DELAY_SECONDS, bridge=self.fs_bridge)
+        self.watchers.add(str(self.manifest_path.resolve()), 'knowledge_synthesis', source='manifest',
+                          description='Організм проводить фоновий синтез знань...')
+        for watch_source in (self.DEFAULT_WATCH_SOURCES if watch_sources is None else watch_sources):
+            self.watchers.add(**watch_source)
         
         # Initialize Podija Intent Extractor
-        self.podija = PodijaIntentExtractor()
+        self.podija = PodijaIntentExtractor(storage=podija_storage, dedupe=podija_dedupe,
+                                            dedupe_window=podija_dedupe_window)
+        # Дисковий I/O ПоДії виконується поза event loop
+        self.podija_store = AsyncPodijaStore(self.podija)
+        self.closing = None  # Задача закриття, запланована stop() у запущеному циклі
+        self.loop_monitor = LoopLagMonitor()
+        # Нагадування про події ПоДії (podija_reminder)
+        self.reminders = ReminderScheduler(self.podija_store.get_events, self.process_event)
         
     def _load_ontology(self) -> Dict[str, Any]:
         """Завантаження семантичної онтології"""
         try:
-            with open(self.ontology_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            content = self.ontology_path.read_bytes()
+            self._ontology_digest = hashlib.md5(content).hexdigest()
+            return json.loads(content)
         except Exception as e:
             logger.error(f"Failed to load ontology: {e}")
             return {}
     
+    def reload_ontology(self) -> bool:
+        """
+        Перечитати ontology.json та атомарно замінити скомпільовану таблицю
+        
+        Нова версія перевіряється та компілюється повністю до заміни, тож
+        класифікація (без блокувань) бачить або стару, або нову таблицю.
+        Некоректний файл відхиляється, поточна онтологія лишається.
+        Безпечно викликати з потоку watchdog.
+        
+        Returns:
+            True, якщо онтологію замінено
+        """
+        with self._ontology_reload_lock:
+            started = time.perf_counter()
+            digest = None
+            try:
+                content = self.ontology_path.read_bytes()
+                digest = hashlib.md5(content).hexdigest()
+                if digest in (self._ontology_digest, self._rejected_ontology_digest):
+                    return False  # Повторна подія файлової системи, вміст не змінився
+                raw = json.loads(content)
+                validate_ontology(raw)
+                compiled = CompiledOntology(raw)
+            except Exception as e:
+                if digest is not None:
+                    self._rejected_ontology_digest = digest
+                self.ontology_stats['failures'] += 1
+                self.ontology_stats['last_error'] = str(e)
+                logger.error(f"Ontology reload rejected, keeping version "
+                             f"{self.ontology_stats['version']}: {e}")
+                return False
+            
+            # Атомарна заміна посилання (RCU): класифікація читає його один раз
+            self.compiled_ontology = compiled
+            self._ontology_digest = digest
+            self._rejected_ontology_digest = None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.ontology_stats.update({
+                'version': self.ontology_stats['version'] + 1,
+                'reloads': self.ontology_stats['reloads'] + 1,
+                'last_reload_ms': round(elapsed_ms, 3),
+                'last_reload_at': time.time(),
+                'last_error': None
+            })
+            logger.info(f"Ontology reloaded (version {self.ontology_stats['version']}): "
+                        f"{len(compiled.templates)} event types in {elapsed_ms:.2f} ms")
+            # Reload може йти з потоку watchdog: слухачі виконуються в event loop
+            for listener in self.ontology_listeners:
+                self.fs_bridge.submit(listener, compiled)
+            return True
+    
+    def add_ontology_listener(self, callback: Callable[[CompiledOntology], Any]):
+        """Викликати callback(compiled) в event loop після кожного успішного перезавантаження"""
+        self.ontology_listeners.append(callback)
+    
+    @property
+    def ontology(self) -> Dict[str, Any]:
+        """Сирий вміст ontology.json"""
+        return self.compiled_ontology.raw
+    
     def register_handler(self, handler):
         """Реєстрація обробника подій (наприклад, Telegram bot)"""
         self.event_handlers.append(handler)
         logger.info(f"Registered event handler: {handler.__class__.__name__}")
     
-    def classify_event(self, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def classify_event(self, event_data: Dict[str, Any]) -> ClassifiedEvent:
         """
         Класифікація події згідно з онтологією
-        Повертає структуру з рівнем, шаблоном та додатковою інформацією
+        Повертає легкий запис (Mapping) з рівнем, шаблоном та додатковою інформацією;
+        timestamp форматується лише при першому зверненні
         """
-        event_type = event_data.get('type', 'state_change')
-        
-        # Отримати тип події з онтології
-        event_config = self.ontology.get('event_types', {}).get(event_type, {})
-        level = event_config.get('level', '1')
-        level_config = self.ontology.get('event_levels', {}).get(level, {})
-        
-        return {
-            'level': level,
-            'emoji': level_config.get('emoji', '⚪'),
-            'priority': level_config.get('priority', 'background'),
-            'template': event_config.get('template', ''),
-            'requires_media': event_config.get('requires_media', False),
-            'interactive': event_config.get('interactive', False),
-            'event_type': event_type,
-            'timestamp': datetime.now().isoformat(),
-            'data': event_data
-        }
+        return self.compiled_ontology.classify(event_data)
     
-    async def process_event(self, event_data: Dict[str, Any]):
-        """Обробка події та розсилка по всіх обробниках"""
+    async def process_event(self, event_data: Dict[str, Any], wait: bool = False):
+        """
+        Обробка події та розсилка по всіх обробниках
+        
+        Подія проходить злиття повторів та ліміти онтології, потім ставиться
+        в чергу диспетчера (критичні обслуговуються першими); wait=True чекає,
+        доки всі обробники її опрацюють (утримані для злиття події не чекають).
+        """
         classified_event = self.classify_event(event_data)
         
         logger.info(f"Processing event: level={classified_event['level']}, "
                    f"type={classified_event['event_type']}")
         
-        # Паралельна відправка подій всім зареєстрованим обробникам
-        tasks = []
-        for handler in self.event_handlers:
-            task = asyncio.create_task(self._safe_handle_event(handler, classified_event))
-            tasks.append(task)
+        # Журнал до злиття: утримані у вікні події теж переживають збій
+        if self.journal is not None:
+            handlers = list(dict.fromkeys(handler.__class__.__name__ for handler in self.event_handlers))
+            classified_event.seq = self.journal.append(classified_event.data, handlers)
         
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.coalescer.submit(classified_event, wait=wait)
+    
+    def _restore_spilled_event(self, record: Dict[str, Any]) -> ClassifiedEvent:
+        """Подія з файлу spill диспетчера: повторна класифікація, seq журналу зберігається"""
+        event = self.classify_event(record['event'].get('data', {}))
+        event.seq = record.get('seq')
+        event.merged_seqs = tuple(record.get('merged_seqs') or ())
+        return event
     
     async def _safe_handle_event(self, handler, event):
-        """Безпечний виклик обробника з обробкою помилок"""
+        """
+        Безпечний виклик обробника з обробкою помилок
+        
+        Успішна обробка підтверджується в журналі (для зведення злиття —
+        разом з усіма злитими подіями); подія без підтвердження буде
+        повторена при наступному запуску. Якщо обробник повернув future
+        (квитанцію відкладеної доставки, напр. дайджест Telegram),
+        підтвердження записується, коли вона стане True.
+        
+        Returns:
+            True, якщо обробник впорався (для circuit breaker диспетчера)
+        """
         try:
-            await handler.handle_event(event)
+            receipt = await handler.handle_event(event)
         except Exception as e:
             logger.error(f"Handler {handler.__class__.__name__} failed: {e}")
+            return False
+        if isinstance(receipt, asyncio.Future):
+            receipt.add_done_callback(
+                lambda done: done.cancelled() or not done.result() or self._ack(handler, event)
+            )
+        else:
+            self._ack(handler, event)
+        return True
     
-    async def watch_manifest(self):
-        """Моніторинг змін у manifest.json"""
-        class ManifestHandler(FileSystemEventHandler):
+    def _ack(self, handler, event):
+        if self.journal is None:
+            return
+        for seq in (getattr(event, 'seq', None), *getattr(event, 'merged_seqs', ())):
+            if seq is not None:
+                self.journal.ack(seq, handler.__class__.__name__)
+    
+    async def replay_journal(self) -> int:
+        """
+        Повторна доставка непідтверджених подій журналу (at-least-once)
+        
+        Кожна подія надсилається лише тим обробникам, які її не підтвердили.
+        
+        Returns:
+            Кількість повторених подій
+        """
+        if self.journal is None:
+            return 0
+        replayed = 0
+        for seq, event_data, handler_names in self.journal.replay_entries():
+            event = self.classify_event(event_data)
+            event.seq = seq
+            handlers = [handler for handler in self.event_handlers
+                        if handler.__class__.__name__ in handler_names]
+            registered = {handler.__class__.__name__ for handler in handlers}
+            for name in handler_names:
+                if name not in registered:
+                    logger.warning(f"Journal event {seq}: handler {name} no longer registered, skipping")
+                    self.journal.ack(seq, name)
+            if handlers:
+                await asyncio.gather(*(self.dispatcher.deliver(handler, event) for handler in handlers))
+                replayed += 1
+        if replayed:
+            logger.info(f"Replayed {replayed} unacknowledged events from the journal")
+        return replayed
+    
+    async def watch_files(self):
+        """Моніторинг файлів з реєстру (manifest.json, стан, граф легенди)"""
+        await self.watchers.start(self._ensure_observer())
+    
+    def _ensure_observer(self) -> Observer:
+        """Спільний watchdog Observer для всіх файлових джерел та ontology.json"""
+        if self.observer is None:
+            self.observer = Observer()
+            self.observer.start()
+        return self.observer
+    
+    async def watch_ontology(self):
+        """Гаряче перезавантаження ontology.json без перезапуску движка"""
+        class OntologyHandler(FileSystemEventHandler):
             def __init__(self, voice_engine):
                 self.voice_engine = voice_engine
-                self.pending_tasks = set()
-                self.last_modified = 0
-                self.debounce_delay = voice_engine.DEBOUNCE_DELAY_SECONDS
-                
+                self.path = voice_engine.ontology_path.resolve()
+            
+            def _reload_if_ontology(self, path):
+                if Path(path).resolve() == self.path:
+                    self.voice_engine.reload_ontology()
+            
             def on_modified(self, event):
-                if event.src_path.endswith('manifest.json'):
-                    # Debouncing: ignore repeated events within 1 second
-                    current_time = time.time()
-                    if current_time - self.last_modified < self.debounce_delay:
-                        return
-                    self.last_modified = current_time
-                    
-                    logger.info("Manifest.json changed")
-                    event_data = {
-                        'type': 'knowledge_synthesis',
-                        'source': 'manifest',
-                        'description': 'Організм проводить фоновий синтез знань...'
-                    }
-                    # Створити task та зберегти посилання
-                    task = asyncio.create_task(self.voice_engine.process_event(event_data))
-                    self.pending_tasks.add(task)
-                    task.add_done_callback(self.pending_tasks.discard)
+                if not event.is_directory:
+                    self._reload_if_ontology(event.src_path)
+            
+            def on_created(self, event):
+                if not event.is_directory:
+                    self._reload_if_ontology(event.src_path)
             
-            async def cleanup(self):
-                """Очистка незавершених задач"""
-                if self.pending_tasks:
-                    await asyncio.gather(*self.pending_tasks, return_exceptions=True)
-                    self.pending_tasks.clear()
+            def on_moved(self, event):
+                # Редактори та атомарний запис замінюють файл через rename
+                if not event.is_directory:
+                    self._reload_if_ontology(event.dest_path)
         
-        self.observer = Observer()
-        self.manifest_handler = ManifestHandler(self)
-        self.observer.schedule(self.manifest_handler, str(self.manifest_path.parent), recursive=False)
-        self.observer.start()
-        logger.info(f"Started watching manifest: {self.manifest_path}")
+        self._ensure_observer().schedule(OntologyHandler(self), str(self.ontology_path.parent),
+                                         recursive=False)
+        logger.info(f"Started watching ontology: {self.ontology_path}")
     
-    async def poll_api_state(self, interval: int = 30):
-        """Періодичний опитування API для змін стану"""
-        async with httpx.AsyncClient() as client:
-            previous_state_hash = None
+    def state_change_event(self, previous: Any, current: Any) -> Optional[Dict[str, Any]]:
+        """
+        Подія зміни візуального стану зі структурного diff
+        
+        Подія несе лише змінені шляхи (JSON Patch), згруповані за категоріями
+        semantic_mappings онтології (state_paths); зміни лише у
+        ігнорованих шляхах (напр. /last_update) подій не створюють.
+        
+        Returns:
+            Дані події visual_state_change або None, якщо значущих змін немає
+        """
+        ontology = self.compiled_ontology
+        changes = []
+        categories: Dict[str, List[str]] = {}
+        for op in json_diff(previous, current):
+            category = ontology.state_category(op['path'])
+            if category is None:
+                continue
+            changes.append(op)
+            paths = categories.setdefault(category, [])
+            if op['path'] not in paths:
+                paths.append(op['path'])
+        if not changes:
+            return None
+        
+        related = []
+        for category in categories:
+            for event_type in ontology.semantic_mappings.get(category, ()):
+                if event_type not in related:
+                    related.append(event_type)
+        changed_paths = [path for paths in categories.values() for path in paths]
+        return {
+            'type': 'visual_state_change',
+            'source': 'api',
+            'changes': changes,
+            'changed_paths': changed_paths,
+            'semantic_categories': categories,
+            'related_event_types': related,
+            'description': f'Візуальний стан змінено: {", ".join(changed_paths)}'
+        }
+    
+    async def poll_api_state(self, interval: Optional[float] = None):
+        """
+        Періодичне опитування API для змін стану
+        
+        Умовні запити (ETag / Last-Modified): незмінний стан коштує 304 без
+        тіла та розбору. Інтервал скорочується після змін і зростає (з
+        джитером) у спокої та при помилках, у межах interval/6 .. interval*4.
+        """
+        self.api_poll_interval = policy = AdaptivePollInterval(interval or self.POLL_INTERVAL_SECONDS)
+        async with create_poll_client(keepalive_expiry=policy.maximum + 5) as client:
+            previous_state = None
             
             while True:
                 try:
-                    response = await client.get(self.api_endpoint, timeout=10.0)
-                    if response.status_code == 200:
-                        current_state = response.json()
-                        
-                        # Використання хешування для ефективного порівняння
-                        current_state_json = json.dumps(current_state, sort_keys=True)
-                        current_state_hash = hashlib.md5(current_state_json.encode()).hexdigest()
+                    content = await self.api_poller.fetch(client)
+                    if content is None:
+                        delay = policy.unchanged()
+                    else:
+                        current_state = json.loads(content)
                         
-                        # Порівняння зі попереднім станом через хеш
-                        if previous_state_hash and previous_state_hash != current_state_hash:
-                            event_data = {
-                                'type': 'visual_state_change',
-                                'source': 'api',
-                                'previous': None,  # Не зберігаємо попередній стан для економії пам'яті
-                                'current': current_state,
-                                'description': f'Візуальний стан змінено'
-                            }
+                        # Структурний diff з попереднім знімком (лише змінені шляхи)
+                        event_data = None
+                        if previous_state is not None:
+                            event_data = self.state_change_event(previous_state, current_state)
+                        previous_state = current_state
+                        if event_data:
                             await self.process_event(event_data)
+                            delay = policy.changed()
+                        else:
+                            delay = policy.unchanged()
                         
-                        previous_state_hash = current_state_hash
-                        
-                except httpx.RequestError as e:
+                except httpx.HTTPError as e:
                     logger.warning(f"API request failed: {e}")
+                    delay = policy.failed()
                 except Exception as e:
                     logger.error(f"Error polling API: {e}")
+                    delay = policy.failed()
                 
-                await asyncio.sleep(interval)
+                await asyncio.sleep(delay)
     
     async def emit_intent_event(self, intent_data: Dict[str, Any]):
         """
@@ -207,8 +451,12 @@ class VoiceEngine:
         # Extract intent using Podija
         event_data = self.podija.extract_intent(user_input)
         
-        # Save to calendar.json
-        saved_event = self.podija.save_event(event_data)
+        # Save to calendar storage off-loop (write-behind queue)
+        saved_event, created = await self.podija_store.get_or_create_event(event_data)
+        if not created:
+            # Повторне повідомлення: подія вже існує, не сповіщати вдруге
+            logger.info(f"Podija duplicate ignored: {saved_event['title']} (id {saved_event['id']})")
+            return saved_event
         
         # Emit event to all handlers
         event_notification = {
@@ -223,14 +471,30 @@ class VoiceEngine:
         }
         await self.process_event(event_notification)
         
+        # Запланувати нагадування (O(log n), без повторного сканування календаря)
+        self.reminders.add(saved_event)
+        
         return saved_event
     
     async def start(self):
         """Запуск голосового движка"""
         logger.info("Starting CIT Voice Engine...")
         
-        # Запустити моніторинг manifest.json
-        await self.watch_manifest()
+        # Цикл подій для потоків watchdog (події до цього моменту не губляться)
+        self.fs_bridge.bind(asyncio.get_running_loop())
+        
+        # Дослати події, не підтверджені до попередньої зупинки
+        await self.replay_journal()
+        
+        # Вимірювання затримки event loop
+        self.loop_monitor.start()
+        
+        # Завантажити найближчі нагадування та запустити таймер
+        await self.reminders.start()
+        
+        # Гаряче перезавантаження онтології та моніторинг файлових джерел
+        await self.watch_ontology()
+        await self.watch_files()
         
         # Запустити опитування API
         tasks = [
@@ -239,21 +503,66 @@ class VoiceEngine:
         
         await asyncio.gather(*tasks)
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """Метрики движка: затримка event loop та черга запису ПоДії"""
+        return {
+            'loop_lag': self.loop_monitor.stats(),
+            'ontology': dict(self.ontology_stats),
+            'podija_store': self.podija_store.stats(),
+            'reminders': self.reminders.stats(),
+            'api_poll': dict(self.api_poller.stats(),
+                             interval_seconds=self.api_poll_interval.current if self.api_poll_interval else None),
+            'watchers': self.watchers.stats(),
+            'fs_bridge': self.fs_bridge.stats(),
+            'coalescing': self.coalescer.stats(),
+            'dispatch': self.dispatcher.stats(),
+            'journal': self.journal.stats() if self.journal is not None else None
+        }
+    
     def stop(self):
-        """Зупинка голосового движка"""
+        """
+        Зупинка голосового движка
+
+        У запущеному циклі дописування календаря лише планується
+        (задача тримається в self.closing); там краще await shutdown().
+        """
+        self._stop_components()
+        try:
+            loop = asyncio.get_event_loop()
+            if loop.is_running():
+                self.closing = loop.create_task(self._close_resources())
+            else:
+                loop.run_until_complete(self._close_resources())
+        except Exception as e:
+            logger.error(f"Error closing voice engine resources: {e}")
+    
+    async def shutdown(self):
+        """Зупинка з очікуванням дописування відкладених подій календаря"""
+        self._stop_components()
+        await self._close_resources()
+    
+    def _stop_components(self):
+        self.loop_monitor.stop()
+        self.reminders.stop()
+        self.coalescer.stop()
+        self.dispatcher.stop()
         if self.observer:
             self.observer.stop()
             self.observer.join()
-        # Очистка незавершених задач в manifest handler
-        if self.manifest_handler:
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(self.manifest_handler.cleanup())
-                else:
-                    loop.run_until_complete(self.manifest_handler.cleanup())
-            except Exception as e:
-                logger.error(f"Error cleaning up manifest handler: {e}")
+    
+    async def _close_resources(self):
+        # Очистка таймерів debounce та незавершених перевірок файлів
+        try:
+            await self.watchers.cleanup()
+        except Exception as e:
+            logger.error(f"Error cleaning up file watchers: {e}")
+        # Дописати відкладені події календаря (єдиний власник закриття сховища)
+        try:
+            await self.podija_store.close()
+        except Exception as e:
+            logger.error(f"Error flushing Podija store: {e}")
+        if self.journal is not None:
+            self.journal.close()
         logger.info("CIT Voice Engine stopped")
 
 
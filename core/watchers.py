@@ -0,0 +1,230 @@
+"""
+File watch registry for CIT Voice
+
+Declarative glob -> event_type -> debounce mapping served by one shared
+watchdog Observer. Each directory is scheduled once, each path is
+debounced on its own timer, and an event is emitted only when the file
+content actually changed (mtime-only touches are dropped by hash).
+Observer-thread callbacks reach the loop through a batched LoopBridge.
+"""
+
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Tuple
+
+from watchdog.events import FileSystemEventHandler
+
+from core.bridge import LoopBridge
+
+logger = logging.getLogger(__name__)
+
+_GLOB_CHARS = set("*?[")
+
+
+def _file_digest(path: str) -> Optional[str]:
+    """Content hash of a file (None if it is gone or unreadable)"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+
+class WatchSource:
+    """One watched glob and the event it produces"""
+    __slots__ = ("pattern", "event_type", "debounce", "source", "description")
+
+    def __init__(self, pattern: str, event_type: str, debounce: float, source: str, description: str):
+        self.pattern = pattern
+        self.event_type = event_type
+        self.debounce = debounce
+        self.source = source
+        self.description = description
+
+    def watch_directory(self) -> Tuple[str, bool]:
+        """(directory to schedule, recursive) for this pattern"""
+        parts = Path(self.pattern).parts
+        for index, part in enumerate(parts):
+            if _GLOB_CHARS & set(part):
+                return str(Path(*parts[:index])), len(parts) - index > 1
+        return str(Path(*parts[:-1])), False
+
+
+class _RegistryHandler(FileSystemEventHandler):
+    """watchdog callback (observer thread) -> registry"""
+
+    def __init__(self, registry: "WatchRegistry"):
+        self.registry = registry
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.registry.notify(event.src_path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.registry.notify(event.src_path)
+
+    def on_moved(self, event):
+        # Atomic writers replace the file with a rename
+        if not event.is_directory:
+            self.registry.notify(event.dest_path)
+
+
+class WatchRegistry:
+    """
+    Declarative multi-source file watcher
+
+    Sources are matched in registration order; the first match wins, so
+    a path never produces two events. Sources sharing a directory share
+    its single watch (and watchdog emitter).
+    """
+
+    DEFAULT_DEBOUNCE_SECONDS = 1.0
+
+    def __init__(self, root: str, emit: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 debounce: Optional[float] = None, bridge: Optional[LoopBridge] = None):
+        """
+        Args:
+            root: Base directory for relative patterns
+            emit: async callback receiving the event data
+            debounce: Default per-path debounce in seconds
+            bridge: Thread -> loop handoff (shared with the engine)
+        """
+        self.root = Path(root).resolve()
+        self.emit = emit
+        self.debounce = self.DEFAULT_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.bridge = bridge or LoopBridge()
+        self.sources: List[WatchSource] = []
+        self._loop = None
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._digests: Dict[str, Optional[str]] = {}
+        self._pending = set()
+        self._scheduled = set()
+        self.emitted = 0
+        self.unchanged = 0
+
+    def add(self, pattern: str, event_type: str, debounce: Optional[float] = None,
+            source: Optional[str] = None, description: str = '') -> Optional[WatchSource]:
+        """
+        Register a glob (relative to root or absolute)
+
+        Returns:
+            The new WatchSource, or None if the pattern is already registered
+        """
+        path = Path(pattern)
+        full = os.path.normpath(str(path if path.is_absolute() else self.root / path))
+        if any(existing.pattern == full for existing in self.sources):
+            return None
+        watch_source = WatchSource(
+            full, event_type,
+            self.debounce if debounce is None else debounce,
+            source or path.stem, description
+        )
+        self.sources.append(watch_source)
+        return watch_source
+
+    def match(self, path: str) -> Optional[WatchSource]:
+        path = os.path.normpath(path)
+        for watch_source in self.sources:
+            if fnmatch.fnmatchcase(path, watch_source.pattern):
+                return watch_source
+        return None
+
+    def directories(self) -> Dict[str, bool]:
+        """Directories to schedule -> recursive"""
+        directories: Dict[str, bool] = {}
+        for watch_source in self.sources:
+            directory, recursive = watch_source.watch_directory()
+            directories[directory] = directories.get(directory, False) or recursive
+        return directories
+
+    async def start(self, observer):
+        """
+        Record current content hashes and schedule the directories
+
+        Args:
+            observer: Shared (started) watchdog Observer
+        """
+        self._loop = asyncio.get_running_loop()
+        if not self.bridge.bound:
+            self.bridge.bind(self._loop)
+        directories = self.directories()
+        self._digests = await asyncio.to_thread(self._initial_digests, directories)
+        handler = _RegistryHandler(self)
+        for directory, recursive in directories.items():
+            if (directory, recursive) in self._scheduled:
+                continue
+            if not os.path.isdir(directory):
+                logger.warning(f"Watch directory does not exist: {directory}")
+                continue
+            observer.schedule(handler, directory, recursive=recursive)
+            self._scheduled.add((directory, recursive))
+        logger.info(f"Watching {len(self.sources)} sources in {len(self._scheduled)} directories")
+
+    def _initial_digests(self, directories: Dict[str, bool]) -> Dict[str, Optional[str]]:
+        digests = {}
+        for directory, recursive in directories.items():
+            if not os.path.isdir(directory):
+                continue
+            paths = (os.path.join(base, name) for base, _, names in os.walk(directory) for name in names) \
+                if recursive else (entry.path for entry in os.scandir(directory) if entry.is_file())
+            for path in paths:
+                if self.match(path) is not None:
+                    digests[os.path.normpath(path)] = _file_digest(path)
+        return digests
+
+    def notify(self, path: str):
+        """Called from the observer thread for every file event"""
+        if self.match(path) is not None:
+            self.bridge.submit(self._touch, os.path.normpath(path))
+
+    def _touch(self, path: str):
+        """Restart the path's debounce timer (trailing edge)"""
+        watch_source = self.match(path)
+        timer = self._timers.get(path)
+        if timer is not None:
+            timer.cancel()
+        self._timers[path] = self._loop.call_later(watch_source.debounce, self._fire, path, watch_source)
+
+    def _fire(self, path: str, watch_source: WatchSource):
+        self._timers.pop(path, None)
+        task = self._loop.create_task(self._check(path, watch_source))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _check(self, path: str, watch_source: WatchSource):
+        digest = await asyncio.to_thread(_file_digest, path)
+        if digest is None or digest == self._digests.get(path):
+            self.unchanged += 1
+            return
+        self._digests[path] = digest
+        self.emitted += 1
+        logger.info(f"{os.path.relpath(path, self.root)} changed")
+        await self.emit({
+            'type': watch_source.event_type,
+            'source': watch_source.source,
+            'path': os.path.relpath(path, self.root),
+            'description': watch_source.description
+        })
+
+    async def cleanup(self):
+        """Cancel debounce timers and wait for in-flight checks"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+            self._pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sources": len(self.sources),
+            "directories": len(self._scheduled),
+            "debouncing": len(self._timers),
+            "emitted": self.emitted,
+            "unchanged": self.unchanged,
+        }
@@ -1,5 +1,6 @@
 """CIT Voice Integrations Package"""
 
-from .telegram_bot import TelegramNotifier
+from .media_cache import FileIdCache
+from .telegram_bot import TelegramNotifier, OutboundScheduler, DeliveryFailed
 
-__all__ = ['TelegramNotifier']
+__all__ = ['TelegramNotifier', 'OutboundScheduler', 'DeliveryFailed', 'FileIdCache']
@@ -0,0 +1,378 @@
+"""
+CIT Media Cache - media downloads and Telegram media reuse
+
+MediaCache downloads media assets over one pooled HTTP client, streams
+them to temp files renamed atomically into content-addressed storage,
+bounds the cache with an LRU index (no directory scans) and revalidates
+with ETag / Last-Modified.
+
+FileIdCache remembers the file_id Telegram returns for an uploaded file,
+keyed by the file's content hash, so later sends of the same bytes pass
+the file_id instead of uploading again. Entries persist in a JSON Lines
+log (last line per hash wins) that is compacted when it grows stale.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(path: str) -> str:
+    """blake2b hash of a file's bytes"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileIdCache:
+    """
+    Content hash -> Telegram file_id
+
+    Keyed by content, so a file whose bytes change gets a new key and is
+    uploaded once more; the entry of the old bytes under the same name is
+    dropped. The name is the logical asset name (e.g. icons/action.png),
+    not the file name, since MediaCache stores objects by content hash.
+    Hashes are memoised per (path, mtime, size), so an unchanged file is
+    not re-read on every send.
+    """
+
+    COMPACT_MIN_LINES = 64
+    COMPACT_RATIO = 4  # Rewrite the log when it holds this many lines per live entry
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON Lines file to persist entries (None: memory only)
+        """
+        self.path = Path(path) if path else None
+        self._entries: Dict[str, Dict[str, Any]] = {}  # digest -> {"file_id", "name"}
+        self._digests: Dict[str, Tuple[int, int, str]] = {}  # path -> (mtime_ns, size, digest)
+        self._lock = threading.Lock()
+        self._lines = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if self.path is not None:
+            self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line
+                self._lines += 1
+                if record.get('file_id'):
+                    self._entries[record['digest']] = {'file_id': record['file_id'], 'name': record.get('name', '')}
+                else:
+                    self._entries.pop(record['digest'], None)
+        logger.info(f"Loaded {len(self._entries)} cached Telegram file ids")
+
+    def digest(self, path: str) -> str:
+        """Content hash of a file (re-read only when its mtime or size changed)"""
+        stat = os.stat(path)
+        memo = self._digests.get(path)
+        if memo is not None and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+            return memo[2]
+        digest = content_digest(path)
+        self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['file_id']
+
+    def put(self, digest: str, file_id: str, name: str = ''):
+        """Remember an upload; entries of older bytes with the same name are dropped"""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if name and entry['name'] == name and key != digest]
+            for key in stale:
+                del self._entries[key]
+            self._entries[digest] = {'file_id': file_id, 'name': name}
+            self._append([{'digest': key, 'file_id': None} for key in stale]
+                         + [{'digest': digest, 'file_id': file_id, 'name': name}])
+
+    def invalidate(self, digest: str):
+        """Forget a file_id (e.g. Telegram no longer accepts it)"""
+        with self._lock:
+            if self._entries.pop(digest, None) is not None:
+                self.invalidations += 1
+                self._append([{'digest': digest, 'file_id': None}])
+
+    def _append(self, records):
+        if self.path is None or not records:
+            return
+        self._lines += len(records)
+        if self._lines >= max(self.COMPACT_MIN_LINES, self.COMPACT_RATIO * len(self._entries)):
+            self._compact()
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+
+    def _compact(self):
+        """Rewrite the log with one line per live entry (atomic rename)"""
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for digest, entry in self._entries.items():
+                f.write(json.dumps({'digest': digest, **entry}, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class MediaCache:
+    """
+    Content-addressed, size-bounded cache of downloaded media
+
+    Objects are stored as objects/<hash[:2]>/<hash><suffix>, so identical
+    bytes are stored once and equal file names from different URLs never
+    collide. index.json maps each URL to its object, validators and size
+    in LRU order; eviction pops from the index, never scans the directory.
+    An entry older than ttl is revalidated with a conditional GET (a 304
+    costs no body); when the origin is unreachable a stale copy is served.
+    One instance owns a directory (it alone writes index.json).
+    """
+
+    MAX_BYTES = 64 * 1024 * 1024
+    TTL_SECONDS = 86400  # Revalidate after 24 hours
+    ATTEMPTS = 3
+    CHUNK_SIZE = 64 * 1024
+    INDEX_NAME = 'index.json'
+
+    def __init__(self, base_url: str, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, timeout: float = 10.0):
+        """
+        Args:
+            base_url: URL prefix of the media repository
+            directory: Cache directory (default: <tmp>/cit_media_cache)
+            max_bytes: Upper bound for the stored objects
+            ttl: Seconds before an entry is revalidated
+            timeout: HTTP timeout in seconds
+        """
+        self.base_url = base_url.rstrip('/')
+        self.directory = Path(directory) if directory else Path(tempfile.gettempdir()) / 'cit_media_cache'
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.ttl = self.TTL_SECONDS if ttl is None else ttl
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._index_lock = asyncio.Lock()
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.downloads = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.stale_served = 0
+        (self.directory / 'objects').mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled client shared by all downloads (created on first use)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+                follow_redirects=True
+            )
+        return self._client
+
+    def _load_index(self):
+        try:
+            with open(self.directory / self.INDEX_NAME, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        sizes = {}
+        for url, entry in entries:
+            if self._object_path(entry).exists():
+                self._index[url] = entry
+                sizes[entry['digest']] = entry['size']
+        self.bytes = sum(sizes.values())
+
+    async def _save_index(self):
+        """Write index.json atomically (LRU order is the list order)"""
+        async with self._index_lock:
+            await asyncio.to_thread(self._write_index, list(self._index.items()))
+
+    def _write_index(self, entries):
+        tmp_path = self.directory / (self.INDEX_NAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.directory / self.INDEX_NAME)
+
+    def _object_path(self, entry: Dict[str, Any]) -> Path:
+        digest = entry['digest']
+        return self.directory / 'objects' / digest[:2] / f"{digest}{entry.get('suffix', '')}"
+
+    async def get(self, media_file: str, attempts: Optional[int] = None) -> Optional[str]:
+        """
+        Local path of a media file
+
+        Args:
+            media_file: Path relative to base_url, or an absolute URL
+            attempts: Download attempts on errors (default ATTEMPTS)
+
+        Returns:
+            Path of the cached object, or None if it could not be fetched
+        """
+        url = media_file if '://' in media_file else f"{self.base_url}/{media_file}"
+        path = self._fresh(url)
+        if path is not None:
+            return path
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            # Another task may have fetched it meanwhile
+            path = self._fresh(url)
+            if path is not None:
+                return path
+            return await self._fetch(url, Path(media_file).suffix, attempts or self.ATTEMPTS)
+
+    def _fresh(self, url: str) -> Optional[str]:
+        entry = self._index.get(url)
+        if entry is None or time.time() - entry['checked_at'] >= self.ttl:
+            return None
+        if not self._object_path(entry).exists():
+            return None  # Removed behind our back: fetch again
+        self._index.move_to_end(url)
+        self.hits += 1
+        return str(self._object_path(entry))
+
+    async def _fetch(self, url: str, suffix: str, attempts: int) -> Optional[str]:
+        entry = self._index.get(url)
+        if entry is not None and not self._object_path(entry).exists():
+            entry = None  # Nothing to revalidate
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        for attempt in range(attempts):
+            try:
+                async with self.client.stream('GET', url, headers=headers) as response:
+                    if response.status_code == 304 and entry is not None:
+                        self.revalidated += 1
+                        entry['checked_at'] = time.time()
+                        self._index.move_to_end(url)
+                        await self._save_index()
+                        return str(self._object_path(entry))
+                    if response.status_code != 200:
+                        logger.warning(f"Failed to download {url}: HTTP {response.status_code}")
+                        if response.status_code < 500:
+                            break
+                    else:
+                        new_entry = await self._store(response, suffix)
+                        self._commit(url, new_entry)
+                        await self._save_index()
+                        self.downloads += 1
+                        logger.info(f"Downloaded media: {url}")
+                        return str(self._object_path(new_entry))
+            except httpx.HTTPError as e:
+                logger.warning(f"Attempt {attempt + 1}/{attempts} failed for {url}: {e}")
+            if attempt < attempts - 1:
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+
+        if entry is not None:
+            # Origin unavailable: serve the stale copy
+            self.stale_served += 1
+            return str(self._object_path(entry))
+        return None
+
+    async def _store(self, response: httpx.Response, suffix: str) -> Dict[str, Any]:
+        """Stream the body to a temp file, then rename it to its content address"""
+        digest = hashlib.blake2b(digest_size=16)
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in response.aiter_bytes(self.CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            entry = {
+                'digest': digest.hexdigest(),
+                'suffix': suffix,
+                'size': size,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'checked_at': time.time(),
+            }
+            object_path = self._object_path(entry)
+            object_path.parent.mkdir(exist_ok=True)
+            await asyncio.to_thread(os.replace, tmp_name, object_path)
+            return entry
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _commit(self, url: str, entry: Dict[str, Any]):
+        """Index a stored object, drop what it replaced and evict to max_bytes"""
+        digest = entry['digest']
+        previous = self._index.pop(url, None)
+        unchanged = previous is not None and previous['digest'] == digest
+        if not unchanged and not self._referenced(digest):
+            self.bytes += entry['size']
+        self._index[url] = entry
+        if previous is not None and not unchanged:
+            self._release(previous)
+        while self.bytes > self.max_bytes and len(self._index) > 1:
+            _, evicted = self._index.popitem(last=False)
+            self.evictions += 1
+            self._release(evicted)
+
+    def _referenced(self, digest: str) -> bool:
+        return any(entry['digest'] == digest for entry in self._index.values())
+
+    def _release(self, entry: Dict[str, Any]):
+        """Delete an object no URL points to any more"""
+        if not self._referenced(entry['digest']):
+            self.bytes -= entry['size']
+            self._object_path(entry).unlink(missing_ok=True)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._index),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "stale_served": self.stale_served,
+        }
@@ -5,13 +5,22 @@ CIT Telegram Bot - Автономний канал сповіщень
 
 import os
 import logging
-import tempfile
 import asyncio
+import html
+import random
 import time
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable
 from pathlib import Path
-import httpx
 from aiogram import Bot, Dispatcher, Router, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramNetworkError,
+    TelegramServerError,
+    TelegramBadRequest
+)
 from aiogram.types import (
     Message, 
     InlineKeyboardMarkup, 
@@ -22,28 +31,530 @@ from aiogram.types import (
 from aiogram.filters import Command
 from aiogram.enums import ParseMode
 
+from core.coalesce import TokenBucket
+from core.dispatch import PRIORITY_RANKS, BACKGROUND_RANK
+from core.metrics import LatencyHistogram
+from integrations.media_cache import FileIdCache, MediaCache
+
 logger = logging.getLogger(__name__)
 
+CRITICAL_RANK = PRIORITY_RANKS["critical"]
+
+
+class DeliveryFailed(Exception):
+    """A notification was given up by the outbound queue (not delivered)"""
+
+
+class _Outbound:
+    """One queued Telegram API call"""
+    __slots__ = ("chat_id", "send", "rank", "attempts", "enqueued_at", "done")
+
+    def __init__(self, chat_id: Any, send: Callable[[], Awaitable[Any]], rank: int,
+                 done: Optional[asyncio.Future] = None):
+        self.chat_id = chat_id
+        self.send = send
+        self.rank = rank
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+        self.done = done
+
+    @property
+    def abandoned(self) -> bool:
+        """The waiter was cancelled (e.g. handler timeout): the call is not retried"""
+        return self.done is not None and self.done.cancelled()
+
+    def finish(self, delivered: bool):
+        if self.done is not None and not self.done.done():
+            self.done.set_result(delivered)
+
+
+class _ChatQueue:
+    """Priority lanes and pacing state of one chat"""
+    __slots__ = ("lanes", "bucket", "paused_until", "busy")
+
+    def __init__(self, bucket: TokenBucket):
+        self.lanes = [deque() for _ in PRIORITY_RANKS]
+        self.bucket = bucket
+        self.paused_until = 0.0
+        self.busy = False
+
+    def head_rank(self) -> Optional[int]:
+        for rank, lane in enumerate(self.lanes):
+            if lane:
+                return rank
+        return None
+
+
+class OutboundScheduler:
+    """
+    Paced, prioritised delivery of Telegram API calls
+
+    Calls are queued per chat in priority lanes (critical, action,
+    background) and released by a per-chat and a global token bucket, so
+    bursts are smoothed to Telegram's limits instead of running into 429.
+    One call per chat is in flight at a time (per-chat order is kept);
+    different chats are served concurrently.
+
+    - RetryAfter (429): the chat pauses for retry_after seconds and the
+      call goes back to the head of its lane (not counted as an attempt)
+    - Network / server errors: retried with exponential backoff and full
+      jitter; critical calls until delivered or MAX_AGE_SECONDS old,
+      others up to MAX_ATTEMPTS
+    - Other errors (bad request, blocked bot): not retried
+    - Above MAX_QUEUE_SIZE the oldest call of the lowest non-empty
+      priority is dropped (background first), so a long outage cannot
+      grow the queue without bound
+    - A call whose waiter is cancelled (handler timeout) is withdrawn
+      from the queue, or not retried if already in flight, so a replay
+      of the same event does not queue a second copy
+    """
+
+    PER_CHAT_RATE = 1.0  # Telegram: ~1 message/s per chat
+    PER_CHAT_BURST = 3
+    GLOBAL_RATE = 30.0  # Telegram: ~30 messages/s per bot
+    MAX_IN_FLIGHT = 16
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_SECONDS = 1.0
+    RETRY_MAX_SECONDS = 60.0
+    MAX_AGE_SECONDS = 3600.0  # Critical calls are given up after this long
+    MAX_QUEUE_SIZE = 1000
+    RETRYABLE_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError, OSError)
+
+    def __init__(self, per_chat_rate: Optional[float] = None, global_rate: Optional[float] = None,
+                 per_chat_burst: Optional[int] = None, rng: Optional[random.Random] = None):
+        """
+        Args:
+            per_chat_rate: Messages per second per chat
+            global_rate: Messages per second for the whole bot
+            per_chat_burst: Messages a quiet chat may receive at once
+            rng: Random source for retry jitter
+        """
+        self.per_chat_rate = per_chat_rate or self.PER_CHAT_RATE
+        self.global_rate = global_rate or self.GLOBAL_RATE
+        self.per_chat_burst = per_chat_burst or self.PER_CHAT_BURST
+        self.max_in_flight = self.MAX_IN_FLIGHT
+        self.max_attempts = self.MAX_ATTEMPTS
+        self.retry_base = self.RETRY_BASE_SECONDS
+        self.retry_max = self.RETRY_MAX_SECONDS
+        self.max_age = self.MAX_AGE_SECONDS
+        self.max_queue_size = self.MAX_QUEUE_SIZE
+        self._rng = rng or random.Random()
+        self._chats: Dict[Any, _ChatQueue] = {}
+        self._global = TokenBucket(self.global_rate, max(1, int(self.global_rate)), time.monotonic())
+        self._in_flight = set()
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self.wait_latency = [LatencyHistogram() for _ in PRIORITY_RANKS]
+        self.queued = 0
+        self.sent = 0
+        self.retried = 0
+        self.retry_after = 0
+        self.failed = 0
+        self.dropped = 0
+        self.withdrawn = 0
+
+    def _ensure_started(self):
+        """Start the release loop on the running loop (restarted per loop)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._in_flight = set()
+        self._task = loop.create_task(self._run())
+
+    async def submit(self, chat_id: Any, send: Callable[[], Awaitable[Any]],
+                     priority: str = "background", wait: bool = False) -> bool:
+        """
+        Queue an API call
+
+        Args:
+            chat_id: Target chat (pacing key)
+            send: Zero-argument coroutine function doing the call (called again on retry)
+            priority: Ontology priority: critical, action or background
+            wait: Return only once the call was delivered or given up
+
+        Returns:
+            True if delivered (always True without wait)
+        """
+        self._ensure_started()
+        rank = PRIORITY_RANKS.get(priority, BACKGROUND_RANK)
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatQueue(
+                TokenBucket(self.per_chat_rate, self.per_chat_burst, time.monotonic())
+            )
+        job = _Outbound(chat_id, send, rank, self._loop.create_future() if wait else None)
+        chat.lanes[rank].append(job)
+        self.queued += 1
+        if self.queued > self.max_queue_size:
+            self._drop_oldest()
+        self._wakeup.set()
+        if job.done is None:
+            return True
+        try:
+            return await job.done
+        except asyncio.CancelledError:
+            self._withdraw(chat, job)
+            raise
+
+    def _withdraw(self, chat: _ChatQueue, job: _Outbound):
+        self.withdrawn += 1
+        try:
+            chat.lanes[job.rank].remove(job)
+        except ValueError:
+            return  # In flight: _requeue drops it instead of retrying
+        self.queued -= 1
+
+    def _drop_oldest(self):
+        """Drop the oldest call of the lowest priority that has any queued"""
+        for rank in range(BACKGROUND_RANK, -1, -1):
+            oldest = None
+            for chat in self._chats.values():
+                lane = chat.lanes[rank]
+                if lane and (oldest is None or lane[0].enqueued_at < oldest[0].enqueued_at):
+                    oldest = lane
+            if oldest is not None:
+                job = oldest.popleft()
+                self.queued -= 1
+                self.dropped += 1
+                if rank != BACKGROUND_RANK:
+                    logger.error(f"Telegram queue over {self.max_queue_size}: dropped a "
+                                 f"{'critical' if rank == CRITICAL_RANK else 'action'} message to chat {job.chat_id}")
+                job.finish(False)
+                return
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._release()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self) -> Optional[float]:
+        """
+        Start every call the buckets allow right now
+
+        Returns:
+            Seconds until the next call may be released (None: wait for a wakeup)
+        """
+        now = time.monotonic()
+        next_at = None
+        while len(self._in_flight) < self.max_in_flight:
+            best = None
+            for chat in self._chats.values():
+                rank = None if chat.busy else chat.head_rank()
+                if rank is None:
+                    continue
+                ready_at = max(chat.paused_until, now + chat.bucket.wait_time(now))
+                if ready_at > now:
+                    next_at = ready_at if next_at is None else min(next_at, ready_at)
+                    continue
+                key = (rank, chat.lanes[rank][0].enqueued_at)
+                if best is None or key < best[0]:
+                    best = (key, chat)
+            if best is None:
+                break
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                next_at = now + global_wait if next_at is None else min(next_at, now + global_wait)
+                break
+            (rank, _), chat = best
+            self._global.take(now)
+            chat.bucket.take(now)
+            chat.busy = True
+            job = chat.lanes[rank].popleft()
+            self.queued -= 1
+            task = self._loop.create_task(self._send(chat, job))
+            self._in_flight.add(task)
+            task.add_done_callback(self._on_sent)
+        return None if next_at is None else max(0.0, next_at - now)
+
+    def _on_sent(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._wakeup.set()
+
+    def _requeue(self, chat: _ChatQueue, job: _Outbound, delay: float):
+        if job.abandoned:
+            return  # Waiter gone: the event is redelivered (and re-queued) by its owner
+        chat.paused_until = max(chat.paused_until, time.monotonic() + delay)
+        chat.lanes[job.rank].appendleft(job)
+        self.queued += 1
+
+    async def _send(self, chat: _ChatQueue, job: _Outbound):
+        try:
+            await job.send()
+        except TelegramRetryAfter as e:
+            self.retry_after += 1
+            logger.warning(f"Telegram flood control for chat {job.chat_id}: retry after {e.retry_after}s")
+            self._requeue(chat, job, e.retry_after)
+            return
+        except self.RETRYABLE_ERRORS as e:
+            job.attempts += 1
+            if job.attempts >= self.max_attempts and (
+                    job.rank != CRITICAL_RANK or time.monotonic() - job.enqueued_at >= self.max_age):
+                self.failed += 1
+                logger.error(f"Telegram send to chat {job.chat_id} failed after {job.attempts} attempts: {e}")
+                job.finish(False)
+                return
+            delay = self._rng.uniform(0, min(self.retry_max, self.retry_base * 2 ** (job.attempts - 1)))
+            self.retried += 1
+            logger.warning(f"Telegram send to chat {job.chat_id} failed ({e}), retry {job.attempts} in {delay:.1f}s")
+            self._requeue(chat, job, delay)
+            return
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Telegram send to chat {job.chat_id} failed: {e}")
+            job.finish(False)
+            return
+        finally:
+            chat.busy = False
+        self.sent += 1
+        self.wait_latency[job.rank].record((time.monotonic() - job.enqueued_at) * 1000)
+        job.finish(True)
+
+    async def join(self):
+        """Wait until every queued call was delivered or given up"""
+        while self.queued or self._in_flight:
+            await asyncio.sleep(0.01)
+
+    async def stop(self, timeout: float = 5.0):
+        """Deliver what is queued (for up to timeout seconds), then stop"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Telegram outbound stopped with {self.queued} messages undelivered")
+        self._task.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+        for chat in self._chats.values():
+            for lane in chat.lanes:
+                for job in lane:
+                    job.finish(False)
+                lane.clear()
+        self.queued = 0
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "queued": {
+                priority: sum(len(chat.lanes[rank]) for chat in self._chats.values())
+                for priority, rank in PRIORITY_RANKS.items()
+            },
+            "in_flight": len(self._in_flight),
+            "paused_chats": sum(1 for chat in self._chats.values() if chat.paused_until > now),
+            "sent": self.sent,
+            "retried": self.retried,
+            "retry_after": self.retry_after,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "withdrawn": self.withdrawn,
+            "wait_ms": {
+                priority: self.wait_latency[rank].stats()
+                for priority, rank in PRIORITY_RANKS.items()
+            },
+        }
+
+
+class _DigestEntries:
+    """Background notifications buffered for one chat"""
+    __slots__ = ("header", "types", "total", "opened_at", "timer", "receipts")
+
+    def __init__(self, header: str):
+        self.header = header
+        self.types: Dict[str, list] = {}  # event_type -> [count, latest summary]
+        self.total = 0
+        self.opened_at = time.time()
+        self.timer = None
+        self.receipts = []  # Futures resolved with the digest's delivery result
+
+
+class DigestBuffer:
+    """
+    Per-chat digest of background notifications
+
+    Events are buffered per chat and sent as one compact HTML message
+    with a count (and the latest text) per event type, when the window
+    expires, when max_events are buffered, or on flush() (e.g. before a
+    critical notification). The digest is headed like its first event;
+    it stays within Telegram's MESSAGE_LIMIT, and event types that do not
+    fit are summarised in one line.
+
+    add() returns a receipt future that resolves to True once the digest
+    holding the event was delivered (False if it was given up), so the
+    caller can acknowledge the event only then.
+    """
+
+    WINDOW_SECONDS = 300.0
+    MAX_EVENTS = 100
+    MESSAGE_LIMIT = 4096
+    SUMMARY_CHARS = 120
+
+    def __init__(self, send: Callable[[Any, str], Awaitable[Any]], window: Optional[float] = None,
+                 max_events: Optional[int] = None):
+        """
+        Args:
+            send: async send(chat_id, html_text) delivering a rendered digest;
+                  returns True if delivered
+            window: Seconds a digest stays open after its first event
+            max_events: Buffered events that trigger an early flush
+        """
+        self.send = send
+        self.window = self.WINDOW_SECONDS if window is None else window
+        self.max_events = max_events or self.MAX_EVENTS
+        self._chats: Dict[Any, _DigestEntries] = {}
+        self._pending = set()
+        self.digests = 0
+        self.events = 0
+        self.failed = 0
+
+    async def add(self, chat_id: Any, event_type: str, summary: str, header: str,
+                  count: int = 1) -> asyncio.Future:
+        """
+        Buffer one notification
+
+        Args:
+            chat_id: Target chat
+            event_type: Ontology event type (grouping key)
+            summary: Filled template text
+            header: Message header (used if this event opens the digest)
+            count: Events it stands for (coalesced_count of merged repeats)
+
+        Returns:
+            Receipt future: True once the digest was delivered, False if not
+        """
+        entries = self._chats.get(chat_id)
+        if entries is None:
+            entries = self._chats[chat_id] = _DigestEntries(header)
+            entries.timer = asyncio.get_running_loop().call_later(self.window, self._expire, chat_id)
+        entry = entries.types.setdefault(event_type, [0, summary])
+        entry[0] += count
+        entry[1] = summary
+        entries.total += count
+        self.events += count
+        receipt = asyncio.get_running_loop().create_future()
+        entries.receipts.append(receipt)
+        if entries.total >= self.max_events:
+            await self.flush(chat_id)
+        return receipt
+
+    def _expire(self, chat_id: Any):
+        self.flush_soon(chat_id)
+
+    def flush_soon(self, chat_id: Any = None):
+        """Start sending a digest without waiting for its delivery"""
+        task = asyncio.get_running_loop().create_task(self.flush(chat_id))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self, chat_id: Any = None):
+        """Send the digest of one chat (all chats if chat_id is None)"""
+        for chat in ([chat_id] if chat_id is not None else list(self._chats)):
+            entries = self._chats.pop(chat, None)
+            if entries is None:
+                continue
+            entries.timer.cancel()
+            self.digests += 1
+            delivered = False
+            try:
+                delivered = bool(await self.send(chat, self.render(entries)))
+            except Exception as e:
+                logger.error(f"Digest for chat {chat} failed: {e}")
+            finally:
+                if not delivered:
+                    self.failed += 1
+                for receipt in entries.receipts:
+                    if not receipt.done():
+                        receipt.set_result(delivered)
+
+    def render(self, entries: _DigestEntries) -> str:
+        minutes = max(1, round((time.time() - entries.opened_at) / 60))
+        text = f"{entries.header}: дайджест, {entries.total} подій за {minutes} хв"
+        ranked = sorted(entries.types.items(), key=lambda item: -item[1][0])
+        for index, (event_type, (count, summary)) in enumerate(ranked):
+            if len(summary) > self.SUMMARY_CHARS:
+                summary = summary[:self.SUMMARY_CHARS - 1] + "…"
+            line = f"\n• <b>{html.escape(event_type)}</b> ×{count}: {html.escape(summary)}"
+            rest = len(ranked) - index - 1
+            # Keep room for the "... more types" line while others remain
+            reserve = 40 if rest else 0
+            if len(text) + len(line) + reserve > self.MESSAGE_LIMIT:
+                skipped = sum(count for _, (count, _) in ranked[index:])
+                text += f"\n… ще {len(ranked) - index} типів ({skipped} подій)"
+                break
+            text += line
+        return text
+
+    async def stop(self, timeout: float = 5.0):
+        """Send what is buffered (for up to timeout seconds)"""
+        self.flush_soon()
+        pending = list(self._pending)
+        if not pending:
+            return
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning(f"Digest stopped with {len(not_done)} digests undelivered")
+            for task in not_done:
+                task.cancel()
+            await asyncio.gather(*not_done, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": sum(entries.total for entries in self._chats.values()),
+            "digests": self.digests,
+            "events": self.events,
+            "failed": self.failed,
+        }
+
 
 class TelegramNotifier:
     """Telegram інтеграція для CIT Voice"""
     
-    # Cache configuration
-    CACHE_TTL_SECONDS = 86400  # 24 hours
-    CACHE_CLEANUP_INTERVAL = 3600  # 1 hour
+    # Медіа за типом події, якщо мапу не передано (ontology.json: "media")
+    DEFAULT_MEDIA_MAP = {
+        'module_proposal': 'icons/action.png',
+        'structural_gap': 'icons/critical.png',
+        'intent_detected': 'icons/intent.png'
+    }
+    WARMUP_CONCURRENCY = 4
     
-    def __init__(self, bot_token: str, chat_id: str, media_repo_url: Optional[str] = None):
-        self.bot = Bot(token=bot_token)
+    def __init__(self, bot_token: str, chat_id: str, media_repo_url: Optional[str] = None,
+                 api_server: Optional[str] = None, per_chat_rate: Optional[float] = None,
+                 global_rate: Optional[float] = None, digest_window: Optional[float] = None,
+                 digest_max_events: Optional[int] = None, file_id_cache_path: Optional[str] = None,
+                 media_cache_dir: Optional[str] = None, media_cache_bytes: Optional[int] = None,
+                 media_map: Optional[Dict[str, str]] = None):
+        # api_server: власний Bot API сервер (локальний або тестовий)
+        session = AiohttpSession(api=TelegramAPIServer.from_base(api_server)) if api_server else None
+        self.bot = Bot(token=bot_token, session=session)
         self.dp = Dispatcher()
         self.router = Router()
         self.chat_id = chat_id
         self.media_repo_url = media_repo_url or "https://raw.githubusercontent.com/Ihorog/media/main"
         
-        # Media cache with cleanup
-        self.media_cache_dir = Path(tempfile.gettempdir()) / 'cit_media_cache'
-        self.media_cache_dir.mkdir(exist_ok=True)
-        self.media_locks = {}  # asyncio locks instead of file locks
-        self.cleanup_task = None  # Track cleanup task for proper shutdown
+        # Кеш медіа: один пул з'єднань, адресація за вмістом, LRU за розміром, ETag
+        self.media = MediaCache(self.media_repo_url, directory=media_cache_dir, max_bytes=media_cache_bytes)
+        self.media_map = dict(self.DEFAULT_MEDIA_MAP if media_map is None else media_map)
+        # Сигнал готовності: прогрів медіа завершено (успішно чи ні)
+        self.media_ready = asyncio.Event()
+        self.warmup_task = None
+        self.warmup_stats = {'assets': 0, 'cached': 0, 'failed': [], 'ms': None}
+        # file_id завантажених медіа за хешем вмісту (None - лише в пам'яті)
+        self.file_ids = FileIdCache(file_id_cache_path)
+        
+        # Черга відправки: ліміти Telegram, RetryAfter, пріоритети рівнів
+        self.outbound = OutboundScheduler(per_chat_rate=per_chat_rate, global_rate=global_rate)
+        # Дайджест фонових подій (рівень 1); digest_window=0 вимикає
+        self.digest = DigestBuffer(self._send_digest, window=digest_window, max_events=digest_max_events)
         
         # Register handlers
         self._setup_handlers()
@@ -92,10 +603,18 @@ class TelegramNotifier:
             )
             logger.info(f"Intent {intent_id} rejected by user")
     
-    async def handle_event(self, event: Dict[str, Any]):
+    async def handle_event(self, event: Dict[str, Any]) -> Optional[asyncio.Future]:
         """
         Обробка події від VoiceEngine
-        Форматування та відправка повідомлення в Telegram
+        Форматування та відправка повідомлення через чергу Telegram
+        
+        Повертається після доставки (RetryAfter і повтори - в черзі), тож
+        таймаут і circuit breaker диспетчера бачать недоступний Telegram.
+        Фонова подія в дайджесті повертає квитанцію: future, що стане True
+        після доставки дайджесту (VoiceEngine підтверджує подію лише тоді).
+        
+        Raises:
+            DeliveryFailed: Критичне або дієве повідомлення не доставлено
         """
         level = event['level']
         emoji = event['emoji']
@@ -110,34 +629,83 @@ class TelegramNotifier:
         requires_media = event.get('requires_media', False)
         interactive = event.get('interactive', False)
         
+        priority = event.get('priority', 'background')
         try:
+            # Фонові події без медіа та кнопок - у дайджест
+            if self.digest.window and priority == 'background' \
+                    and not requires_media and not interactive:
+                return await self.digest.add(self.chat_id, event_type, self._fill_template(template, data),
+                                             self._format_header(level, emoji), data.get('coalesced_count', 1))
+            # Критична подія: накопичений дайджест іде в чергу одразу, не чекаючи вікна
+            if priority == 'critical':
+                self.digest.flush_soon(self.chat_id)
+            
             # Підготовка keyboard для інтерактивних подій
             keyboard = self._create_action_keyboard(event_type) if interactive else None
             
-            # Отримання медіа, якщо потрібно
-            media_path = None
+            # Отримання медіа, якщо потрібно (логічна назва - ключ "того ж активу" в кеші file_id)
+            media_path = media_name = None
             if requires_media:
+                media_name = self.media_map.get(event_type)
                 media_path = await self._get_media_for_event(event_type)
             
-            # Відправка повідомлення (уніфікований метод)
-            await self._send_notification(message_text, media_path, keyboard)
+            # Відправка через чергу (уніфікований метод, повтор при помилках)
+            delivered = await self.outbound.submit(
+                self.chat_id,
+                lambda: self._send_notification(message_text, media_path, keyboard, media_name),
+                priority,
+                wait=True
+            )
+            if not delivered:
+                if priority != 'background':
+                    raise DeliveryFailed(f"{event_type} notification not delivered")
+                logger.warning(f"Background notification dropped: type={event_type}")
+                return None
             
-            logger.info(f"Message sent successfully: level={level}, type={event_type}")
+            logger.info(f"Message sent: level={level}, type={event_type}")
+            return None
             
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
+            raise
     
     async def _send_notification(self, message_text: str, media_path: Optional[str] = None, 
-                                 keyboard: Optional[InlineKeyboardMarkup] = None):
-        """Уніфікований метод відправки повідомлень"""
+                                 keyboard: Optional[InlineKeyboardMarkup] = None,
+                                 media_name: Optional[str] = None):
+        """
+        Уніфікований метод відправки повідомлень
+        
+        media_name - логічна назва медіа з онтології (icons/action.png):
+        файли кешу адресовані за вмістом, тож за нею file_id старих байтів
+        того ж активу витісняється з кешу.
+        """
         if media_path:
-            await self.bot.send_photo(
+            media_name = media_name or Path(media_path).name
+            # Повторна відправка тих самих байтів - за file_id, без завантаження
+            digest = await asyncio.to_thread(self.file_ids.digest, media_path)
+            file_id = self.file_ids.get(digest)
+            if file_id:
+                try:
+                    await self.bot.send_photo(
+                        chat_id=self.chat_id,
+                        photo=file_id,
+                        caption=message_text,
+                        parse_mode=ParseMode.HTML,
+                        reply_markup=keyboard
+                    )
+                    return
+                except TelegramBadRequest as e:
+                    logger.warning(f"Cached file_id rejected for {media_name}: {e}")
+                    await asyncio.to_thread(self.file_ids.invalidate, digest)
+            message = await self.bot.send_photo(
                 chat_id=self.chat_id,
                 photo=FSInputFile(media_path),
                 caption=message_text,
                 parse_mode=ParseMode.HTML,
                 reply_markup=keyboard
             )
+            if message.photo:
+                await asyncio.to_thread(self.file_ids.put, digest, message.photo[-1].file_id, media_name)
         else:
             await self.bot.send_message(
                 chat_id=self.chat_id,
@@ -146,11 +714,38 @@ class TelegramNotifier:
                 reply_markup=keyboard
             )
     
+    async def _send_digest(self, chat_id: Any, text: str) -> bool:
+        return await self.outbound.submit(
+            chat_id,
+            lambda: self.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML),
+            'background',
+            wait=True
+        )
+    
+    @staticmethod
+    def _fill_template(template: str, data: Dict[str, Any]) -> str:
+        """Заповнення шаблону даними (шаблон без змін, якщо даних бракує)"""
+        try:
+            return template.format(**data)
+        except KeyError:
+            return template
+    
     def _format_message(self, level: str, emoji: str, template: str, data: Dict[str, Any]) -> str:
         """
         Форматування повідомлення згідно з шаблоном
         Стиль: Максимальна щільність 111. Жодної ввічливості.
         """
+        # Заповнення шаблону даними
+        formatted_template = self._fill_template(template, data)
+        
+        # Фінальне повідомлення
+        message = f"{self._format_header(level, emoji)}: {formatted_template}"
+        
+        return message
+    
+    @staticmethod
+    def _format_header(level: str, emoji: str) -> str:
+        """Заголовок повідомлення: емодзі, рівень і його назва"""
         # Базовий заголовок
         header = f"{emoji} <b>[{level}]</b>"
         
@@ -164,16 +759,7 @@ class TelegramNotifier:
         else:
             level_name = ""
         
-        # Заповнення шаблону даними
-        try:
-            formatted_template = template.format(**data)
-        except KeyError:
-            formatted_template = template
-        
-        # Фінальне повідомлення
-        message = f"{header} {level_name}: {formatted_template}"
-        
-        return message
+        return f"{header} {level_name}"
     
     def _create_action_keyboard(self, event_type: str) -> InlineKeyboardMarkup:
         """
@@ -198,89 +784,84 @@ class TelegramNotifier:
         Отримання медіа активу для події з репозиторію media
         Повертає шлях до локально збереженого файлу
         """
-        # Мапінг типів подій на медіа файли
-        media_map = {
-            'module_proposal': 'icons/action.png',
-            'structural_gap': 'icons/critical.png',
-            'intent_detected': 'icons/intent.png'
-        }
-        
-        media_file = media_map.get(event_type)
+        media_file = self.media_map.get(event_type)
         if not media_file:
             return None
         
-        # Шлях для кешування медіа локально
-        local_path = self.media_cache_dir / Path(media_file).name
+        # Після прогріву - одна спроба: без пауз backoff на шляху сповіщення
+        return await self.media.get(media_file, attempts=1 if self.media_ready.is_set() else None)
+    
+    async def warm_up_media(self, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Попереднє завантаження всіх медіа з media_map
         
-        # Якщо файл вже кешований, повернути його
-        if local_path.exists():
-            return str(local_path)
+        Завантаження паралельні (не більше concurrency одночасно);
+        media_ready встановлюється після завершення, навіть з помилками.
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(concurrency or self.WARMUP_CONCURRENCY)
+        media_files = sorted(set(self.media_map.values()))
         
-        # Використання asyncio.Lock замість файлових lock'ів
-        if media_file not in self.media_locks:
-            self.media_locks[media_file] = asyncio.Lock()
+        async def fetch(media_file: str) -> Optional[str]:
+            async with semaphore:
+                return await self.media.get(media_file)
         
-        async with self.media_locks[media_file]:
-            # Повторна перевірка після отримання lock'а
-            if local_path.exists():
-                return str(local_path)
-            
-            # Завантажити файл з retry логікою
-            url = f"{self.media_repo_url}/{media_file}"
-            
-            for attempt in range(3):  # 3 спроби
-                try:
-                    async with httpx.AsyncClient() as client:
-                        response = await client.get(url, timeout=10.0)
-                        if response.status_code == 200:
-                            # Використання async file I/O через to_thread
-                            def write_file():
-                                with open(local_path, 'wb') as f:
-                                    f.write(response.content)
-                            await asyncio.to_thread(write_file)
-                            logger.info(f"Downloaded media: {media_file}")
-                            return str(local_path)
-                        else:
-                            logger.warning(f"Failed to download {media_file}: HTTP {response.status_code}")
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1}/3 failed for {media_file}: {e}")
-                    if attempt < 2:
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
+        try:
+            paths = await asyncio.gather(*(fetch(media_file) for media_file in media_files),
+                                         return_exceptions=True)
+            failed = [media_file for media_file, path in zip(media_files, paths)
+                      if path is None or isinstance(path, BaseException)]
+            self.warmup_stats = {
+                'assets': len(media_files),
+                'cached': len(media_files) - len(failed),
+                'failed': failed,
+                'ms': round((time.perf_counter() - started) * 1000, 1)
+            }
+            if failed:
+                logger.warning(f"Media warm-up: {len(failed)} of {len(media_files)} assets unavailable: {failed}")
+            else:
+                logger.info(f"Media warm-up: {len(media_files)} assets ready in {self.warmup_stats['ms']} ms")
+        finally:
+            self.media_ready.set()
+        return self.warmup_stats
+    
+    def update_media_map(self, media_map: Dict[str, str]):
+        """
+        Підхопити мапу медіа з перезавантаженої онтології
         
-        return None
+        Нові активи прогріваються у фоні (вже збережені - влучання в кеш);
+        викликати в event loop (VoiceEngine.add_ontology_listener).
+        """
+        media_map = dict(media_map)
+        if media_map == self.media_map:
+            return
+        self.media_map = media_map
+        logger.info(f"Media map updated: {len(media_map)} event types")
+        self.warmup_task = asyncio.get_running_loop().create_task(self._rewarm_media(self.warmup_task))
+    
+    async def _rewarm_media(self, previous: Optional[asyncio.Task]):
+        if previous is not None and not previous.done():
+            await asyncio.gather(previous, return_exceptions=True)
+        await self.warm_up_media()
     
     async def start(self):
         """Запуск Telegram бота"""
         logger.info("Starting Telegram bot...")
-        # Start cleanup task and track it
-        self.cleanup_task = asyncio.create_task(self._cleanup_media_cache())
+        if self.warmup_task is None:
+            self.warmup_task = asyncio.create_task(self.warm_up_media())
         await self.dp.start_polling(self.bot)
     
-    async def _cleanup_media_cache(self):
-        """Періодичне очищення старих файлів з кешу"""
-        while True:
-            try:
-                await asyncio.sleep(self.CACHE_CLEANUP_INTERVAL)
-                current_time = time.time()
-                for file_path in self.media_cache_dir.glob('*'):
-                    if file_path.is_file():
-                        # Remove files older than CACHE_TTL_SECONDS
-                        file_age = current_time - file_path.stat().st_mtime
-                        if file_age > self.CACHE_TTL_SECONDS:
-                            file_path.unlink()
-                            logger.info(f"Cleaned up cached file: {file_path.name}")
-            except Exception as e:
-                logger.error(f"Error during cache cleanup: {e}")
-    
     async def stop(self):
         """Зупинка Telegram бота"""
-        # Cancel cleanup task
-        if self.cleanup_task and not self.cleanup_task.done():
-            self.cleanup_task.cancel()
+        if self.warmup_task and not self.warmup_task.done():
+            self.warmup_task.cancel()
             try:
-                await self.cleanup_task
+                await self.warmup_task
             except asyncio.CancelledError:
                 pass
+        await self.digest.stop()
+        await self.outbound.stop()
+        await self.media.close()
         await self.bot.session.close()
         logger.info("Telegram bot stopped")
 
@@ -4,13 +4,21 @@
 """
 
 import asyncio
+import hashlib
+import json
 import sys
+import time
 import traceback
 from pathlib import Path
 
+from aiohttp import web
+
 # Додати поточну директорію до шляху
 sys.path.insert(0, str(Path(__file__).parent))
 
+from core.coalesce import TokenBucket
+from core.dispatch import EventDispatcher
+from core.ontology import ClassifiedEvent
 from core.voice_engine import VoiceEngine
 
 
@@ -131,6 +139,1484 @@ async def test_classification():
         print(f"  → Interactive: {result['interactive']}")
         print()
 
+    # Мікробенчмарк: попередня класифікація (dict на кожну подію) проти скомпільованої
+    import timeit
+    import tracemalloc
+    from datetime import datetime
+
+    ontology = engine.ontology
+
+    def classify_legacy(event_data):
+        event_type = event_data.get('type', 'state_change')
+        event_config = ontology.get('event_types', {}).get(event_type, {})
+        level = event_config.get('level', '1')
+        level_config = ontology.get('event_levels', {}).get(level, {})
+        return {
+            'level': level,
+            'emoji': level_config.get('emoji', '⚪'),
+            'priority': level_config.get('priority', 'background'),
+            'template': event_config.get('template', ''),
+            'requires_media': event_config.get('requires_media', False),
+            'interactive': event_config.get('interactive', False),
+            'event_type': event_type,
+            'timestamp': datetime.now().isoformat(),
+            'data': event_data
+        }
+
+    def bench(classify):
+        seconds = min(timeit.repeat(lambda: [classify(e) for e in test_cases], number=2000, repeat=3))
+        tracemalloc.start()
+        kept = [classify(e) for e in test_cases * 1000]
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        return seconds, allocated
+
+    legacy_time, legacy_bytes = bench(classify_legacy)
+    compiled_time, compiled_bytes = bench(engine.classify_event)
+    print(f"Legacy:   {legacy_time * 1000:.1f} ms, {legacy_bytes / 1024:.0f} KiB per 6000 events")
+    print(f"Compiled: {compiled_time * 1000:.1f} ms, {compiled_bytes / 1024:.0f} KiB per 6000 events")
+    assert compiled_time < legacy_time, "Compiled classification is not faster"
+    assert compiled_bytes < legacy_bytes, "Compiled classification allocates more"
+    assert dict(engine.classify_event(test_cases[0])).keys() == classify_legacy(test_cases[0]).keys()
+    print("✅ Compiled ontology classification is cheaper per event")
+
+
+async def test_dispatch():
+    """Тестування черги з пріоритетами під сплеском подій"""
+    
+    import tempfile
+    import time
+    
+    print("\n📬 Testing Priority Dispatch\n")
+    
+    class SlowHandler:
+        """Обробник, якому потрібна 1 мс на подію"""
+        def __init__(self):
+            self.received = []
+        
+        async def handle_event(self, event):
+            await asyncio.sleep(0.001)
+            self.received.append(event['event_type'])
+    
+    base_path = Path(__file__).parent
+    
+    # 10k фонових подій за секунду, критична подія кожні 1000
+    engine = VoiceEngine(
+        ontology_path=str(base_path / "core" / "ontology.json"),
+        manifest_path=str(base_path / "public" / "manifest.json"),
+        event_queue_size=1000, event_coalescing=False
+    )
+    handler = SlowHandler()
+    engine.register_handler(handler)
+    
+    started = time.perf_counter()
+    for i in range(10000):
+        await engine.process_event({'type': 'knowledge_synthesis', 'source': 'burst'})
+        if i % 1000 == 999:
+            await engine.process_event({'type': 'structural_gap', 'source': 'burst'})
+        if i % 10 == 9:
+            # ~10k подій/с: пачка з 10 подій щомілісекунди
+            await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    await engine.dispatcher.join()
+    
+    stats = engine.dispatcher.stats()
+    critical = stats['wait_ms']['critical']
+    print(f"Submitted 10k background + 10 critical events in {elapsed * 1000:.0f} ms")
+    print(f"  → Processed: {stats['processed']}, dropped background: {stats['dropped']}")
+    print(f"  → Critical queue wait: {critical}")
+    print(f"  → Background queue wait: {stats['wait_ms']['background']}")
+    assert handler.received.count('structural_gap') == 10, "Critical event lost"
+    assert critical['max_ms'] < 50, f"Critical events waited behind background: {critical}"
+    assert stats['queued'] == {'critical': 0, 'action': 0, 'background': 0}
+    print("✅ Critical events never dropped and served ahead of background")
+    engine.dispatcher.stop()
+    
+    # Spill-to-disk: nothing is dropped, overflow is replayed from the file
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = VoiceEngine(
+            ontology_path=str(base_path / "core" / "ontology.json"),
+            manifest_path=str(base_path / "public" / "manifest.json"),
+            event_queue_size=100, overflow_policy='spill',
+            spill_path=str(Path(tmpdir) / "events.spill.jsonl"),
+            event_coalescing=False
+        )
+        handler = SlowHandler()
+        engine.register_handler(handler)
+        kinds = set()
+        
+        class TypeRecorder:
+            async def handle_event(self, event):
+                kinds.add(type(event))
+        
+        engine.register_handler(TypeRecorder())
+        for i in range(1000):
+            await engine.process_event({'type': 'state_change', 'state_description': str(i)})
+        await engine.dispatcher.join()
+        stats = engine.dispatcher.stats()
+        print(f"Spill policy: processed {stats['processed']}, spilled {stats['spilled']}")
+        assert len(handler.received) == 1000, f"Spill lost events: {len(handler.received)}"
+        assert stats['spilled'] > 0 and stats['spilled_pending'] == 0
+        assert kinds == {ClassifiedEvent}, f"Spilled events handed over as {kinds}"
+        print("✅ Spilled events replayed after the burst, as ClassifiedEvent")
+        engine.dispatcher.stop()
+
+    # Leftover spill file, journal seq and join() across the last refill
+    class JournaledEvent(dict):
+        seq = None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        spill_path = Path(tmpdir) / "events.spill.jsonl"
+        with open(spill_path, 'w', encoding='utf-8') as f:
+            for i in range(3):
+                f.write(json.dumps({'event_type': 'old', 'priority': 'background', 'n': i}) + "\n")
+        delivered = []
+
+        async def record(handler, event):
+            await asyncio.sleep(0.001)
+            delivered.append((event['event_type'], event['n'], getattr(event, 'seq', None)))
+            return True
+
+        def restore(spilled):
+            event = JournaledEvent(spilled['event'])
+            event.seq = spilled.get('seq')
+            return event
+
+        for queue_size, leftover in ((4, [0, 1, 2]), (2, [])):
+            delivered.clear()
+            dispatcher = EventDispatcher([object()], record, workers=1, max_queue_size=queue_size,
+                                         overflow='spill', spill_path=str(spill_path),
+                                         restore_event=restore)
+            for i in range(10):
+                event = JournaledEvent(event_type='new', priority='background', n=i)
+                event.seq = 100 + i
+                await dispatcher.submit(event)
+            await dispatcher.join()
+            new = sorted(n for kind, n, _ in delivered if kind == 'new')
+            assert new == list(range(10)), f"queue {queue_size}: new events lost: {new}"
+            assert all(seq == 100 + n for kind, n, seq in delivered if kind == 'new'), \
+                "Journal seq lost on refill"
+            old = sorted(n for kind, n, _ in delivered if kind == 'old')
+            assert old == leftover, f"queue {queue_size}: leftover events {old}"
+            assert not spill_path.exists(), "Spill file left after draining"
+            dispatcher.stop()
+    print("✅ Leftover spill events re-queued, seq kept, join() waits for the last refill")
+
+    # Block: back-pressure instead of unbounded in-flight tasks
+    engine = _create_test_engine()
+    engine.coalescer.enabled = False
+    engine.dispatcher.max_queue_size = 10
+    engine.dispatcher.overflow = 'block'
+    handler = SlowHandler()
+    engine.register_handler(handler)
+    for i in range(100):
+        await engine.process_event({'type': 'state_change', 'state_description': str(i)})
+        assert engine.dispatcher.stats()['queued']['background'] <= 10
+    await engine.process_event({'type': 'structural_gap'}, wait=True)
+    assert 'structural_gap' in handler.received, "wait=True returned before handling"
+    print("✅ Block policy bounds the queue; wait=True returns after handling")
+    engine.dispatcher.stop()
+
+
+async def test_ontology_reload():
+    """Тестування гарячого перезавантаження ontology.json"""
+    
+    import json
+    import shutil
+    import tempfile
+    import threading
+    import time
+    
+    print("\n🔄 Testing Ontology Hot Reload\n")
+    
+    base_path = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        ontology_path = Path(tmp) / "ontology.json"
+        shutil.copy(base_path / "core" / "ontology.json", ontology_path)
+        engine = VoiceEngine(
+            ontology_path=str(ontology_path),
+            manifest_path=str(base_path / "public" / "manifest.json")
+        )
+        original = json.loads(ontology_path.read_text(encoding='utf-8'))
+        
+        def write_ontology(data):
+            # Атомарний запис, як у редакторах (rename поверх файлу)
+            tmp_path = ontology_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+            tmp_path.replace(ontology_path)
+        
+        def with_type(level, template):
+            data = json.loads(json.dumps(original))
+            data['event_types']['deploy_finished'] = {'level': level, 'template': template}
+            return data
+        
+        assert engine.classify_event({'type': 'deploy_finished'})['template'] == ''
+        
+        # Зміна файлу підхоплюється watchdog без перезапуску
+        await engine.watch_ontology()
+        write_ontology(with_type('111', 'Deploy {version} готовий'))
+        for _ in range(300):
+            if engine.classify_event({'type': 'deploy_finished'})['level'] == '111':
+                break
+            await asyncio.sleep(0.01)
+        result = engine.classify_event({'type': 'deploy_finished'})
+        assert result['level'] == '111' and result['priority'] == 'critical', "Reload not picked up"
+        print(f"✅ Watched reload applied in {engine.ontology_stats['last_reload_ms']} ms "
+              f"(version {engine.ontology_stats['version']})")
+        
+        # Некоректний файл відхиляється, поточна таблиця лишається
+        failures = engine.ontology_stats['failures']
+        write_ontology(with_type('999', 'broken'))
+        for _ in range(300):
+            if engine.ontology_stats['failures'] > failures:
+                break
+            await asyncio.sleep(0.01)
+        assert engine.ontology_stats['failures'] > failures, "Invalid ontology not reported"
+        assert engine.classify_event({'type': 'deploy_finished'})['level'] == '111'
+        print(f"✅ Invalid ontology rejected: {engine.ontology_stats['last_error']}")
+        engine.observer.stop()
+        engine.observer.join()
+        
+        # Класифікація під час перезавантажень бачить узгоджену таблицю
+        versions = [with_type('1', 'A'), with_type('111', 'B')]
+        current = engine.classify_event({'type': 'deploy_finished'})
+        expected = {('1', 'A'), ('111', 'B'), (current['level'], current['template'])}
+        seen = set()
+        stop = threading.Event()
+        
+        def classify_loop():
+            while not stop.is_set():
+                event = engine.classify_event({'type': 'deploy_finished'})
+                seen.add((event['level'], event['template']))
+        
+        reader = threading.Thread(target=classify_loop)
+        reader.start()
+        reloads = engine.ontology_stats['reloads']
+        for i in range(40):
+            write_ontology(versions[i % 2])
+            engine.reload_ontology()
+            time.sleep(0.001)
+        stop.set()
+        reader.join()
+        assert engine.ontology_stats['reloads'] - reloads == 40, "Not every version was swapped in"
+        assert seen <= expected, f"Torn classification: {seen - expected}"
+        print(f"✅ 40 reloads under concurrent classification, no torn reads "
+              f"(last {engine.ontology_stats['last_reload_ms']} ms)")
+        engine.dispatcher.stop()
+
+
+async def test_coalescing():
+    """Тестування злиття повторних подій та лімітів частоти"""
+    
+    import json
+    import tempfile
+    
+    print("\n🧲 Testing Event Coalescing\n")
+    
+    class CollectingHandler:
+        def __init__(self):
+            self.received = []
+        
+        async def handle_event(self, event):
+            self.received.append(event)
+    
+    base_path = Path(__file__).parent
+    ontology = json.loads((base_path / "core" / "ontology.json").read_text(encoding='utf-8'))
+    ontology['event_levels']['1']['coalesce_window_seconds'] = 0.05
+    ontology['event_levels']['1']['rate_limit'] = {'per_minute': 600, 'burst': 2}
+    ontology['event_types']['state_change']['coalesce_window_seconds'] = 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        ontology_path = Path(tmp) / "ontology.json"
+        ontology_path.write_text(json.dumps(ontology, ensure_ascii=False), encoding='utf-8')
+        engine = VoiceEngine(
+            ontology_path=str(ontology_path),
+            manifest_path=str(base_path / "public" / "manifest.json")
+        )
+        handler = CollectingHandler()
+        engine.register_handler(handler)
+        
+        # Шторм однакових подій: перша одразу, решта одним підсумком
+        for i in range(200):
+            await engine.process_event({'type': 'knowledge_synthesis', 'source': 'manifest', 'n': i})
+        await engine.dispatcher.join()
+        assert len(handler.received) == 1, "Leading event not delivered at once"
+        await asyncio.sleep(0.3)
+        await engine.dispatcher.join()
+        summary = handler.received[-1]
+        print(f"200 events → {len(handler.received)} deliveries, "
+              f"summary count {summary['data'].get('coalesced_count')}")
+        assert len(handler.received) == 2
+        assert summary['data']['coalesced_count'] == 199 and summary['data']['n'] == 199
+        print("✅ Storm coalesced into one summary with a count")
+        
+        # Різні джерела та критичні події не зливаються
+        handler.received.clear()
+        await engine.process_event({'type': 'knowledge_synthesis', 'source': 'api'})
+        for _ in range(20):
+            await engine.process_event({'type': 'structural_gap', 'source': 'detector'})
+        await engine.dispatcher.join()
+        types = [event['event_type'] for event in handler.received]
+        assert types.count('structural_gap') == 20 and types.count('knowledge_synthesis') == 1
+        print("✅ Other sources and critical events pass through")
+        
+        # Ліміт частоти (10/с, burst 2): надлишок утримується, а не губиться
+        handler.received.clear()
+        for i in range(5):
+            await engine.process_event({'type': 'state_change', 'source': f's{i}'})
+        await engine.dispatcher.join()
+        assert len(handler.received) == 2, f"Burst not limited: {len(handler.received)}"
+        await asyncio.sleep(0.6)
+        await engine.dispatcher.join()
+        stats = engine.coalescer.stats()
+        print(f"Rate limit: {len(handler.received)} delivered, stats {stats}")
+        assert len(handler.received) == 5 and stats['rate_limited'] == 3 and stats['held'] == 0
+        print("✅ Token bucket delays excess events without losing them")
+        
+        # Diff-події в одному вікні: підсумок несе зміни всіх злитих подій
+        handler.received.clear()
+        await asyncio.sleep(0.3)  # Токени відновлено
+        states = [{'system_health': 'ok', 'active_modules': []},
+                  {'system_health': 'degraded', 'active_modules': []},
+                  {'system_health': 'degraded', 'active_modules': ['podija']},
+                  {'system_health': 'failed', 'active_modules': ['podija']}]
+        for previous, current in zip(states, states[1:]):
+            await engine.process_event(engine.state_change_event(previous, current))
+        await asyncio.sleep(0.3)
+        await engine.dispatcher.join()
+        assert len(handler.received) == 2, f"Diffs not coalesced: {len(handler.received)}"
+        summary = handler.received[-1]['data']
+        print(f"Coalesced diff: {summary['changes']}")
+        assert summary['coalesced_count'] == 2
+        assert summary['changes'] == [
+            {'op': 'add', 'path': '/active_modules/0', 'value': 'podija'},
+            {'op': 'replace', 'path': '/system_health', 'value': 'failed'}]
+        assert summary['changed_paths'] == ['/active_modules/0', '/system_health']
+        assert summary['semantic_categories'] == {'intent_observation': ['/active_modules/0'],
+                                                  'error_detection': ['/system_health']}
+        print("✅ Both held diffs reach the handler in the summary")
+        engine.coalescer.stop()
+        engine.dispatcher.stop()
+
+
+async def test_state_diff():
+    """Тестування структурного diff стану API"""
+    
+    import copy
+    import hashlib
+    import json
+    import time
+    from core.json_diff import json_diff, apply_patch
+    
+    print("\n🧬 Testing API State Diff\n")
+    
+    base_path = Path(__file__).parent
+    state = json.loads((base_path / "api" / "state-visual.json").read_text(encoding='utf-8'))
+    
+    # Diff + patch відтворюють новий стан
+    cases = [
+        (state, dict(state, system_health='degraded')),
+        (state, dict(state, active_modules=state['active_modules'] + ['podija'])),
+        (state, dict(state, active_modules=state['active_modules'][:1])),
+        ({'a/b': {'~x': 1}}, {'a/b': {'~x': 2, 'y': [1, 2]}}),
+        ({'a': 1, 'b': 2}, {'b': 2}),
+        ([1, {'x': 1}], [1, {'x': 1.0}]),
+    ]
+    for old, new in cases:
+        patch = json_diff(old, new)
+        assert apply_patch(copy.deepcopy(old), patch) == new, f"Patch mismatch: {patch}"
+    assert json_diff(state, copy.deepcopy(state)) == []
+    print(json_diff(cases[3][0], cases[3][1]))
+    print("✅ json_diff / apply_patch round-trip")
+    
+    # Подія несе лише змінені шляхи з категоріями semantic_mappings
+    engine = _create_test_engine()
+    current = dict(state, system_health='degraded', active_modules=state['active_modules'] + ['podija'],
+                   last_update='2026-01-25T17:31:00Z')
+    event = engine.state_change_event(state, current)
+    print(f"Changed paths: {event['changed_paths']}")
+    print(f"Categories: {event['semantic_categories']}")
+    assert event['changed_paths'] == ['/active_modules/3', '/system_health']
+    assert event['semantic_categories'] == {'intent_observation': ['/active_modules/3'],
+                                            'error_detection': ['/system_health']}
+    assert 'structural_gap' in event['related_event_types']
+    assert engine.state_change_event(state, dict(state, last_update='later')) is None
+    print("✅ Changes mapped to semantic_mappings; /last_update alone ignored")
+    
+    # Вартість diff залежить від розміру зміни, а не документа
+    big = {f'module_{i}': {'status': 'ok', 'metrics': list(range(20))} for i in range(20000)}
+    changed = copy.deepcopy(big)
+    changed['module_12345']['status'] = 'failed'
+    started = time.perf_counter()
+    patch = json_diff(big, changed)
+    diff_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    hashlib.md5(json.dumps(changed, sort_keys=True).encode()).hexdigest()
+    hash_ms = (time.perf_counter() - started) * 1000
+    print(f"20k-module state, 1 change: diff {diff_ms:.1f} ms ({len(patch)} op), "
+          f"full re-serialise + MD5 {hash_ms:.1f} ms")
+    assert patch == [{'op': 'replace', 'path': '/module_12345/status', 'value': 'failed'}]
+    assert diff_ms < hash_ms, "Diff slower than re-hashing the whole state"
+    print("✅ Diff cost follows the change size")
+    engine.dispatcher.stop()
+
+
+async def test_conditional_polling():
+    """Тестування умовного опитування API з адаптивним інтервалом"""
+    
+    import hashlib
+    import json
+    import random
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from core.polling import AdaptivePollInterval
+    
+    print("\n📡 Testing Conditional API Polling\n")
+    
+    # Адаптивний інтервал: скорочення після змін, відступ з джитером
+    policy = AdaptivePollInterval(30, rng=random.Random(1))
+    assert 4.5 <= policy.changed() <= 5.5
+    delays = [policy.unchanged() for _ in range(10)]
+    assert policy.current == 120 and 108 <= delays[-1] <= 132
+    policy.changed()
+    policy.failed()
+    assert policy.current == 60, "Errors must back off from at least the base interval"
+    print("✅ Interval tightens on change, backs off with jitter when idle or failing")
+    
+    base_path = Path(__file__).parent
+    state = json.loads((base_path / "api" / "state-visual.json").read_text(encoding='utf-8'))
+    served = {'bodies': 0, 'not_modified': 0}
+    
+    class StateHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(state).encode()
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                served['not_modified'] += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            served['bodies'] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    class CollectingHandler:
+        def __init__(self):
+            self.received = []
+        
+        async def handle_event(self, event):
+            self.received.append(event)
+    
+    engine = VoiceEngine(
+        ontology_path=str(base_path / "core" / "ontology.json"),
+        manifest_path=str(base_path / "public" / "manifest.json"),
+        api_endpoint=f"http://127.0.0.1:{server.server_port}/api/state-visual",
+        event_coalescing=False
+    )
+    handler = CollectingHandler()
+    engine.register_handler(handler)
+    poll_task = asyncio.create_task(engine.poll_api_state(interval=0.06))
+    
+    # Стабільний стан: 304 без тіла, інтервал росте до максимуму
+    await asyncio.sleep(1.0)
+    stats = engine.get_metrics()['api_poll']
+    print(f"Steady: {stats}")
+    assert stats['requests'] >= 4 and stats['not_modified'] == stats['requests'] - 1
+    assert served['bodies'] == 1 and not handler.received
+    assert stats['interval_seconds'] == engine.api_poll_interval.maximum
+    print("✅ Steady state costs 304s only; interval backed off")
+    
+    # Зміна: подія з шляхом, інтервал скорочується
+    state['system_health'] = 'degraded'
+    for _ in range(200):
+        if handler.received:
+            break
+        await asyncio.sleep(0.01)
+    await engine.dispatcher.join()
+    assert handler.received and handler.received[0]['data']['changed_paths'] == ['/system_health']
+    assert engine.api_poll_interval.current < engine.api_poll_interval.maximum
+    print(f"✅ Change detected ({handler.received[0]['data']['changed_paths']}); "
+          f"interval tightened to {engine.api_poll_interval.current:.3f}s")
+    
+    # Помилки: відступ до максимуму
+    server.shutdown()
+    server.server_close()
+    await asyncio.sleep(0.8)
+    assert engine.api_poll_interval.current == engine.api_poll_interval.maximum
+    print("✅ Errors back off to the maximum interval")
+    
+    poll_task.cancel()
+    await asyncio.gather(poll_task, return_exceptions=True)
+    engine.dispatcher.stop()
+
+
+async def test_file_watchers():
+    """Тестування реєстру файлових джерел"""
+    
+    import os
+    import tempfile
+    
+    print("\n👀 Testing File Watch Registry\n")
+    
+    class CollectingHandler:
+        def __init__(self):
+            self.received = []
+        
+        async def handle_event(self, event):
+            self.received.append((event['event_type'], event['data']['source']))
+    
+    base_path = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        files = {
+            'manifest': root / "public" / "manifest.json",
+            'todo': root / "docs" / "todo" / "manifest.json",
+            'state': root / "api" / "state-visual.json",
+            'other': root / "api" / "other.json",
+        }
+        for path in files.values():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('{}', encoding='utf-8')
+        
+        engine = VoiceEngine(
+            ontology_path=str(base_path / "core" / "ontology.json"),
+            manifest_path=str(files['manifest']),
+            event_coalescing=False,
+            watch_root=tmp,
+            watch_sources=[
+                {'pattern': 'docs/todo/manifest.json', 'event_type': 'state_change', 'source': 'todo'},
+                {'pattern': 'api/state-*.json', 'event_type': 'state_change', 'source': 'state_visual'},
+                {'pattern': 'public/manifest.json', 'event_type': 'state_change'},  # дублікат
+            ]
+        )
+        for watch_source in engine.watchers.sources:
+            watch_source.debounce = 0.1
+        handler = CollectingHandler()
+        engine.register_handler(handler)
+        await engine.watch_files()
+        print(f"Registry: {engine.watchers.stats()}")
+        assert engine.watchers.stats()['sources'] == 3 and engine.watchers.stats()['directories'] == 3
+        
+        async def settle():
+            await asyncio.sleep(0.5)
+            await engine.watchers.cleanup()
+            await engine.dispatcher.join()
+        
+        # Сплеск записів одного файлу → одна подія
+        for i in range(10):
+            files['manifest'].write_text(f'{{"v": {i}}}', encoding='utf-8')
+            await asyncio.sleep(0.01)
+        await settle()
+        print(f"10 writes to public/manifest.json → {handler.received}")
+        assert handler.received == [('knowledge_synthesis', 'manifest')]
+        
+        # Лише mtime (touch) та незареєстровані файли → без подій
+        handler.received.clear()
+        os.utime(files['state'])
+        os.utime(files['manifest'])
+        files['other'].write_text('{"x": 1}', encoding='utf-8')
+        await settle()
+        assert handler.received == [], f"Unexpected events: {handler.received}"
+        print(f"✅ Touches dropped by content hash (unchanged: {engine.watchers.unchanged})")
+        
+        # Одночасні зміни різних джерел: окремий debounce для кожного шляху
+        files['todo'].write_text('{"todo": 1}', encoding='utf-8')
+        files['state'].write_text('{"health": "ok"}', encoding='utf-8')
+        await settle()
+        print(f"Two sources changed → {sorted(handler.received)}")
+        assert sorted(handler.received) == [('state_change', 'state_visual'), ('state_change', 'todo')]
+        print("✅ One event per changed source, no duplicates")
+        
+        engine.observer.stop()
+        engine.observer.join()
+        engine.dispatcher.stop()
+    
+    # Міст потік → loop під інтенсивним потоком подій ФС
+    import threading
+    from core.bridge import LoopBridge
+    
+    bridge = LoopBridge()
+    received = []
+    bridge.submit(received.append, 'before-bind')  # до bind() не губиться
+    bridge.bind(asyncio.get_running_loop())
+    
+    def churn(worker):
+        for i in range(50000):
+            bridge.submit(received.append, (worker, i))
+    
+    threads = [threading.Thread(target=churn, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads) or bridge.stats()['depth']:
+        await asyncio.sleep(0.001)
+    stats = bridge.stats()
+    print(f"Bridge: {stats['delivered']} callbacks in {stats['batches']} loop wakeups, "
+          f"max depth {stats['max_depth']}, handoff {stats['handoff_ms']}")
+    assert len(received) == 200001 and received[0] == 'before-bind', "Bridge lost events"
+    for worker in range(4):
+        assert [i for w, i in received[1:] if w == worker] == list(range(50000)), "Order broken"
+    assert stats['batches'] < stats['delivered'] / 10, "Loop woken per event"
+    print("✅ No events lost under churn; loop woken per batch, not per event")
+
+
+async def test_event_journal():
+    """Тестування журналу подій: replay, обрізаний хвіст, ротація, пропускна здатність"""
+    
+    import tempfile
+    import time
+    from core.journal import EventJournal
+    
+    print("\n📒 Testing Event Journal\n")
+    
+    base_path = Path(__file__).parent
+    
+    class ReliableHandler:
+        def __init__(self):
+            self.received = []
+        
+        async def handle_event(self, event):
+            self.received.append(event['data']['n'])
+    
+    class FlakyHandler(ReliableHandler):
+        """Імітація недоступного Telegram"""
+        def __init__(self, failing: bool):
+            super().__init__()
+            self.failing = failing
+        
+        async def handle_event(self, event):
+            if self.failing:
+                raise ConnectionError("Telegram unreachable")
+            await super().handle_event(event)
+    
+    def create_engine(journal_dir):
+        return VoiceEngine(
+            ontology_path=str(base_path / "core" / "ontology.json"),
+            manifest_path=str(base_path / "public" / "manifest.json"),
+            event_coalescing=False, journal_dir=journal_dir
+        )
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Обробник недоступний: події лишаються непідтвердженими
+        engine = create_engine(tmp)
+        reliable, flaky = ReliableHandler(), FlakyHandler(failing=True)
+        engine.register_handler(reliable)
+        engine.register_handler(flaky)
+        for n in range(100):
+            await engine.process_event({'type': 'structural_gap', 'source': 'test', 'n': n})
+        await engine.dispatcher.join()
+        print(f"Before restart: {engine.journal.stats()}")
+        assert engine.journal.stats()['pending'] == 100
+        engine.dispatcher.stop()
+        engine.journal.close()
+        
+        # Перезапуск: повтор лише для обробника без підтвердження
+        engine = create_engine(tmp)
+        reliable, flaky = ReliableHandler(), FlakyHandler(failing=False)
+        engine.register_handler(reliable)
+        engine.register_handler(flaky)
+        replayed = await engine.replay_journal()
+        print(f"Replayed {replayed}: reliable got {len(reliable.received)}, flaky got {len(flaky.received)}")
+        assert replayed == 100 and reliable.received == [] and flaky.received == list(range(100))
+        assert engine.journal.stats()['pending'] == 0
+        engine.journal.close()
+        assert create_engine(tmp).journal.replay_entries() == [], "Acked events replayed again"
+        print("✅ Unacknowledged events replayed at startup, per handler")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Події, утримані у вікні злиття, журналюються до злиття
+        def coalescing_engine():
+            engine = VoiceEngine(
+                ontology_path=str(base_path / "core" / "ontology.json"),
+                manifest_path=str(base_path / "public" / "manifest.json"),
+                journal_dir=tmp
+            )
+            handler = ReliableHandler()
+            engine.register_handler(handler)
+            return engine, handler
+
+        engine, handler = coalescing_engine()
+        for n in range(5):
+            await engine.process_event({'type': 'knowledge_synthesis', 'source': 'storm', 'n': n})
+        await engine.dispatcher.join()
+        assert handler.received == [0] and engine.journal.stats()['pending'] == 4
+        engine.coalescer.stop()  # Збій до закриття вікна
+        engine.dispatcher.stop()
+        engine.journal.close()
+
+        engine, handler = coalescing_engine()
+        assert await engine.replay_journal() == 4 and handler.received == [1, 2, 3, 4]
+        for n in range(5, 10):
+            await engine.process_event({'type': 'knowledge_synthesis', 'source': 'storm', 'n': n})
+        await engine.coalescer.flush()
+        await engine.dispatcher.join()
+        assert handler.received[4:] == [5, 9], f"Expected first + summary: {handler.received}"
+        assert engine.journal.stats()['pending'] == 0, "Merged originals not acknowledged"
+        engine.dispatcher.stop()
+        engine.journal.close()
+        print("✅ Held events survive a crash; a summary acks every merged original")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Обрізаний запис у кінці сегмента (збій під час запису)
+        journal = EventJournal(tmp)
+        for n in range(10):
+            journal.append({'n': n}, ['Handler'])
+        journal.close()
+        segment = sorted(Path(tmp).iterdir())[-1]
+        with open(segment, 'ab') as f:
+            f.write(b'\x00\x00\x01\x00garbage')
+        journal = EventJournal(tmp)
+        entries = journal.replay_entries()
+        assert [event['n'] for _, event, _ in entries] == list(range(10)), "Torn tail broke recovery"
+        print("✅ Torn tail record cut off, earlier records recovered")
+        journal.close()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Ротація сегментів і обмеження диску
+        journal = EventJournal(tmp, segment_bytes=4096, max_bytes=16384)
+        for n in range(2000):
+            seq = journal.append({'n': n, 'payload': 'x' * 20}, ['Handler'])
+            if n % 2 == 0:
+                journal.ack(seq, 'Handler')
+        stats = journal.stats()
+        disk = sum(path.stat().st_size for path in Path(tmp).iterdir())
+        print(f"Rotation: {stats}, {disk} bytes on disk")
+        assert stats['bytes'] <= 16384 + 4096 and disk == stats['bytes'] and stats['dropped'] > 0
+        journal.close()
+        print("✅ Segments rotate and disk usage stays bounded")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Підтвердження в новішому сегменті для подій у старішому переживають ротацію
+        journal = EventJournal(tmp, segment_bytes=300)
+        payload = 'x' * 100
+        pinned = journal.append({'n': 0, 'payload': payload}, ['Handler'])
+        acked = [journal.append({'n': 1, 'payload': payload}, ['Handler'])]  # Ротація: ack у сегменті 2
+        journal.ack(acked[0], 'Handler')
+        for n in (2, 3):
+            acked.append(journal.append({'n': n, 'payload': payload}, ['Handler']))
+            journal.ack(acked[-1], 'Handler')
+        print(f"Rotation with a pinned event: {journal.stats()}")
+        assert journal.stats()['segments'] >= 3
+        journal.close()
+        journal = EventJournal(tmp, segment_bytes=300)
+        replayed = [seq for seq, _, _ in journal.replay_entries()]
+        assert replayed == [pinned], f"Acked events replayed after rotation: {replayed}"
+        journal.ack(pinned, 'Handler')
+        assert journal.stats()['segments'] == 1, "Fully acked segments kept"
+        journal.close()
+        print("✅ Acks for older segments kept across rotation; no acked event replayed")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Пропускна здатність: запис + підтвердження
+        journal = EventJournal(tmp)
+        event = {'type': 'state_change', 'source': 'bench', 'description': 'Manifest updated'}
+        count = 50000
+        started = time.perf_counter()
+        for _ in range(count):
+            journal.ack(journal.append(event, ['TelegramNotifier']), 'TelegramNotifier')
+        await asyncio.sleep(0)
+        elapsed = time.perf_counter() - started
+        journal.close()
+        rate = count / elapsed
+        print(f"Throughput: {rate:,.0f} events/s (append + ack), {journal.stats()}")
+        assert rate >= 20000, f"Journal too slow: {rate:.0f} events/s"
+        print("✅ Journal sustains >= 20k events/s")
+
+
+async def test_circuit_breaker():
+    """Тестування тайм-аутів і circuit breaker для окремих обробників"""
+    
+    import tempfile
+    import time
+    import json
+    
+    print("\n🔌 Testing Handler Isolation\n")
+    
+    base_path = Path(__file__).parent
+    
+    class HealthyHandler:
+        def __init__(self):
+            self.received = []
+        
+        async def handle_event(self, event):
+            self.received.append(event['data']['n'])
+    
+    class HangingHandler(HealthyHandler):
+        """Імітація Telegram, що завис"""
+        def __init__(self):
+            super().__init__()
+            self.hanging = True
+            self.calls = 0
+        
+        async def handle_event(self, event):
+            self.calls += 1
+            if self.hanging:
+                await asyncio.sleep(10)
+            await super().handle_event(event)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        dead_letter = Path(tmp) / "events.dead.jsonl"
+        engine = VoiceEngine(
+            ontology_path=str(base_path / "core" / "ontology.json"),
+            manifest_path=str(base_path / "public" / "manifest.json"),
+            event_coalescing=False, handler_timeout=0.05,
+            breaker_failure_threshold=3, breaker_reset_timeout=0.3,
+            dead_letter_path=str(dead_letter)
+        )
+        healthy, hanging = HealthyHandler(), HangingHandler()
+        engine.register_handler(healthy)
+        engine.register_handler(hanging)
+        
+        started = time.perf_counter()
+        for n in range(50):
+            await engine.process_event({'type': 'structural_gap', 'source': 'test', 'n': n})
+        await engine.dispatcher.join()
+        elapsed = time.perf_counter() - started
+        
+        stats = engine.dispatcher.stats()['handlers']
+        records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+        reasons = {reason: sum(1 for r in records if r['reason'] == reason) for reason in ('timeout', 'circuit_open')}
+        print(f"50 events in {elapsed * 1000:.0f} ms, hanging handler called {hanging.calls} times")
+        print(f"  → Dead-lettered: {reasons}")
+        print(f"  → HangingHandler: {stats['HangingHandler']}")
+        assert sorted(healthy.received) == list(range(50)), "Healthy handler starved"
+        assert elapsed < 2, f"Hanging handler stalled dispatch: {elapsed:.2f}s"
+        assert stats['HangingHandler']['breaker'] == 'open' and stats['HangingHandler']['trips'] == 1
+        assert hanging.calls < 50 and reasons['circuit_open'] > 0
+        assert len(records) == 50 and all(r['handler'] == 'HangingHandler' for r in records)
+        assert stats['HealthyHandler']['latency_ms']['count'] == 50
+        print("✅ Timed-out handler isolated; open breaker fails fast to dead-letter")
+        
+        # Half-open: після паузи один пробний виклик закриває breaker
+        hanging.hanging = False
+        await asyncio.sleep(0.35)
+        await engine.process_event({'type': 'structural_gap', 'source': 'test', 'n': 50}, wait=True)
+        await engine.process_event({'type': 'structural_gap', 'source': 'test', 'n': 51}, wait=True)
+        stats = engine.dispatcher.stats()['handlers']['HangingHandler']
+        assert stats['breaker'] == 'closed' and hanging.received == [50, 51], f"No recovery: {stats}"
+        print("✅ Breaker closes after a successful half-open trial")
+        
+        # Скасований пробний виклик не блокує breaker у half-open назавжди
+        hanging.hanging = True
+        for n in range(52, 55):
+            await engine.process_event({'type': 'structural_gap', 'source': 'test', 'n': n}, wait=True)
+        assert engine.dispatcher.stats()['handlers']['HangingHandler']['breaker'] == 'open'
+        await asyncio.sleep(0.35)
+        trial = asyncio.create_task(engine.dispatcher.deliver(hanging, engine.classify_event(
+            {'type': 'structural_gap', 'source': 'test', 'n': 55})))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        hanging.hanging = False
+        await engine.process_event({'type': 'structural_gap', 'source': 'test', 'n': 56}, wait=True)
+        stats = engine.dispatcher.stats()['handlers']['HangingHandler']
+        assert stats['breaker'] == 'closed' and hanging.received[-1] == 56, f"Breaker wedged: {stats}"
+        print("✅ Cancelled half-open trial releases the breaker")
+        engine.dispatcher.stop()
+
+
+class FakeBotAPI:
+    """Локальний Bot API: ліміти на чат і на бота, 429 з retry_after, збої 5xx"""
+    
+    def __init__(self, per_chat_rate: float, global_rate: float):
+        self.per_chat_rate = per_chat_rate
+        self.buckets = {}
+        self.global_bucket = TokenBucket(global_rate, int(global_rate), time.monotonic())
+        self.delivered = []
+        self.rejected = 0
+        self.flood_once = set()  # Чати, що отримають 429 на перший запит
+        self.server_errors = {}  # text -> кількість відповідей 500
+        self.files = {}  # file_id -> байти завантажених фото
+        self.uploads = 0
+    
+    async def handle(self, request):
+        form = await request.post()
+        chat_id, text = int(form['chat_id']), form.get('text') or form.get('caption')
+        now = time.monotonic()
+        bucket = self.buckets.setdefault(chat_id, TokenBucket(self.per_chat_rate, 5, now))
+        if chat_id in self.flood_once or not bucket.take(now) or not self.global_bucket.take(now):
+            self.flood_once.discard(chat_id)
+            self.rejected += 1
+            return web.json_response({'ok': False, 'error_code': 429,
+                                      'description': 'Too Many Requests: retry after 1',
+                                      'parameters': {'retry_after': 1}}, status=429)
+        if self.server_errors.get(text):
+            self.server_errors[text] -= 1
+            return web.json_response({'ok': False, 'error_code': 500, 'description': 'Internal Server Error'},
+                                     status=500)
+        result = {
+            'message_id': len(self.delivered) + 1, 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'}, 'text': text
+        }
+        photo = form.get('photo')
+        if photo is not None:
+            if isinstance(photo, str) and photo.startswith('attach://'):
+                photo = form[photo[len('attach://'):]]
+            if isinstance(photo, str):
+                if photo not in self.files:
+                    return web.json_response({'ok': False, 'error_code': 400,
+                                              'description': 'Bad Request: wrong file identifier'}, status=400)
+                file_id = photo
+            else:
+                self.uploads += 1
+                file_id = f"photo-{len(self.files) + 1}"
+                self.files[file_id] = photo.file.read()
+            result['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 64, 'height': 64}]
+        self.delivered.append((chat_id, text))
+        return web.json_response({'ok': True, 'result': result})
+
+
+async def _start_fake_bot_api(api: FakeBotAPI):
+    """Запуск локального Bot API; повертає (runner, базова URL)"""
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+async def test_outbound_scheduler():
+    """Тестування черги відправки Telegram проти локального Bot API сервера"""
+    
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from integrations.telegram_bot import OutboundScheduler, TelegramNotifier, DeliveryFailed
+    
+    print("\n📤 Testing Telegram Outbound Scheduler\n")
+    
+    token = "123456:TEST-token"
+    
+    api = FakeBotAPI(per_chat_rate=25, global_rate=100)
+    runner, base = await _start_fake_bot_api(api)
+    bot = Bot(token=token, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    
+    def send(chat_id, text):
+        return lambda: bot.send_message(chat_id=chat_id, text=text)
+    
+    try:
+        # Без черги: сплеск упирається у flood control
+        results = await asyncio.gather(*(bot.send_message(chat_id=100, text=f"naive {i}") for i in range(50)),
+                                       return_exceptions=True)
+        naive_lost = sum(1 for r in results if isinstance(r, Exception))
+        print(f"Direct burst of 50 to one chat: {naive_lost} rejected with 429")
+        await asyncio.sleep(1)
+        
+        # З чергою: 5 чатів × 40 повідомлень, без жодного 429
+        api.rejected = 0
+        api.delivered.clear()
+        scheduler = OutboundScheduler(per_chat_rate=20, global_rate=80)
+        started = time.perf_counter()
+        for n in range(40):
+            for chat_id in range(1, 6):
+                await scheduler.submit(chat_id, send(chat_id, f"{chat_id}:{n}"))
+        await scheduler.join()
+        elapsed = time.perf_counter() - started
+        rate = len(api.delivered) / elapsed
+        print(f"Scheduled 200 messages to 5 chats in {elapsed:.2f}s ({rate:.0f}/s), 429s: {api.rejected}")
+        assert len(api.delivered) == 200 and api.rejected == 0, f"Lost or throttled: {scheduler.stats()}"
+        assert rate >= 60, f"Throughput below the limit: {rate:.0f}/s"
+        for chat_id in range(1, 6):
+            order = [int(text.split(':')[1]) for c, text in api.delivered if c == chat_id]
+            assert order == list(range(40)), f"Chat {chat_id} reordered"
+        print("✅ Paced to the limits: nothing throttled, per-chat order kept")
+        
+        # RetryAfter та пріоритет: критичне повідомлення обганяє фонові
+        api.delivered.clear()
+        api.flood_once.add(9)
+        scheduler.per_chat_rate = 5
+        for n in range(10):
+            await scheduler.submit(9, send(9, f"background {n}"))
+        started = time.perf_counter()
+        delivered = await scheduler.submit(9, send(9, "critical"), priority='critical', wait=True)
+        waited = time.perf_counter() - started
+        await scheduler.join()
+        texts = [text for _, text in api.delivered]
+        print(f"Critical delivered {waited * 1000:.0f} ms after submit at position {texts.index('critical')}")
+        assert delivered and texts.index('critical') == 0, f"Critical not first: {texts}"
+        assert waited >= 1 and scheduler.stats()['retry_after'] == 1, "retry_after not honoured"
+        assert len(texts) == 11
+        print("✅ retry_after honoured; critical jumps the background queue")
+        
+        # Збої 5xx: критичне - до доставки, фонове - не більше MAX_ATTEMPTS
+        scheduler.retry_base = 0.01
+        api.server_errors = {'must arrive': 8, 'best effort': 100}
+        assert await scheduler.submit(7, send(7, 'must arrive'), priority='critical', wait=True)
+        assert not await scheduler.submit(8, send(8, 'best effort'), wait=True)
+        stats = scheduler.stats()
+        print(f"Scheduler stats: { {k: stats[k] for k in ('sent', 'retried', 'retry_after', 'failed', 'dropped')} }")
+        assert stats['failed'] == 1 and stats['retried'] >= 8 + OutboundScheduler.MAX_ATTEMPTS - 1
+        print("✅ Critical retried past MAX_ATTEMPTS; background given up")
+        await scheduler.stop()
+        
+        # Тривалий збій: черга обмежена, скасовані очікування не лишають копій
+        scheduler = OutboundScheduler(per_chat_rate=1000, global_rate=1000)
+        scheduler.max_queue_size = 5
+        outage = asyncio.Event()
+        sent = []
+        
+        def held(text):
+            async def call():
+                await outage.wait()
+                sent.append(text)
+            return call
+        
+        await scheduler.submit(5, held('in flight'), priority='critical')
+        await asyncio.sleep(0.01)
+        for n in range(8):
+            await scheduler.submit(5, held(f'critical {n}'), priority='critical')
+        stats = scheduler.stats()
+        assert stats['queued']['critical'] == 5 and stats['dropped'] == 3, stats
+        try:
+            await asyncio.wait_for(scheduler.submit(5, held('timed out'), priority='critical', wait=True), 0.05)
+            assert False, "Wait not timed out"
+        except asyncio.TimeoutError:
+            pass
+        assert scheduler.stats()['withdrawn'] == 1 and scheduler.queued == 4
+        outage.set()
+        await scheduler.join()
+        print(f"Outage: sent {sent}, {scheduler.stats()['dropped']} dropped")
+        assert sent == ['in flight'] + [f'critical {n}' for n in range(4, 8)]
+        print("✅ Queue capped during an outage; a timed-out wait leaves no queued copy")
+        
+        # Критичне повідомлення не повторюється вічно
+        scheduler.max_age = 0.05
+        scheduler.retry_base = 0.01
+        api.server_errors = {'outage': 1000}
+        assert not await scheduler.submit(7, send(7, 'outage'), priority='critical', wait=True)
+        print(f"✅ Critical given up after max_age: {scheduler.stats()['failed']} failed")
+        await scheduler.stop()
+        
+        # TelegramNotifier: подія з онтології через чергу
+        api.delivered.clear()
+        notifier = TelegramNotifier(token, '42', media_repo_url=base, api_server=base)
+        engine = _create_test_engine()
+        await notifier.handle_event(engine.classify_event({'type': 'module_proposal', 'module_name': 'x'}))
+        await notifier.outbound.join()
+        assert len(api.delivered) == 1 and api.delivered[0][0] == 42, api.delivered
+        print(f"✅ Notifier delivered through the scheduler: {api.delivered[0][1][:40]}...")
+        
+        # Недоставлене дієве повідомлення - помилка обробника (журнал не підтверджує)
+        event = engine.classify_event({'type': 'module_proposal', 'module_name': 'down'})
+        api.server_errors = {notifier._format_message(event['level'], event['emoji'],
+                                                      event['template'], event['data']): 100}
+        notifier.outbound.retry_base = 0.01
+        try:
+            await notifier.handle_event(event)
+            assert False, "Undelivered action notification reported as handled"
+        except DeliveryFailed:
+            pass
+        print("✅ Undelivered action notification raises DeliveryFailed")
+        await notifier.stop()
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+
+
+async def test_digest():
+    """Тестування дайджесту фонових сповіщень Telegram"""
+    
+    from integrations.telegram_bot import TelegramNotifier, DigestBuffer
+    
+    print("\n🗞 Testing Background Digest\n")
+    
+    token = "123456:TEST-token"
+    api = FakeBotAPI(per_chat_rate=1000, global_rate=1000)
+    runner, base = await _start_fake_bot_api(api)
+    engine = _create_test_engine()
+    
+    def create_notifier(window, max_events=None):
+        notifier = TelegramNotifier(token, '42', media_repo_url=base, api_server=base,
+                                    per_chat_rate=500, global_rate=500,
+                                    digest_window=window, digest_max_events=max_events)
+        return notifier
+    
+    try:
+        # Фоновий потік: 2000 подій -> одне повідомлення за вікно
+        notifier = create_notifier(window=0.3, max_events=10000)
+        for n in range(2000):
+            event_type = 'knowledge_synthesis' if n % 4 else 'state_change'
+            await notifier.handle_event(engine.classify_event({'type': event_type, 'state_description': f'#{n}'}))
+        assert api.delivered == [], "Background event sent before the window closed"
+        await asyncio.sleep(0.4)
+        await notifier.outbound.join()
+        text = api.delivered[0][1] if api.delivered else ''
+        print(f"2000 background events -> {len(api.delivered)} API call(s):\n{text}")
+        assert len(api.delivered) == 1 and len(text) <= DigestBuffer.MESSAGE_LIMIT
+        assert '2000 подій' in text and '×1500' in text and '×500' in text and '#1996' in text
+        print("✅ One digest per window with counts per event type")
+        
+        # Злиті повтори (coalesced_count) рахуються всі
+        api.delivered.clear()
+        await notifier.handle_event(engine.classify_event({'type': 'knowledge_synthesis', 'coalesced_count': 7}))
+        await notifier.digest.flush()
+        await notifier.outbound.join()
+        assert '×7' in api.delivered[0][1], api.delivered
+        print("✅ Coalesced repeats counted in the digest")
+        await notifier.stop()
+        
+        # Журнал: подія в дайджесті підтверджується лише після його доставки
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            journaled = VoiceEngine(
+                ontology_path=str(Path(__file__).parent / "core" / "ontology.json"),
+                manifest_path=str(Path(__file__).parent / "public" / "manifest.json"),
+                event_coalescing=False, journal_dir=tmp
+            )
+            notifier = create_notifier(window=60)
+            journaled.register_handler(notifier)
+            await journaled.process_event({'type': 'knowledge_synthesis'}, wait=True)
+            assert journaled.journal.stats()['pending'] == 1, "Digested event acked before sending"
+            await notifier.digest.flush()
+            await asyncio.sleep(0)  # Колбеки квитанцій
+            assert journaled.journal.stats()['pending'] == 0, "Digested event not acked after sending"
+            journaled.dispatcher.stop()
+            journaled.journal.close()
+            await notifier.stop()
+        print("✅ Digested events acked in the journal only once the digest is delivered")
+        
+        # Розмір: ранній flush кожні max_events
+        api.delivered.clear()
+        notifier = create_notifier(window=60, max_events=100)
+        for n in range(250):
+            await notifier.handle_event(engine.classify_event({'type': 'knowledge_synthesis'}))
+        await notifier.outbound.join()
+        print(f"250 events, max_events=100 -> {len(api.delivered)} digests before the window")
+        assert len(api.delivered) == 2 and notifier.digest.stats()['buffered'] == 50
+        
+        # Критична подія: накопичений дайджест відправляється одразу, перед нею
+        started = time.perf_counter()
+        await notifier.handle_event(engine.classify_event({'type': 'structural_gap', 'description': 'x'}))
+        await notifier.outbound.join()
+        elapsed = time.perf_counter() - started
+        texts = [text for _, text in api.delivered[2:]]
+        print(f"Critical event flushed the digest in {elapsed * 1000:.0f} ms: {[t[:24] for t in texts]}")
+        assert len(texts) == 2 and '50 подій' in texts[0] and '[111]' in texts[1] and elapsed < 5
+        assert notifier.digest.stats()['buffered'] == 0
+        print("✅ Size limit and critical events flush the digest early")
+        
+        await notifier.stop()
+        
+        # Ліміт 4096 символів: багато типів подій
+        api.delivered.clear()
+        notifier = create_notifier(window=60, max_events=10000)
+        for n in range(300):
+            await notifier.handle_event(engine.classify_event({'type': f'custom_event_{n:03d}_' + 'x' * 40}))
+        await notifier.digest.flush()
+        await notifier.outbound.join()
+        text = api.delivered[-1][1]
+        print(f"300 event types -> {len(text)} chars, last line: {text.splitlines()[-1]}")
+        assert len(text) <= DigestBuffer.MESSAGE_LIMIT and 'ще' in text.splitlines()[-1]
+        print("✅ Digest stays within Telegram's 4096-character limit")
+        await notifier.stop()
+        
+        # Вимкнено: кожна подія окремо
+        api.delivered.clear()
+        notifier = create_notifier(window=0)
+        for n in range(3):
+            await notifier.handle_event(engine.classify_event({'type': 'knowledge_synthesis'}))
+        await notifier.outbound.join()
+        assert len(api.delivered) == 3
+        print("✅ digest_window=0 sends every event")
+        await notifier.stop()
+    finally:
+        await runner.cleanup()
+
+
+async def test_file_id_cache():
+    """Тестування кешу file_id: одне завантаження на вміст файлу"""
+    
+    import tempfile
+    from integrations.telegram_bot import TelegramNotifier
+    
+    print("\n🖼 Testing Telegram file_id Cache\n")
+    
+    token = "123456:TEST-token"
+    api = FakeBotAPI(per_chat_rate=1000, global_rate=1000)
+    runner, base = await _start_fake_bot_api(api)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = str(Path(tmp) / "file_ids.jsonl")
+            icon = Path(tmp) / "action.png"
+            icon.write_bytes(b'\x89PNG' + b'a' * 4096)
+            
+            notifier = TelegramNotifier(token, '42', api_server=base, file_id_cache_path=cache_path)
+            for n in range(10):
+                await notifier._send_notification(f"proposal {n}", str(icon))
+            print(f"10 photo sends: {api.uploads} upload(s), cache {notifier.file_ids.stats()}")
+            assert api.uploads == 1 and len(api.delivered) == 10
+            await notifier.bot.session.close()
+            print("✅ Photo uploaded once, then sent by file_id")
+            
+            # Перезапуск: кеш з диску, жодного завантаження
+            notifier = TelegramNotifier(token, '42', api_server=base, file_id_cache_path=cache_path)
+            await notifier._send_notification("after restart", str(icon))
+            assert api.uploads == 1, "Re-uploaded after restart"
+            print("✅ file_id cache persists across restarts")
+            
+            # Змінені байти: нове завантаження, старий запис видалено
+            icon.write_bytes(b'\x89PNG' + b'b' * 4096)
+            await notifier._send_notification("new icon", str(icon))
+            await notifier._send_notification("new icon again", str(icon))
+            assert api.uploads == 2 and notifier.file_ids.stats()['entries'] == 1
+            print("✅ Changed bytes invalidate the cached file_id")
+            
+            # Telegram забув file_id: повторне завантаження замість помилки
+            api.files.clear()
+            await notifier._send_notification("file_id expired", str(icon))
+            assert api.uploads == 3 and api.delivered[-1][1] == "file_id expired"
+            assert notifier.file_ids.stats()['invalidations'] == 1
+            print("✅ Rejected file_id falls back to an upload")
+            
+            # Адресовані за вмістом файли кешу медіа: "той самий актив" - за логічною назвою
+            for n, body in enumerate((b'c', b'd')):
+                obj = Path(tmp) / f"{hashlib.md5(body).hexdigest()}.png"
+                obj.write_bytes(b'\x89PNG' + body * 4096)
+                await notifier._send_notification(f"object {n}", str(obj), media_name='icons/action.png')
+            names = [entry['name'] for entry in notifier.file_ids._entries.values()]
+            assert names.count('icons/action.png') == 1, f"Stale file_ids kept: {names}"
+            print("✅ New bytes of a content-addressed asset replace its old file_id")
+            await notifier.bot.session.close()
+    finally:
+        await runner.cleanup()
+
+
+class MediaOrigin:
+    """Локальний репозиторій media з ETag та If-None-Match"""
+    
+    def __init__(self):
+        self.files = {}  # /repo/path -> байти
+        self.requests = 0
+        self.not_modified = 0
+        self.body_bytes = 0
+        self.peers = set()
+        self.delay = 0.0  # Затримка відповіді, с
+        self.active = 0
+        self.max_active = 0
+        self.failing = set()  # Шляхи, що відповідають 503
+    
+    async def handle(self, request):
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info('peername')[1])
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if request.path in self.failing:
+            return web.Response(status=503)
+        body = self.files.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        self.body_bytes += len(body)
+        return web.Response(body=body, headers={'ETag': etag})
+
+
+async def _start_media_origin(origin: MediaOrigin):
+    """Запуск локального репозиторію media; повертає (runner, базова URL)"""
+    app = web.Application()
+    app.router.add_get('/{path:.*}', origin.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+async def test_media_cache():
+    """Тестування кешу медіа: пул з'єднань, адресація за вмістом, LRU, ETag"""
+    
+    import tempfile
+    from integrations.media_cache import MediaCache
+    
+    print("\n🗂 Testing Media Cache\n")
+    
+    origin = MediaOrigin()
+    runner, base = await _start_media_origin(origin)
+    for name in ('action', 'critical', 'intent', 'a', 'b', 'c'):
+        origin.files[f'/main/icons/{name}.png'] = (name.encode() * 50000)[:50000]
+    origin.files['/fork/icons/action.png'] = b'fork' * 10000
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = MediaCache(f"{base}/main", directory=tmp)
+            
+            # Холодний старт: 20 одночасних запитів -> одне завантаження
+            paths = await asyncio.gather(*(cache.get('icons/action.png') for _ in range(20)))
+            assert len(set(paths)) == 1 and origin.requests == 1
+            assert Path(paths[0]).read_bytes() == origin.files['/main/icons/action.png']
+            for name in ('critical', 'intent'):
+                await cache.get(f'icons/{name}.png')
+            print(f"Cold fetch: {origin.requests} requests over {len(origin.peers)} connection(s)")
+            assert origin.requests == 3 and len(origin.peers) == 1, "Connections not pooled"
+            assert [p.suffix for p in Path(tmp).iterdir() if p.suffix == '.part'] == []
+            print("✅ Concurrent misses share one download; one pooled connection")
+            
+            # Однакові імена з різних репозиторіїв не конфліктують
+            fork_path = await cache.get(f"{base}/fork/icons/action.png")
+            assert fork_path != paths[0] and Path(paths[0]).read_bytes() != Path(fork_path).read_bytes()
+            print("✅ Content-addressed: same file name from two repos kept apart")
+            
+            # Ревалідація: 304 без тіла
+            cache.ttl = 0
+            sent = origin.body_bytes
+            path = await cache.get('icons/action.png')
+            assert path == paths[0] and origin.not_modified == 1 and origin.body_bytes == sent
+            print("✅ Expired entry revalidated with If-None-Match (304, no body)")
+            
+            # Змінений вміст: новий об'єкт, старий видалено
+            origin.files['/main/icons/action.png'] = b'new' * 10000
+            path = await cache.get('icons/action.png')
+            assert path != paths[0] and not Path(paths[0]).exists()
+            assert Path(path).read_bytes() == origin.files['/main/icons/action.png']
+            print("✅ Changed content replaces the old object")
+            
+            # Джерело недоступне: стара копія замість помилки
+            del origin.files['/main/icons/intent.png']
+            assert await cache.get('icons/intent.png') is not None and cache.stale_served == 1
+            print("✅ Stale copy served when the origin fails")
+            await cache.close()
+            
+            # Перезапуск: індекс з диску, без запитів
+            cache = MediaCache(f"{base}/main", directory=tmp)
+            requests = origin.requests
+            assert await cache.get('icons/critical.png') is not None and origin.requests == requests
+            assert cache.stats()['entries'] == 4
+            print(f"✅ Index survives restart: {cache.stats()}")
+            await cache.close()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            # LRU: обмеження розміру без сканування директорії
+            cache = MediaCache(f"{base}/main", directory=tmp, max_bytes=3 * 50000)
+            for name in ('action', 'critical', 'a', 'action', 'b', 'c'):
+                await cache.get(f'icons/{name}.png')
+            stored = [p for p in (Path(tmp) / 'objects').rglob('*') if p.is_file()]
+            on_disk = sum(p.stat().st_size for p in stored)
+            print(f"LRU: {len(stored)} objects, {on_disk} bytes on disk, {cache.stats()}")
+            assert on_disk == cache.bytes <= cache.max_bytes and cache.evictions == 2
+            assert cache._fresh(f"{base}/main/icons/critical.png") is None, "Least recently used not evicted"
+            assert cache._fresh(f"{base}/main/icons/action.png") is not None, "Recently used entry evicted"
+            print("✅ Size-bounded LRU eviction")
+            await cache.close()
+    finally:
+        await runner.cleanup()
+
+
+async def test_media_warmup():
+    """Тестування прогріву медіа при старті TelegramNotifier"""
+    
+    import tempfile
+    from core.ontology import validate_ontology
+    from integrations.telegram_bot import TelegramNotifier
+    
+    print("\n🔥 Testing Media Warm-up\n")
+    
+    engine = _create_test_engine()
+    media_map = dict(engine.compiled_ontology.media_map)
+    print(f"Media map from ontology.json: {media_map}")
+    assert media_map == TelegramNotifier.DEFAULT_MEDIA_MAP
+    try:
+        validate_ontology({'event_levels': {'1': {}}, 'event_types': {'x': {'media': 5}}})
+        raise AssertionError("Non-string media accepted")
+    except ValueError:
+        pass
+    print("✅ Media map declared in ontology.json and validated")
+    
+    origin = MediaOrigin()
+    origin.delay = 0.5
+    for media_file in media_map.values():
+        origin.files[f'/main/{media_file}'] = media_file.encode() * 1000
+    origin.failing.add('/main/icons/broken.png')
+    origin_runner, origin_base = await _start_media_origin(origin)
+    api = FakeBotAPI(per_chat_rate=1000, global_rate=1000)
+    api_runner, api_base = await _start_fake_bot_api(api)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            notifier = TelegramNotifier("123456:TEST-token", '42', media_repo_url=f"{origin_base}/main",
+                                        api_server=api_base, media_cache_dir=tmp, media_map=media_map)
+            assert not notifier.media_ready.is_set()
+            started = time.perf_counter()
+            stats = await notifier.warm_up_media(concurrency=2)
+            elapsed = time.perf_counter() - started
+            print(f"Warm-up: {stats}, peak concurrency {origin.max_active}")
+            assert notifier.media_ready.is_set() and stats['cached'] == 3 and stats['failed'] == []
+            assert origin.max_active == 2 and elapsed < 3 * origin.delay, "Warm-up not concurrent or not bounded"
+            print("✅ 3 assets prefetched concurrently (at most 2 at a time); media_ready set")
+            
+            # Перше критичне сповіщення: без завантаження
+            requests = origin.requests
+            started = time.perf_counter()
+            await notifier.handle_event(engine.classify_event({'type': 'structural_gap'}))
+            await notifier.outbound.join()
+            elapsed = time.perf_counter() - started
+            print(f"First critical notification sent in {elapsed * 1000:.0f} ms")
+            assert origin.requests == requests and api.uploads == 1 and elapsed < 0.2
+            print("✅ First critical notification without a download stall")
+            
+            # Після прогріву недоступне медіа - одна спроба, без пауз backoff
+            notifier.media_map['broken_event'] = 'icons/broken.png'
+            started = time.perf_counter()
+            assert await notifier._get_media_for_event('broken_event') is None
+            elapsed = time.perf_counter() - started
+            print(f"Unavailable asset after warm-up: gave up in {elapsed * 1000:.0f} ms")
+            assert elapsed < 0.9, "Retry backoff on the notification path"
+            print("✅ No retry backoff on the notification path after warm-up")
+            await notifier.stop()
+            
+            # Помилки прогріву не блокують сигнал готовності
+            origin.delay = 0
+            notifier = TelegramNotifier("123456:TEST-token", '42', media_repo_url=f"{origin_base}/main",
+                                        api_server=api_base, media_cache_dir=tmp,
+                                        media_map={'structural_gap': 'icons/critical.png', 'x': 'icons/missing.png'})
+            stats = await notifier.warm_up_media()
+            assert notifier.media_ready.is_set() and stats['failed'] == ['icons/missing.png']
+            print(f"✅ Readiness signalled despite failures: {stats}")
+            
+            # Гаряче перезавантаження онтології: новий актив прогрівається
+            origin.files['/main/icons/new.png'] = b'new' * 100
+            ontology_copy = Path(tmp) / 'ontology.json'
+            ontology = json.loads(engine.ontology_path.read_text(encoding='utf-8'))
+            ontology_copy.write_text(json.dumps(ontology), encoding='utf-8')
+            reloading = VoiceEngine(ontology_path=str(ontology_copy), manifest_path=str(engine.manifest_path))
+            reloading.fs_bridge.bind(asyncio.get_running_loop())
+            reloading.add_ontology_listener(lambda compiled: notifier.update_media_map(compiled.media_map))
+            ontology['event_types']['new_event'] = {'level': '1', 'media': 'icons/new.png'}
+            ontology_copy.write_text(json.dumps(ontology), encoding='utf-8')
+            requests = origin.requests
+            assert reloading.reload_ontology()
+            for _ in range(50):
+                if notifier.warmup_task is not None and notifier.warmup_task.done():
+                    break
+                await asyncio.sleep(0.01)
+            assert notifier.media_map['new_event'] == 'icons/new.png'
+            assert notifier.warmup_stats['failed'] == [] and origin.requests > requests
+            assert await notifier.media.get('icons/new.png') is not None
+            print(f"✅ Media map refreshed and re-warmed on ontology reload: {notifier.warmup_stats}")
+            await notifier.stop()
+    finally:
+        await api_runner.cleanup()
+        await origin_runner.cleanup()
+
 
 if __name__ == "__main__":
     import argparse
@@ -138,7 +1624,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='CIT Voice Test Suite')
     parser.add_argument(
         '--mode',
-        choices=['events', 'classification', 'all'],
+        choices=['events', 'classification', 'dispatch', 'reload', 'coalesce', 'diff', 'poll', 'watch', 'journal', 'breaker', 'outbound', 'digest', 'fileid', 'media', 'warmup', 'all'],
         default='all',
         help='Test mode to run'
     )
@@ -151,6 +1637,45 @@ if __name__ == "__main__":
         
         if args.mode == 'classification' or args.mode == 'all':
             asyncio.run(test_classification())
+        
+        if args.mode == 'dispatch' or args.mode == 'all':
+            asyncio.run(test_dispatch())
+        
+        if args.mode == 'reload' or args.mode == 'all':
+            asyncio.run(test_ontology_reload())
+        
+        if args.mode == 'coalesce' or args.mode == 'all':
+            asyncio.run(test_coalescing())
+        
+        if args.mode == 'diff' or args.mode == 'all':
+            asyncio.run(test_state_diff())
+        
+        if args.mode == 'poll' or args.mode == 'all':
+            asyncio.run(test_conditional_polling())
+        
+        if args.mode == 'watch' or args.mode == 'all':
+            asyncio.run(test_file_watchers())
+        
+        if args.mode == 'journal' or args.mode == 'all':
+            asyncio.run(test_event_journal())
+        
+        if args.mode == 'breaker' or args.mode == 'all':
+            asyncio.run(test_circuit_breaker())
+        
+        if args.mode == 'outbound' or args.mode == 'all':
+            asyncio.run(test_outbound_scheduler())
+        
+        if args.mode == 'digest' or args.mode == 'all':
+            asyncio.run(test_digest())
+        
+        if args.mode == 'fileid' or args.mode == 'all':
+            asyncio.run(test_file_id_cache())
+        
+        if args.mode == 'media' or args.mode == 'all':
+            asyncio.run(test_media_cache())
+        
+        if args.mode == 'warmup' or args.mode == 'all':
+            asyncio.run(test_media_warmup())
             
     except KeyboardInterrupt:
         print("\n\n⛔ Tests interrupted by user")
@@ -12,7 +12,11 @@ from datetime import datetime, timedelta
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from core.podija import PodijaIntentExtractor
+from core.podija import PodijaIntentExtractor, AsyncPodijaStore, extract_intents
+from core.podija_storage import (
+    JsonCalendarStorage, JsonlCalendarStorage, SqliteCalendarStorage, calendar_cache
+)
+from core.metrics import LoopLagMonitor
 from core.voice_engine import VoiceEngine
 
 
@@ -195,12 +199,59 @@ def test_time_extraction():
     return all_passed
 
 
+def test_tokenizer_edge_cases():
+    """
+    Test single-pass tokenizer against known outputs of the original
+    multi-regex parser (fixed reference date)
+    """
+    print("\n" + "="*70)
+    print("TEST 5: Tokenizer - compatibility edge cases")
+    print("="*70)
+    
+    extractor = PodijaIntentExtractor()
+    reference = datetime(2026, 2, 4, 18, 0)
+    
+    test_cases = [
+        ("ЗАВТРА О 8 Стендап", ("Стендап", "2026-02-05", "08:00")),
+        ("наст тижня ретро", ("наст тижня ретро", "2026-02-09", "09:00")),
+        ("1/5 о 10 год звіт", ("звіт", "2026-05-01", "10:00")),
+        ("Зустріч о 25 з клієнтом", ("Зустріч з клієнтом", "2026-02-04", "09:00")),
+        ("після завтра в 7:45 тренування", ("тренування", "2026-02-06", "07:45")),
+        ("о 10:75 або 11:15 дзвінок", ("абдзвінок", "2026-02-04", "09:00")),
+        ("Сьогодн о 9 планування", ("Сьогодн планування", "2026-02-04", "09:00")),
+        ("04.02 о 10 нарада", ("нарада", "2027-02-04", "10:00")),
+    ]
+    
+    all_passed = True
+    
+    for user_input, expected in test_cases:
+        result = extractor._parse_natural_language(user_input, reference)
+        actual = (result["title"], result["date"], result["time"])
+        
+        print(f"\nInput: '{user_input}'")
+        print(f"Expected: {expected}")
+        print(f"Output:   {actual}")
+        
+        if actual == expected:
+            print("✅ Parsed as before")
+        else:
+            print("❌ Tokenizer output differs")
+            all_passed = False
+    
+    if all_passed:
+        print("\n✅ Test PASSED: Tokenizer matches original parser")
+    else:
+        print("\n❌ Test FAILED: Tokenizer regressions")
+    
+    return all_passed
+
+
 def test_storage_sync():
     """
     Test that events are saved to calendar.json with unique IDs
     """
     print("\n" + "="*70)
-    print("TEST 5: Storage Sync - calendar.json")
+    print("TEST 6: Storage Sync - calendar.json")
     print("="*70)
     
     # Use temporary calendar for testing
@@ -242,12 +293,632 @@ def test_storage_sync():
         return True
 
 
+def test_batch_extraction():
+    """
+    Test batch intent extraction over a process pool and bulk save
+    """
+    print("\n" + "="*70)
+    print("TEST 7: Batch Extraction - extract_intents + save_events")
+    print("="*70)
+    
+    import tempfile
+    import os
+    
+    reference = datetime(2026, 2, 4, 18, 0)
+    inputs = [
+        "Завтра о 10 нарада",
+        "Сьогодні в 14:30 зустріч з командою",
+        "15.02 о 16 презентація проекту",
+        "Через тиждень дзвінок",
+    ] * 50
+    
+    sequential = list(extract_intents(inputs, reference_date=reference))
+    parallel = list(extract_intents(iter(inputs), workers=2, chunksize=7,
+                                    reference_date=reference))
+    
+    assert len(parallel) == len(inputs), f"Expected {len(inputs)} results, got {len(parallel)}"
+    assert parallel == sequential, "Process pool results differ or are out of order"
+    assert parallel[0]["date"] == "2026-02-05", "Shared reference date not applied"
+    print(f"✅ {len(parallel)} inputs parsed in order across 2 workers")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calendar_path = os.path.join(tmpdir, "calendar.json")
+        extractor = PodijaIntentExtractor(calendar_path)
+        
+        writes = []
+        append_many = extractor.storage.append_many
+        extractor.storage.append_many = lambda events: (writes.append(len(events)),
+                                                         append_many(events))
+        
+        saved = extractor.save_events(parallel)
+        
+        assert writes == [len(inputs)], f"Expected one write, got {writes}"
+        assert len({e["id"] for e in saved}) == len(saved), "Batch IDs not unique"
+        assert len(extractor.get_events()) == len(inputs), "Batch not persisted"
+        print(f"✅ {len(saved)} events committed in a single write with unique IDs")
+    
+    print("\n✅ Test PASSED: Batch extraction working correctly")
+    return True
+
+
+def test_jsonl_storage():
+    """
+    Test append-only JSON Lines backend with snapshot compaction
+    """
+    print("\n" + "="*70)
+    print("TEST 8: JSONL Storage - append log + compaction")
+    print("="*70)
+    
+    import tempfile
+    import os
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calendar_path = os.path.join(tmpdir, "calendar.json")
+        storage = JsonlCalendarStorage(calendar_path, compact_min_events=3)
+        extractor = PodijaIntentExtractor(calendar_path, storage=storage)
+        
+        saved = [extractor.save_event(extractor.extract_intent("Завтра о 10 нарада"))
+                 for _ in range(2)]
+        
+        # Events live in the log, snapshot untouched
+        assert storage.log_path.exists(), "Append log not created"
+        with open(calendar_path, encoding='utf-8') as f:
+            assert json.load(f)["events"] == [], "Snapshot rewritten on append"
+        print("✅ Saves appended to log without rewriting snapshot")
+        
+        # Third save reaches the threshold and compacts
+        saved.append(extractor.save_event(extractor.extract_intent("Сьогодні о 15 дзвінок")))
+        assert not storage.log_path.exists(), "Log not folded into snapshot"
+        with open(calendar_path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        assert [e["id"] for e in snapshot["events"]] == [e["id"] for e in saved]
+        print("✅ Log compacted into calendar.json snapshot")
+        
+        # Reads merge snapshot and log; reopening keeps counters
+        extractor.save_event(extractor.extract_intent("Післязавтра о 14 презентація"))
+        reopened = JsonlCalendarStorage(calendar_path, compact_min_events=3)
+        assert len(reopened.events()) == 4, "Reopened storage lost events"
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        assert len(extractor.get_events(tomorrow)) == 2, "Date filter mismatch"
+        
+        export = reopened.export()
+        assert set(export) == {"events", "metadata"}, "Export not in calendar.json format"
+        print("✅ Export keeps calendar.json format")
+
+        # Crash after the snapshot write but before the log unlink
+        with open(storage.log_path, encoding='utf-8') as f:
+            leftover = f.read()
+        storage.compact()
+        with open(storage.log_path, 'w', encoding='utf-8') as f:
+            f.write(leftover)
+        ids = [e["id"] for e in JsonlCalendarStorage(calendar_path).events()]
+        assert len(ids) == 4 and len(set(ids)) == 4, "Folded log records duplicated"
+        storage.log_path.unlink()
+        print("✅ Records already folded into the snapshot are skipped")
+
+        # An empty log falls back to the snapshot's last ID (stale allocator)
+        stale = {"id": 1, "date": tomorrow, "intent": "stale"}
+        storage.append(stale)
+        assert stale["id"] > max(ids), "ID collides with the snapshot"
+        print("✅ IDs allocated after compaction stay above the snapshot")
+
+        # Log length is read from the file, so writes of another instance count
+        other = JsonlCalendarStorage(calendar_path, compact_min_events=3)
+        other.append({"id": 2, "date": tomorrow, "intent": "other"})
+        storage.append({"id": 3, "date": tomorrow, "intent": "third"})
+        assert storage.log_path.exists(), "Compacted below the snapshot size"
+        assert storage._log_records() == 3, "Foreign appends not counted"
+        print("✅ Compaction threshold follows the shared log")
+
+        print("\n✅ Test PASSED: JSONL storage working correctly")
+        return True
+
+
+def test_sqlite_storage():
+    """
+    Test SQLite backend: migration, date index, ranges and pagination
+    """
+    print("\n" + "="*70)
+    print("TEST 9: SQLite Storage - indexed queries")
+    print("="*70)
+    
+    import tempfile
+    import os
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calendar_path = os.path.join(tmpdir, "calendar.json")
+        json_extractor = PodijaIntentExtractor(calendar_path)
+        legacy = json_extractor.save_event(json_extractor.extract_intent("Завтра о 10 нарада"))
+        
+        db_path = os.path.join(tmpdir, "calendar.db")
+        storage = SqliteCalendarStorage(db_path, migrate_from=calendar_path)
+        extractor = PodijaIntentExtractor(calendar_path, storage=storage)
+        
+        events = extractor.get_events()
+        assert [e["id"] for e in events] == [legacy["id"]], "calendar.json not migrated"
+        print("✅ calendar.json migrated into SQLite")
+        
+        # Migration is one-shot
+        assert storage.migrate_from_json(calendar_path) == 0, "Migration repeated"
+        print("✅ Repeated migration is a no-op")
+        
+        for day in range(1, 6):
+            for hour in (9, 14):
+                extractor.save_event({
+                    "title": "зустріч", "date": f"2026-03-0{day}",
+                    "time": f"{hour:02d}:00", "desc": ""
+                })
+        
+        assert len(extractor.get_events("2026-03-02")) == 2, "Per-day lookup mismatch"
+        ranged = extractor.get_events(date_from="2026-03-02", date_to="2026-03-04")
+        assert len(ranged) == 6, f"Expected 6 events in range, got {len(ranged)}"
+        assert {e["date"] for e in ranged} == {"2026-03-02", "2026-03-03", "2026-03-04"}
+        print("✅ Date and range queries use stored dates")
+        
+        page1 = extractor.get_events(date_from="2026-03-01", limit=4)
+        page2 = extractor.get_events(date_from="2026-03-01", limit=4, offset=4)
+        assert len(page1) == 4 and len(page2) == 4, "Pagination size mismatch"
+        assert not {e["id"] for e in page1} & {e["id"] for e in page2}, "Pages overlap"
+        print("✅ Pagination returns disjoint pages")
+        
+        plan = storage._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT data FROM events WHERE date = ? ORDER BY id",
+            ("2026-03-02",)
+        ).fetchall()
+        assert "idx_events_date" in str(plan), f"Date index not used: {plan}"
+        print("✅ Per-day lookups use the date index")
+        
+        storage.close()
+        print("\n✅ Test PASSED: SQLite storage working correctly")
+        return True
+
+
+def test_calendar_cache():
+    """
+    Test in-memory calendar cache and its invalidation
+    """
+    print("\n" + "="*70)
+    print("TEST 10: Calendar Cache - mtime/size/inode invalidation")
+    print("="*70)
+    
+    import tempfile
+    import os
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calendar_path = os.path.join(tmpdir, "calendar.json")
+        extractor = PodijaIntentExtractor(calendar_path)
+        saved = extractor.save_event(extractor.extract_intent("Завтра о 10 нарада"))
+        
+        # Repeated reads are served from memory
+        before = calendar_cache.stats()
+        for _ in range(5):
+            assert len(extractor.get_events(saved["date"])) == 1
+        after = calendar_cache.stats()
+        assert after["hits"] - before["hits"] == 5, f"Expected 5 hits, got {after}"
+        assert after["misses"] == before["misses"], "Unchanged file re-parsed"
+        print(f"✅ Repeated reads hit the cache: {after}")
+        
+        # Own writes refresh the cache and the date index
+        extractor.save_event(extractor.extract_intent("Завтра о 12 обід"))
+        assert len(extractor.get_events(saved["date"])) == 2, "Date index not updated"
+        assert calendar_cache.stats()["misses"] == after["misses"], "Own write caused re-parse"
+        print("✅ Own writes update cache without re-reading")
+        
+        # External modification is detected
+        with open(calendar_path, encoding='utf-8') as f:
+            data = json.load(f)
+        data["events"] = data["events"][:1]
+        with open(calendar_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        assert len(extractor.get_events()) == 1, "External change not picked up"
+        assert calendar_cache.stats()["invalidations"] > after["invalidations"]
+        print("✅ External change invalidates the cache")
+        
+        print("\n✅ Test PASSED: Calendar cache working correctly")
+        return True
+
+
+def test_concurrent_writes():
+    """
+    Test concurrent saves: unique IDs, no lost events, valid file
+    """
+    print("\n" + "="*70)
+    print("TEST 11: Concurrent Writes - locking and group commit")
+    print("="*70)
+    
+    import tempfile
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    
+    threads, per_thread = 8, 25
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, make_storage in (
+            ("json", None),
+            ("jsonl", lambda path: JsonlCalendarStorage(path, compact_min_events=50)),
+            ("sqlite", lambda path: SqliteCalendarStorage(path + ".db")),
+        ):
+            calendar_path = os.path.join(tmpdir, f"{name}.json")
+            storage = make_storage(calendar_path) if make_storage else None
+            # Two extractors on one file, as two independent writers would be
+            writers = [PodijaIntentExtractor(calendar_path, storage=storage) for _ in range(2)]
+            
+            def save(n):
+                extractor = writers[n % 2]
+                return [
+                    extractor.save_event({"title": f"подія {n}-{i}", "date": "2026-03-01",
+                                          "time": "09:00", "desc": ""})["id"]
+                    for i in range(per_thread)
+                ]
+            
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                returned = [i for ids in pool.map(save, range(threads)) for i in ids]
+            
+            stored = writers[0].get_events()
+            stored_ids = [e["id"] for e in stored]
+            assert len(stored) == threads * per_thread, f"{name}: lost events ({len(stored)})"
+            assert len(set(stored_ids)) == len(stored_ids), f"{name}: duplicate IDs"
+            assert sorted(returned) == sorted(stored_ids), f"{name}: returned IDs differ"
+            print(f"✅ {name}: {len(stored)} events, unique IDs, "
+                  f"{writers[0].storage.commits + (writers[1].storage.commits if storage is None else 0)} commits")
+            
+            if storage is None:
+                with open(calendar_path, encoding='utf-8') as f:
+                    assert len(json.load(f)["events"]) == threads * per_thread
+                leftovers = [p for p in os.listdir(tmpdir) if p.endswith(".tmp")]
+                assert not leftovers, f"Temp files left behind: {leftovers}"
+                print("✅ json: file parses, no temp files left")
+            else:
+                storage.close()
+        
+        print("\n✅ Test PASSED: Concurrent writes are safe")
+        return True
+
+
+def test_recurring_events():
+    """
+    Test recurring events: parsing, single-row storage and expansion
+    """
+    print("\n" + "="*70)
+    print("TEST 12: Recurring Events - RRULE parsing and window expansion")
+    print("="*70)
+    
+    import tempfile
+    import os
+    from datetime import date
+    from core.podija import parse_intent
+    from core.recurrence import RRule, RecurrenceIndex, expand
+    
+    reference = datetime(2026, 2, 4)  # Wednesday
+    test_cases = [
+        ("щопонеділка о 9 стендап", ("стендап", "2026-02-09", "09:00", "FREQ=WEEKLY;BYDAY=MO")),
+        ("по вівторках і четвергах о 18 йога",
+         ("йога", "2026-02-05", "18:00", "FREQ=WEEKLY;BYDAY=TU,TH")),
+        ("щодня о 8 зарядка до 28.02", ("зарядка", "2026-02-04", "08:00", "FREQ=DAILY;UNTIL=20260228")),
+        ("кожні 2 тижні ретро", ("ретро", "2026-02-04", "09:00", "FREQ=WEEKLY;INTERVAL=2")),
+        ("щомісяця 10.02 звіт 3 рази", ("звіт", "2026-02-10", "09:00", "FREQ=MONTHLY;COUNT=3")),
+    ]
+    
+    for text, (title, date_str, time_str, rrule) in test_cases:
+        result = parse_intent(text, reference)
+        actual = (result["title"], result["date"], result["time"], result.get("rrule"))
+        assert actual == (title, date_str, time_str, rrule), f"'{text}': {actual}"
+        print(f"✅ '{text}' -> {rrule} from {date_str}")
+    
+    assert "rrule" not in parse_intent("Завтра о 10 нарада", reference), "One-off got an rrule"
+    print("✅ One-off events carry no rrule")
+    
+    for text in ("по середньому 2 години звіт", "кожного середнього тижня огляд"):
+        assert "rrule" not in parse_intent(text, reference), f"'{text}' became a weekly rule"
+    for text, rrule in (("кожної середи планування", "FREQ=WEEKLY;BYDAY=WE"),
+                        ("по середах і п'ятницях спорт", "FREQ=WEEKLY;BYDAY=WE,FR"),
+                        ("кожного четверга звіт", "FREQ=WEEKLY;BYDAY=TH")):
+        assert parse_intent(text, reference).get("rrule") == rrule, f"'{text}' not parsed"
+    print("✅ Weekday rules need weekday word forms (\"по середньому\" is not Wednesday)")
+    
+    assert "rrule" not in parse_intent("щодня зарядка 0 разів", reference), "COUNT=0 became endless"
+    try:
+        RRule.parse("FREQ=DAILY;COUNT=0")
+        assert False, "COUNT=0 accepted"
+    except ValueError:
+        pass
+    print("✅ Zero repetitions are rejected, not turned into an endless series")
+    
+    # Expansion jumps straight to the window: a 10-year-old daily series
+    rule = RRule.parse("FREQ=DAILY;INTERVAL=3")
+    window = list(expand(rule, date(2016, 1, 1), date(2026, 3, 1), date(2026, 3, 10)))
+    assert window == [date(2026, 3, 3), date(2026, 3, 6), date(2026, 3, 9)], window
+    rule = RRule.parse("FREQ=MONTHLY")
+    assert list(expand(rule, date(2026, 1, 31), date(2026, 2, 1), date(2026, 5, 31))) == [
+        date(2026, 3, 31), date(2026, 5, 31)
+    ], "Months without the 31st must be skipped"
+    index = RecurrenceIndex([
+        {"id": 1, "date": "2026-01-05", "time": "09:00", "rrule": "FREQ=WEEKLY;COUNT=2"},
+        {"id": 2, "date": "2027-01-01", "time": "09:00", "rrule": "FREQ=DAILY"},
+    ])
+    assert index.occurrences(date(2026, 2, 1), date(2026, 12, 31)) == [], "Ended/future series expanded"
+    print("✅ Expansion skips to the window; ended and future series are pruned")
+    
+    for name, make_storage in (
+        ("json", None),
+        ("jsonl", lambda path: JsonlCalendarStorage(path)),
+        ("sqlite", lambda path: SqliteCalendarStorage(path + ".db")),
+    ):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            calendar_path = os.path.join(tmpdir, "calendar.json")
+            storage = make_storage(calendar_path) if make_storage else None
+            extractor = PodijaIntentExtractor(calendar_path, storage=storage)
+            series = extractor.save_event(parse_intent("щопонеділка о 9 стендап", reference))
+            extractor.save_event({"title": "нарада", "date": "2026-02-16", "time": "11:00", "desc": ""})
+            
+            assert len(extractor.storage.events()) == 2, "Series must be stored once"
+            day = extractor.get_events("2026-03-02")
+            assert [(e["title"], e["series_id"]) for e in day] == [("стендап", series["id"])], day
+            month = extractor.get_events(date_from="2026-02-01", date_to="2026-02-28")
+            assert [(e["date"], e["title"]) for e in month] == [
+                ("2026-02-09", "стендап"), ("2026-02-16", "стендап"),
+                ("2026-02-16", "нарада"), ("2026-02-23", "стендап"),
+            ], month
+            assert len(extractor.get_events(date_from="2026-02-01", date_to="2026-02-28", limit=2)) == 2
+            year_later = extractor.get_events("2027-02-08")
+            assert len(year_later) == 1, "Occurrence a year ahead not found"
+            print(f"✅ {name}: one stored row, occurrences expanded per window")
+            extractor.storage.close()
+    
+    print("\n✅ Test PASSED: Recurring events working correctly")
+    return True
+
+
+def test_dedupe():
+    """
+    Test duplicate suppression on normalised (title, date, time)
+    """
+    print("\n" + "="*70)
+    print("TEST 13: Dedupe - duplicate suppression index")
+    print("="*70)
+    
+    import tempfile
+    import os
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calendar_path = os.path.join(tmpdir, "calendar.json")
+        plain = PodijaIntentExtractor(calendar_path)
+        legacy = plain.save_event({"title": "нарада", "date": "2026-02-05", "time": "10:00", "desc": ""})
+        plain.save_event({"title": "нарада", "date": "2026-02-05", "time": "10:00", "desc": ""})
+        assert len(plain.get_events()) == 2, "Dedupe must be off by default"
+        print("✅ Dedupe is opt-in")
+        
+        extractor = PodijaIntentExtractor(calendar_path, dedupe=True)
+        event, created = extractor.get_or_create_event(
+            {"title": "  Нарада ", "date": "2026-02-05", "time": "10:00", "desc": ""}
+        )
+        assert not created and event["id"] != legacy["id"] and event["title"] == "нарада"
+        assert len(extractor.get_events()) == 2, "Duplicate was written"
+        print("✅ Normalised duplicate returns the stored event")
+        
+        misses = calendar_cache.stats()["misses"]
+        for _ in range(100):
+            duplicate = {"title": "НАРАДА", "date": "2026-02-05", "time": "10:00", "desc": ""}
+            assert extractor.save_event(duplicate)["id"] == event["id"]
+        assert calendar_cache.stats()["misses"] == misses, "Duplicate lookup re-read storage"
+        print("✅ Repeated duplicates answered from the index")
+        
+        other = extractor.save_event({"title": "нарада", "date": "2026-02-05", "time": "11:00", "desc": ""})
+        saved = extractor.save_events([
+            {"title": "нарада", "date": "2026-02-05", "time": "11:00", "desc": ""},
+            {"title": "обід", "date": "2026-02-05", "time": "13:00", "desc": ""},
+            {"title": "обід", "date": "2026-02-05", "time": "13:00", "desc": ""},
+        ])
+        assert saved[0]["id"] == other["id"] and saved[1]["id"] == saved[2]["id"]
+        assert len(extractor.get_events()) == 4, "Bulk import wrote duplicates"
+        print("✅ Bulk import skips duplicates within and across batches")
+        
+        windowed = PodijaIntentExtractor(calendar_path, dedupe=True, dedupe_window=60)
+        data = dict(other)
+        data["created_at"] = (datetime.now() - timedelta(minutes=5)).isoformat()
+        windowed._dedupe_index = {windowed.dedupe_key(data): data}
+        assert windowed.find_duplicate(other) is None, "Old event matched outside window"
+        _, created = windowed.get_or_create_event(other)
+        assert created and windowed.find_duplicate(other) is not None
+        print("✅ dedupe_window limits matches to recent events")
+    
+    print("\n✅ Test PASSED: Dedupe working correctly")
+    return True
+
+
+async def test_async_store():
+    """
+    Test that slow storage never blocks the event loop
+    """
+    print("\n" + "="*70)
+    print("TEST 14: Async Store - off-loop writes and loop lag")
+    print("="*70)
+    
+    import tempfile
+    import os
+    import time
+    
+    from core.podija_storage import CalendarStorage
+    
+    class SlowStorage(CalendarStorage):
+        """Storage on a disk that takes 20 ms per write and 5 ms per read"""
+        def __init__(self, calendar_path):
+            super().__init__()
+            self._events = []
+        
+        def _write_batch(self, events):
+            time.sleep(0.02)
+            self._events.extend(events)
+        
+        def events(self):
+            time.sleep(0.005)
+            return list(self._events)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SlowStorage(os.path.join(tmpdir, "calendar.json"))
+        extractor = PodijaIntentExtractor(storage=storage)
+        store = AsyncPodijaStore(extractor)
+        monitor = LoopLagMonitor(interval=0.001)
+        monitor.start()
+        
+        # Waves of 50 concurrent saves keep the slow store busy long enough
+        # for a few hundred lag samples
+        saved = []
+        for wave in range(20):
+            phrases = [f"Завтра о {9 + i % 8} нарада {wave}-{i}" for i in range(50)]
+            saved += await asyncio.gather(*(
+                store.save_event(extractor.extract_intent(phrase)) for phrase in phrases
+            ))
+        
+        # Fire-and-forget saves are written on flush
+        queued = await store.save_event(extractor.extract_intent("Сьогодні дзвінок"), wait=False)
+        await store.flush()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        
+        stored = await store.get_events()
+        assert len(stored) == 1001, f"Expected 1001 stored events, got {len(stored)}"
+        assert stored[-1]["id"] == queued["id"], "Queued event not written on flush"
+        assert {e["id"] for e in saved} <= {e["id"] for e in stored}, "Saved events missing"
+        print(f"✅ 1001 events stored: {store.stats()}")
+        
+        assert store.commits < 50, f"Write-behind did not batch: {store.commits} commits"
+        print(f"✅ Write-behind batched 1001 saves into {store.commits} commits")
+        
+        lag = monitor.stats()
+        assert lag["p99_ms"] < 5, f"Event loop lag too high: {lag}"
+        print(f"✅ Event loop stayed responsive: {lag}")
+        
+        await store.close()
+
+    class FailingStorage(SlowStorage):
+        """Storage whose first write fails"""
+        failures = 1
+
+        def _write_batch(self, events):
+            if self.failures:
+                self.failures -= 1
+                raise OSError("disk full")
+            super()._write_batch(events)
+
+    # A failed write-behind save releases its duplicate-index claim
+    extractor = PodijaIntentExtractor(storage=FailingStorage(None), dedupe=True)
+    store = AsyncPodijaStore(extractor)
+    intent = extractor.extract_intent("Завтра о 10 нарада")
+    await store.save_event(dict(intent), wait=False)
+    await store.flush()
+    retried, created = await store.get_or_create_event(dict(intent))
+    assert created, "Unsaved event still treated as a duplicate"
+    assert [e["id"] for e in await store.get_events()] == [retried["id"]]
+    await store.close()
+    print("✅ Failed write-behind save does not block a retry")
+
+    print("\n✅ Test PASSED: Async store keeps the loop free")
+    return True
+
+
+async def test_reminder_scheduler():
+    """
+    Test reminder timer heap: incremental load, firing and heap scale
+    """
+    print("\n" + "="*70)
+    print("TEST 15: Reminder Scheduler - timer heap")
+    print("="*70)
+    
+    import tempfile
+    import os
+    import time
+    from core.reminders import ReminderScheduler
+    
+    fired = []
+    
+    async def emit(event_data):
+        fired.append(event_data)
+    
+    soon = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=2)
+    later = soon + timedelta(hours=20)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        extractor = PodijaIntentExtractor(os.path.join(tmpdir, "calendar.json"))
+        store = AsyncPodijaStore(extractor)
+        due = await store.save_event({"title": "нарада", "date": soon.date().isoformat(),
+                                      "time": soon.strftime("%H:%M"), "desc": ""})
+        await store.save_event({"title": "звіт", "date": later.date().isoformat(),
+                                "time": later.strftime("%H:%M"), "desc": ""})
+        
+        # 5-minute lead: the reminder for the event in 2 minutes is already due
+        scheduler = ReminderScheduler(store.get_events, emit, lead_minutes=5, load_window_days=3)
+        await scheduler.start()
+        await asyncio.sleep(0.05)
+        assert [e["event_id"] for e in fired] == [due["id"]], f"Unexpected reminders: {fired}"
+        assert fired[0]["type"] == "podija_reminder" and fired[0]["minutes_before"] == 5
+        print(f"✅ Due reminder fired on load: {fired[0]['title']} at {fired[0]['time']}")
+        assert scheduler.loads == 1, "Calendar scanned more than once"
+        assert len(scheduler) == 1, f"Expected 1 pending reminder, got {len(scheduler)}"
+        print(f"✅ Future events wait in the heap: {scheduler.stats()['pending']} pending")
+        
+        # Newly saved events are pushed without reloading the calendar
+        added = await store.save_event({"title": "дзвінок", "date": soon.date().isoformat(),
+                                        "time": soon.strftime("%H:%M"), "desc": ""})
+        scheduler.add(added)
+        scheduler.add(added)
+        await asyncio.sleep(0.05)
+        assert [e["event_id"] for e in fired][1:] == [added["id"]], "Added reminder not fired once"
+        assert scheduler.loads == 1, "add() triggered a reload"
+        print("✅ add() schedules new events once, without a rescan")
+        
+        scheduler.stop()
+        
+        # A failed window load is retried with backoff, not skipped
+        fired.clear()
+        failures = []
+        
+        async def flaky_load(**kwargs):
+            if not failures:
+                failures.append(kwargs)
+                raise OSError("calendar temporarily unreadable")
+            return await store.get_events(**kwargs)
+        
+        scheduler = ReminderScheduler(flaky_load, emit, lead_minutes=5, load_window_days=3)
+        scheduler.RETRY_SECONDS = 0.05
+        await scheduler.start()
+        assert fired == [] and scheduler.load_failures == 1 and scheduler.loads == 0
+        await asyncio.sleep(0.2)
+        assert {e["event_id"] for e in fired} == {due["id"], added["id"]}, f"Reminders lost: {fired}"
+        assert scheduler.loads == 1 and len(scheduler) == 1
+        print(f"✅ Failed load retried with backoff: {scheduler.stats()}")
+        scheduler.stop()
+        await store.close()
+    
+    # Heap scale: 100k pending reminders, one timer
+    async def no_events(**kwargs):
+        return []
+    
+    scheduler = ReminderScheduler(no_events, emit, lead_minutes=0, load_window_days=400)
+    await scheduler.start()
+    base = datetime.now() + timedelta(days=1)
+    started = time.perf_counter()
+    for i in range(100000):
+        moment = base + timedelta(minutes=i)
+        scheduler.add({"id": i, "title": "подія", "date": moment.date().isoformat(),
+                       "time": moment.strftime("%H:%M"), "desc": ""})
+    elapsed = time.perf_counter() - started
+    assert len(scheduler) == 100000, f"Expected 100000 pending, got {len(scheduler)}"
+    assert scheduler.stats()["next_fire_at"] == scheduler._heap[0][0]
+    assert elapsed < 10, f"100k inserts took {elapsed:.2f}s"
+    print(f"✅ 100k reminders scheduled in {elapsed:.2f}s with a single timer")
+    scheduler.stop()
+    
+    print("\n✅ Test PASSED: Reminder scheduler working correctly")
+    return True
+
+
 async def test_voice_engine_integration():
     """
     Test integration with Voice Engine
     """
     print("\n" + "="*70)
-    print("TEST 6: Voice Engine Integration")
+    print("TEST 16: Voice Engine Integration")
     print("="*70)
     
     # Initialize Voice Engine
@@ -276,6 +947,35 @@ async def test_voice_engine_integration():
     print(f"\n✅ Event classified: Level {classified['level']} {classified['emoji']}")
     assert classified['level'] == '111', f"Expected level 111, got {classified['level']}"
     
+    # Double-sent input with dedupe: one event, one notification
+    import tempfile
+    import os
+    
+    class CountingHandler:
+        def __init__(self):
+            self.events = []
+        
+        async def handle_event(self, event):
+            self.events.append(event)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base_path = Path(__file__).parent
+        dedupe_engine = VoiceEngine(
+            ontology_path=str(base_path / "core" / "ontology.json"),
+            manifest_path=str(base_path / "public" / "manifest.json"),
+            podija_storage=JsonCalendarStorage(os.path.join(tmpdir, "calendar.json")),
+            podija_dedupe=True
+        )
+        handler = CountingHandler()
+        dedupe_engine.register_handler(handler)
+        first = await dedupe_engine.process_podija_intent(user_input)
+        second = await dedupe_engine.process_podija_intent(user_input)
+        await dedupe_engine.dispatcher.join()
+        assert first["id"] == second["id"], "Duplicate input created a second event"
+        assert len(handler.events) == 1, f"Expected 1 notification, got {len(handler.events)}"
+        await dedupe_engine.podija_store.close()
+    print("✅ Duplicate input with dedupe: one event, one notification")
+    
     print("\n✅ Test PASSED: Voice Engine integration working")
     return True
 
@@ -294,9 +994,19 @@ def run_all_tests():
     results.append(("Zero-Hallucination", test_no_hallucination()))
     results.append(("Date Calculations", test_date_calculations()))
     results.append(("Time Extraction", test_time_extraction()))
+    results.append(("Tokenizer Edge Cases", test_tokenizer_edge_cases()))
     results.append(("Storage Sync", test_storage_sync()))
+    results.append(("Batch Extraction", test_batch_extraction()))
+    results.append(("JSONL Storage", test_jsonl_storage()))
+    results.append(("SQLite Storage", test_sqlite_storage()))
+    results.append(("Calendar Cache", test_calendar_cache()))
+    results.append(("Concurrent Writes", test_concurrent_writes()))
+    results.append(("Recurring Events", test_recurring_events()))
+    results.append(("Dedupe", test_dedupe()))
     
     # Run async tests
+    results.append(("Async Store", asyncio.run(test_async_store())))
+    results.append(("Reminder Scheduler", asyncio.run(test_reminder_scheduler())))
     results.append(("Voice Engine Integration", asyncio.run(test_voice_engine_integration())))
     
     # Summary